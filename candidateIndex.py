@@ -0,0 +1,225 @@
+"""
+candidateIndex.py
+
+Candidate pruning for all-pairs phenotype similarity.
+
+Most (ortholog, disease) pairs share nothing but a few near-root uPheno
+terms and score far below the threshold. Two ways to find the pairs worth
+scoring, both on the binary ancestor-closed CSR matrices built by
+jaccardEngine / uphenoClosure:
+
+exact (default)
+    Prefix filtering. Terms are ordered rarest first by document frequency.
+    Each set keeps its `size - ceil(threshold * size) + 1` rarest terms;
+    any pair with Jaccard >= threshold must share one of them. An inverted
+    index from prefix term to the diseases containing it gives the candidates,
+    so high-frequency root terms, which sort last, never generate candidates.
+    No pair above the threshold is lost.
+
+minhash
+    MinHash signatures with LSH banding. Pairs whose signatures collide in at
+    least one band become candidates. Recall of pairs at or above the threshold
+    is approximate and is tuned with num_perm and bands.
+
+Candidates are then scored exactly with score_pairs.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Mersenne prime for the MinHash universal hash family
+_PRIME = (1 << 61) - 1
+
+
+def term_ranks(*matrices):
+    """Rank of each column by document frequency over the given matrices (0 = rarest)."""
+    df = np.zeros(matrices[0].shape[1], dtype=np.int64)
+    for M in matrices:
+        df += np.bincount(M.indices, minlength=M.shape[1])
+    ranks = np.empty(len(df), dtype=np.int64)
+    ranks[np.argsort(df, kind="stable")] = np.arange(len(df))
+    return ranks
+
+
+def prefix_matrix(M, ranks, threshold):
+    """
+    Keep only the prefix terms of each row of M.
+
+    The prefix of a row with s terms is its s - ceil(threshold * s) + 1 rarest
+    terms by `ranks`. Columns of the result are ranks, not term ids.
+    """
+    M = sparse.csr_matrix(M)
+    sizes = np.diff(M.indptr)
+    prefix_len = np.minimum(sizes, sizes - np.ceil(threshold * sizes).astype(np.int64) + 1)
+
+    row_of = np.repeat(np.arange(M.shape[0]), sizes)
+    ranked = ranks[M.indices]
+    order = np.lexsort((ranked, row_of))
+    position = np.arange(len(order)) - np.repeat(M.indptr[:-1], sizes)
+    keep = position < np.repeat(prefix_len, sizes)
+
+    rows = row_of[order][keep]
+    cols = ranked[order][keep]
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=M.shape)
+
+
+class InvertedIndex:
+    """
+    Prefix term -> diseases (rows of B) containing it, for exact candidate lookup.
+
+    Parameters
+    ----------
+    B : scipy.sparse.csr_matrix
+        Disease ancestor matrix.
+    threshold : float
+        Jaccard threshold the candidates must be able to reach.
+    ranks : np.ndarray, optional
+        Term ranks shared with the query side (see term_ranks).
+    """
+
+    def __init__(self, B, threshold, ranks=None):
+        self.threshold = threshold
+        self.ranks = term_ranks(B) if ranks is None else ranks
+        self.sizes = np.diff(sparse.csr_matrix(B).indptr)
+        # transpose of the prefix matrix: row = term rank, columns = diseases
+        self.postings = prefix_matrix(B, self.ranks, threshold).T.tocsr()
+
+    def candidates(self, A, block_size=4096):
+        """
+        Candidate (row of A, row of B) pairs sharing a prefix term and passing
+        the size filter threshold * |a| <= |b| <= |a| / threshold.
+
+        Returns
+        -------
+        rows, cols : np.ndarray
+        """
+        A = sparse.csr_matrix(A)
+        sizeA = np.diff(A.indptr)
+        probes = prefix_matrix(A, self.ranks, self.threshold)
+        rows, cols = [], []
+        for start in range(0, A.shape[0], block_size):
+            hits = (probes[start:start + block_size] @ self.postings).tocoo()
+            r = hits.row + start
+            a, b = sizeA[r], self.sizes[hits.col]
+            if self.threshold > 0:
+                keep = (b >= self.threshold * a) & (a >= self.threshold * b)
+                r, c = r[keep], hits.col[keep]
+            else:
+                c = hits.col
+            rows.append(r)
+            cols.append(c)
+        return _concat(rows), _concat(cols)
+
+
+def minhash_signatures(M, num_perm=128, seed=1):
+    """
+    MinHash signature of each row of a binary CSR matrix.
+
+    Returns
+    -------
+    np.ndarray
+        (n_rows x num_perm) uint64; empty rows get all-max signatures.
+    """
+    M = sparse.csr_matrix(M)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    signatures = np.full((M.shape[0], num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    sizes = np.diff(M.indptr)
+    nonempty = np.flatnonzero(sizes)
+    if len(nonempty) == 0:
+        return signatures
+    # x * a + b wraps mod 2**64 before the mod-prime step; still a fine hash family here
+    hashes = (M.indices.astype(np.uint64)[:, None] * a + b) % np.uint64(_PRIME)
+    signatures[nonempty] = np.minimum.reduceat(hashes, M.indptr[nonempty], axis=0)
+    return signatures
+
+
+def lsh_bands(num_perm, threshold):
+    """
+    Pick the number of LSH bands: the fewest bands (dividing num_perm) whose
+    S-curve threshold (1/bands) ** (1/rows) is at or below `threshold`, so
+    pairs at the threshold are more likely kept than dropped.
+    """
+    best = 1
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        if (1 / bands) ** (bands / num_perm) <= threshold:
+            return bands
+        best = bands
+    return best
+
+
+def minhash_candidates(A, B, threshold, num_perm=128, bands=None, seed=1):
+    """
+    Approximate candidate pairs from MinHash LSH.
+
+    Parameters
+    ----------
+    A, B : scipy.sparse.csr_matrix
+        Binary matrices over the same columns.
+    threshold : float
+        Target Jaccard threshold.
+    num_perm : int
+        Signature length; more permutations give sharper recall/precision.
+    bands : int, optional
+        LSH bands (must divide num_perm). Chosen by lsh_bands if omitted;
+        more bands raise recall and the candidate count.
+
+    Returns
+    -------
+    rows, cols : np.ndarray
+    """
+    bands = bands or lsh_bands(num_perm, threshold)
+    if num_perm % bands:
+        raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+    width = num_perm // bands
+    sigA = minhash_signatures(A, num_perm, seed)
+    sigB = minhash_signatures(B, num_perm, seed)
+    emptyA = np.diff(sparse.csr_matrix(A).indptr) == 0
+    emptyB = np.diff(sparse.csr_matrix(B).indptr) == 0
+
+    pairs = []
+    for band in range(bands):
+        cols = slice(band * width, (band + 1) * width)
+        keyA = pd.util.hash_array(np.ascontiguousarray(sigA[:, cols]).view(f"V{8 * width}").ravel())
+        keyB = pd.util.hash_array(np.ascontiguousarray(sigB[:, cols]).view(f"V{8 * width}").ravel())
+        left = pd.DataFrame({"key": keyA[~emptyA], "row": np.flatnonzero(~emptyA)})
+        right = pd.DataFrame({"key": keyB[~emptyB], "col": np.flatnonzero(~emptyB)})
+        pairs.append(left.merge(right, on="key")[["row", "col"]])
+    if not pairs:
+        return _concat([]), _concat([])
+    pairs = pd.concat(pairs, ignore_index=True).drop_duplicates()
+    return pairs["row"].to_numpy(), pairs["col"].to_numpy()
+
+
+def candidate_pairs(A, B, threshold, method="exact", **kwargs):
+    """Candidate pairs of rows of A and B by `method` ('exact' or 'minhash')."""
+    if method == "exact":
+        return InvertedIndex(B, threshold, term_ranks(A, B)).candidates(A)
+    if method == "minhash":
+        return minhash_candidates(A, B, threshold, **kwargs)
+    raise ValueError(f"Unknown candidate method: {method}")
+
+
+def score_pairs(A, B, rows, cols, block_size=100000):
+    """Exact Jaccard score of each (rows[i], cols[i]) pair of rows of A and B."""
+    A = sparse.csr_matrix(A)
+    B = sparse.csr_matrix(B)
+    sizeA = np.diff(A.indptr)
+    sizeB = np.diff(B.indptr)
+    scores = np.empty(len(rows))
+    for start in range(0, len(rows), block_size):
+        r = rows[start:start + block_size]
+        c = cols[start:start + block_size]
+        inter = np.asarray(A[r].multiply(B[c]).sum(axis=1)).ravel()
+        union = sizeA[r] + sizeB[c] - inter
+        scores[start:start + block_size] = np.divide(inter, union, out=np.zeros(len(r)), where=union > 0)
+    return scores
+
+
+def _concat(arrays):
+    return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
@@ -0,0 +1,293 @@
+"""
+cli.py
+
+Single command-line entry point for the analyses:
+
+    python cli.py <subcommand> [options]
+
+(alias it as `monarch-model-orgs`). Each subcommand imports its module only
+when it runs, and the modules open their Neo4j connection or snapshot on the
+first query, so `--help` and the count-only subcommands start without loading
+the plotting, ontology or analysis stacks. The global options are written to
+configDict before any analysis module is imported.
+
+Usage:
+    python cli.py --help
+    python cli.py --snapshot snapshots stats
+    python cli.py phenotype-counts
+    python cli.py semsim --backend resnik --workers 16
+"""
+
+import argparse
+import sys
+
+from neo4jConfig import configDict
+
+
+# -------------------------------
+# Subcommands
+# -------------------------------
+def _sankey(args):
+    import orthologSankey
+    orthologSankey.orthoSankey()
+
+
+def _phenotype_pattern(args):
+    import uphenoConns
+    uphenoConns.phenotype_pattern()
+
+
+def _phenotype_counts(args):
+    import uphenoConns
+    uphenoConns.phenotypesCount()
+
+
+def _ortholog_pattern(args):
+    import uphenoConns
+    uphenoConns.ortholog_pattern()
+
+
+def _categories(args):
+    import phenotypeCategories
+    phenotypeCategories.phenotypeHeatmap(server_side=not args.local, categories_path=args.categories)
+
+
+def _stats(args):
+    import main
+    print("Taxon gene edge counts:")
+    print(main.get_gene_taxon_counts())
+    print("\nGene edge counts by relationship type:")
+    print(main.get_gene_edge_type_counts())
+    print("\nPhenotypic feature counts by type:")
+    print(main.get_phenotypic_feature_counts_by_type())
+    print("\nNumber of genes per taxon:")
+    print(main.get_gene_counts_by_taxon())
+
+
+def _coverage(args):
+    import main
+    print(main.get_ortholog_gap_counts().to_string(index=False))
+
+
+def _semsim(args):
+    if args.workers is not None or args.resume:
+        import semSimRunner
+        semSimRunner.runSharded(args.out, args.output, workers=args.workers, resume=args.resume,
+                                threshold=args.threshold, candidates=args.candidates, backend=args.backend,
+                                candidate_threshold=args.candidate_threshold)
+        return
+    import semSimPipeline
+    df = semSimPipeline.runAnalysis(threshold=args.threshold, candidates=args.candidates, backend=args.backend,
+                                    candidate_threshold=args.candidate_threshold)
+    if args.output != "disease_gene_similarity_results.csv":
+        df.to_csv(args.output, index=False)
+
+
+def _snapshot(args):
+    import kgSnapshot
+    from neo4jConnection import Neo4jConnection
+    conn = Neo4jConnection(uri=configDict['uri'], user=configDict['user'], pwd=configDict['pwd'])
+    try:
+        print("Snapshot written to", kgSnapshot.export_snapshot(conn, configDict['db'], args.root, args.tables))
+    finally:
+        conn.close()
+
+
+def _indexes(args):
+    import kgIndexes
+    from neo4jConnection import Neo4jConnection
+    conn = Neo4jConnection(uri=configDict['uri'], user=configDict['user'], pwd=configDict['pwd'])
+    try:
+        report = kgIndexes.check_release(conn, configDict['db'], args.create, args.out)
+    finally:
+        conn.close()
+    return 1 if any(entry["status"] in ("fail", "error") for entry in report) else 0
+
+
+def _delta(args):
+    import json
+    import releaseDelta
+    if args.new_snapshot is None:
+        print("Outputs written to", releaseDelta.compute_outputs(args.old_snapshot, args.old_out))
+        return
+    print(json.dumps(releaseDelta.update_outputs(args.old_snapshot, args.new_snapshot, args.old_out, args.new_out),
+                     indent=2))
+
+
+def _infer(args):
+    import orthologInference
+    if args.graph:
+        from kgxGraph import KGXGraph
+        orthologInference.infer_release(args.out_dir, graph=KGXGraph.open(args.graph), types=args.types,
+                                        block_size=args.block_size)
+        return
+    from neo4jConnection import connect
+    conn = connect(configDict)
+    try:
+        orthologInference.infer_release(args.out_dir, conn, configDict['db'], types=args.types,
+                                        block_size=args.block_size)
+    finally:
+        conn.close()
+
+
+def _closure(args):
+    import uphenoClosure
+    print("Closure written to", uphenoClosure.build_closure(args.ontology, args.out_dir, args.predicates))
+
+
+def _kgx(args):
+    from kgxGraph import KGXGraph
+    graph = KGXGraph.load_kgx(args.nodes, args.edges, args.predicates)
+    print(f"{len(graph)} nodes, predicates: {', '.join(graph.predicates)}")
+    print("Graph written to", graph.save(args.out_dir))
+
+
+def _benchmark(args):
+    import json
+    import kgBenchmark
+    scale = int(args.scale) if args.scale.isdigit() else args.scale
+    # read the baseline first: --out may be the same file
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report = kgBenchmark.run_suite(scale, args.seed, args.only, args.repeat, args.work_dir)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", args.out)
+    if baseline is not None:
+        regressions = kgBenchmark.compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        return 1 if regressions else 0
+
+
+# -------------------------------
+# Parser
+# -------------------------------
+class _LazyChoices:
+    """argparse choices read from a module attribute only when an argument is checked or shown."""
+
+    def __init__(self, module, attribute):
+        self.module = module
+        self.attribute = attribute
+
+    def _names(self):
+        import importlib
+        return sorted(getattr(importlib.import_module(self.module), self.attribute))
+
+    def __contains__(self, name):
+        return name in self._names()
+
+    def __iter__(self):
+        return iter(self._names())
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="monarch-model-orgs",
+                                     description="Model organism analyses over the Monarch KG.")
+    parser.add_argument("--db", help=f"Neo4j database (default: {configDict['db']})")
+    parser.add_argument("--uri", help=f"Neo4j URI (default: {configDict['uri']})")
+    parser.add_argument("--snapshot", help="read this kgSnapshot directory instead of Neo4j")
+    parser.add_argument("--cache-dir", help="persistent query result cache directory")
+    parser.add_argument("--profile-report", help="write a per-query profile report (.json or .prom) at exit")
+    parser.add_argument("--slow-query-ms", type=float, help="log queries at least this slow")
+    parser.add_argument("--warmup", action="store_true", default=None,
+                        help="plan every registered query with EXPLAIN when the connection opens")
+    commands = parser.add_subparsers(dest="command", metavar="<subcommand>", required=True)
+
+    commands.add_parser("sankey", help="ortholog annotation Sankey diagram").set_defaults(run=_sankey)
+
+    commands.add_parser("phenotype-pattern", help="phenotypes shared between ontologies (UpSet plot)"
+                        ).set_defaults(run=_phenotype_pattern)
+    commands.add_parser("phenotype-counts", help="phenotype annotations per organism (counts only)"
+                        ).set_defaults(run=_phenotype_counts)
+    commands.add_parser("ortholog-pattern", help="ortholog counts between organisms (heatmap)"
+                        ).set_defaults(run=_ortholog_pattern)
+
+    sub = commands.add_parser("categories", help="phenotypes per high level uPheno category (heatmap)")
+    sub.add_argument("--categories", default="uphenoNew.pkl", help="pickled category -> member terms mapping")
+    sub.add_argument("--local", action="store_true", help="count locally instead of on the server")
+    sub.set_defaults(run=_categories)
+
+    commands.add_parser("stats", help="gene edge and phenotype summary counts (counts only)"
+                        ).set_defaults(run=_stats)
+    commands.add_parser("coverage", help="human genes lacking annotations their orthologs have (counts only)"
+                        ).set_defaults(run=_coverage)
+
+    sub = commands.add_parser("semsim", help="ortholog-disease phenotype similarity")
+    # an explicit metavar keeps argparse from listing (and importing) the backends while building the parser
+    sub.add_argument("--backend", default="jaccard", metavar="BACKEND",
+                     choices=_LazyChoices("similarityBackends", "BACKENDS"),
+                     help="similarity measure reported for the candidate pairs: jaccard, resnik, phenodigm or semsimian")
+    sub.add_argument("--threshold", type=float, default=0.4, help="minimum similarity_score reported")
+    sub.add_argument("--candidate-threshold", type=float,
+                     help="ancestor Jaccard a pair needs to be scored by a non-Jaccard backend (default 0.1)")
+    sub.add_argument("--candidates", default="exact", choices=["exact", "minhash"])
+    sub.add_argument("--workers", type=int, help="run sharded over this many processes (semSimRunner)")
+    sub.add_argument("--resume", action="store_true", help="resume a sharded run from --out")
+    sub.add_argument("--out", default="semsim_shards", help="shard directory for sharded runs")
+    sub.add_argument("--output", default="disease_gene_similarity_results.csv", help="results CSV")
+    sub.set_defaults(run=_semsim)
+
+    sub = commands.add_parser("snapshot", help="export a columnar snapshot of the KG working set")
+    sub.add_argument("root", nargs="?", default="snapshots")
+    sub.add_argument("--tables", nargs="+", help="subset of tables to export")
+    sub.set_defaults(run=_snapshot)
+
+    sub = commands.add_parser("indexes", help="create the declared indexes and check every query plan")
+    sub.add_argument("--create", action="store_true", help="create the missing declared indexes first")
+    sub.add_argument("--out", help="write the report as JSON")
+    sub.set_defaults(run=_indexes)
+
+    sub = commands.add_parser("delta", help="update the previous release's outputs to a new release snapshot")
+    sub.add_argument("old_snapshot")
+    sub.add_argument("old_out", help="outputs of the old release (computed from scratch if no new snapshot)")
+    sub.add_argument("new_snapshot", nargs="?")
+    sub.add_argument("new_out", nargs="?")
+    sub.set_defaults(run=_delta)
+
+    sub = commands.add_parser("infer", help="human gene annotations inferred through orthologs (Parquet)")
+    sub.add_argument("out_dir", nargs="?", default="inferred_annotations")
+    sub.add_argument("--graph", help="saved KGXGraph directory to read instead of Neo4j")
+    sub.add_argument("--types", nargs="+", default=["phenotype", "interaction", "activity"],
+                     choices=["phenotype", "interaction", "activity"])
+    sub.add_argument("--block-size", type=int, default=4096, help="human genes per product block")
+    sub.set_defaults(run=_infer)
+
+    sub = commands.add_parser("closure", help="precompute the uPheno ancestor closure")
+    sub.add_argument("ontology", help="local ontology file, e.g. upheno.db")
+    sub.add_argument("out_dir", nargs="?", default="upheno_closure")
+    sub.add_argument("--predicates", nargs="+")
+    sub.set_defaults(run=_closure)
+
+    sub = commands.add_parser("kgx", help="load KGX node/edge TSV files into a CSR graph")
+    sub.add_argument("nodes")
+    sub.add_argument("edges")
+    sub.add_argument("out_dir", nargs="?", default="kgx_graph")
+    sub.add_argument("--predicates", nargs="+")
+    sub.set_defaults(run=_kgx)
+
+    sub = commands.add_parser("benchmark", help="benchmark the analyses on a synthetic KG")
+    sub.add_argument("--scale", default="small")
+    sub.add_argument("--seed", type=int, default=1)
+    sub.add_argument("--repeat", type=int, default=1)
+    sub.add_argument("--only", nargs="+")
+    sub.add_argument("--work-dir")
+    sub.add_argument("--out", default="benchmark.json")
+    sub.add_argument("--compare")
+    sub.add_argument("--tolerance", type=float, default=0.2)
+    sub.set_defaults(run=_benchmark)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for key in ("db", "uri", "snapshot", "cache_dir", "profile_report", "slow_query_ms", "warmup"):
+        if getattr(args, key) is not None:
+            configDict[key] = getattr(args, key)
+    return args.run(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
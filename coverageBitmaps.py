@@ -0,0 +1,332 @@
+"""
+coverageBitmaps.py
+
+Gene x annotation-type coverage as compressed bitmaps over integer gene IDs.
+
+CoverageIndex is built in one bulk pass: the geneAnnotationTypes query (one
+row per gene with a flag per annotation type) and the ortholog edges. Each
+gene gets an integer ID (its row), and each annotation type becomes a bitmap
+of the genes with at least one such annotation: phenotype, disease,
+interaction, activity, expression and pathway. project() is the
+ortholog-projection operator, which maps a gene set to the genes with an
+ortholog in it. One sparse product over the ortholog adjacency gives:
+
+    gap = human - has_X & project(has_X)
+
+i.e. the human genes lacking X although an ortholog has X. The orthoSankey
+buckets are bitmap ANDs as well. Every statistic is then a few bitmap
+operations.
+
+Bitmaps are pyroaring.BitMap when pyroaring is installed, and otherwise
+DenseBitmap, a packed NumPy bitset with the same operators (&, |, -, len).
+Snapshots only hold phenotype and disease edges, so the other types are
+unavailable there; build from Neo4j or a KGX graph (from_kgx) for those.
+
+Usage:
+    python coverageBitmaps.py            # gap counts for configDict's database
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+try:
+    from pyroaring import BitMap
+except ImportError:
+    BitMap = None
+
+from queries import geneAnnotationTypes_query, snapshotOrthologs_query
+
+HUMAN_PREFIX = "HGNC"
+
+# annotation type -> how a KGXGraph recognizes it: ("category", categories) of
+# a neighbour or ("predicate", predicates) of an edge; the columns of
+# geneAnnotationTypes_query
+ANNOTATION_TYPES = {
+    "phenotype": ("category", ["biolink:PhenotypicFeature"]),
+    "disease": ("category", ["biolink:Disease"]),
+    "interaction": ("predicate", ["biolink:interacts_with"]),
+    "activity": ("category", ["biolink:BiologicalProcessOrActivity", "biolink:BiologicalProcess",
+                              "biolink:MolecularActivity"]),
+    "expression": ("predicate", ["biolink:expressed_in"]),
+    "pathway": ("category", ["biolink:Pathway"]),
+}
+
+# orthoSankey's split of the human genes with orthologs, in diagram order
+SANKEY_BUCKETS = {
+    "many": "Many Orthologs",
+    "one": "One Ortholog",
+    "one_org": "Orthologs from One Organism",
+}
+
+
+# -------------------------------
+# Sankey buckets and flows
+# -------------------------------
+def ortholog_bucket(n_prefixes, total):
+    """
+    Sankey bucket of each gene from the number of distinct ID prefixes among
+    its orthologs and its number of orthologs: 'one' (a single ortholog),
+    'one_org' (several, one prefix), 'many' (several prefixes) or '' (none).
+    """
+    n_prefixes, total = np.asarray(n_prefixes), np.asarray(total)
+    return np.where(n_prefixes > 1, "many",
+                    np.where(n_prefixes == 1, np.where(total == 1, "one", "one_org"), ""))
+
+
+def sankey_flows(counts):
+    """
+    The orthoSankey source/target/value rows.
+
+    Parameters
+    ----------
+    counts : dict
+        bucket -> {'genes', 'disease', 'no_disease', 'disease_phenotype',
+        'no_disease_phenotype'} gene counts, for every bucket of SANKEY_BUCKETS.
+    """
+    rows = [['Human Genes with Orthologs', f"Genes with {name}", counts[b]['genes']]
+            for b, name in SANKEY_BUCKETS.items()]
+    rows += [[f"Genes with {name}", 'Has Disease Annotation', counts[b]['disease']]
+             for b, name in SANKEY_BUCKETS.items()]
+    rows += [[f"Genes with {name}", 'No Disease Annotation', counts[b]['no_disease']]
+             for b, name in SANKEY_BUCKETS.items()]
+    rows += [['Has Disease Annotation', f"Has Phenotypic Feature {name}", counts[b]['disease_phenotype']]
+             for b, name in SANKEY_BUCKETS.items()]
+    rows += [['No Disease Annotation', f"No Phenotypic Feature {name}", counts[b]['no_disease_phenotype']]
+             for b, name in SANKEY_BUCKETS.items()]
+    return pd.DataFrame(rows, columns=['source', 'target', 'value'])
+
+
+# -------------------------------
+# Bitmaps
+# -------------------------------
+class DenseBitmap:
+    """
+    Fallback for pyroaring.BitMap: a bitset over [0, n) packed into uint64
+    words. Supports the operators CoverageIndex uses: &, |, - (and-not),
+    len and iteration in ascending order.
+    """
+
+    __slots__ = ("words", "n")
+
+    def __init__(self, words, n):
+        self.words = words
+        self.n = n
+
+    @classmethod
+    def from_ids(cls, ids, n):
+        mask = np.zeros(-(-n // 64) * 64, dtype=bool)
+        mask[np.asarray(ids, dtype=np.int64)] = True
+        return cls(np.packbits(mask, bitorder="little").view(np.uint64), n)
+
+    def to_array(self):
+        bits = np.unpackbits(self.words.view(np.uint8), bitorder="little")[:self.n]
+        return np.flatnonzero(bits).astype(np.uint32)
+
+    def __and__(self, other):
+        return DenseBitmap(self.words & other.words, self.n)
+
+    def __or__(self, other):
+        return DenseBitmap(self.words | other.words, self.n)
+
+    def __sub__(self, other):
+        return DenseBitmap(self.words & ~other.words, self.n)
+
+    def __len__(self):
+        return int(np.bitwise_count(self.words).sum())
+
+    def __iter__(self):
+        return iter(self.to_array().tolist())
+
+    def __eq__(self, other):
+        return np.array_equal(self.words, other.words)
+
+    def __repr__(self):
+        return f"DenseBitmap({len(self)} of {self.n})"
+
+
+def bitmap(ids, n):
+    """Bitmap of integer IDs in [0, n): a pyroaring.BitMap if available, else a DenseBitmap."""
+    ids = np.asarray(ids, dtype=np.uint32)
+    if BitMap is not None:
+        return BitMap(ids)
+    return DenseBitmap.from_ids(ids, n)
+
+
+def bitmap_ids(bm):
+    """Sorted uint32 array of the IDs in a bitmap."""
+    if isinstance(bm, DenseBitmap):
+        return bm.to_array()
+    return np.fromiter(bm, dtype=np.uint32, count=len(bm))
+
+
+# -------------------------------
+# Coverage index
+# -------------------------------
+class CoverageIndex:
+    """
+    Annotation-type bitmaps and the ortholog adjacency over integer gene IDs.
+
+    Parameters
+    ----------
+    genes : array-like
+        Gene CURIEs; gene i has integer ID i.
+    taxa : array-like
+        in_taxon of each gene.
+    annotations : dict
+        annotation type -> boolean array over genes; types with no data are left out.
+    subjects, objects : array-like
+        Integer IDs of the ortholog edge endpoints.
+    """
+
+    def __init__(self, genes, taxa, annotations, subjects, objects):
+        self.genes = np.asarray(genes, dtype=object)
+        self.index = pd.Index(self.genes)
+        self.n = len(self.genes)
+        self.taxa = pd.Categorical(taxa)
+        self.prefixes = pd.Categorical(pd.Series(self.genes, dtype=object).str.split(":", n=1).str[0])
+        self.annotations = {name: bitmap(np.flatnonzero(mask), self.n) for name, mask in annotations.items()}
+        # undirected ortholog edge counts, as the (m)-[:orthologous_to]-(n) patterns match them
+        rows = np.concatenate([subjects, objects])
+        cols = np.concatenate([objects, subjects])
+        self.orthologs = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)),
+                                           shape=(self.n, self.n))
+        self._buckets = None
+
+    @classmethod
+    def from_frames(cls, genes, orthologs):
+        """
+        Build from a geneAnnotationTypes result (gene, taxon, one column per
+        annotation type) and ortholog edges (subject, object). Type columns
+        that are entirely null are treated as unavailable.
+        """
+        genes = genes.drop_duplicates("gene", ignore_index=True)
+        annotations = {
+            name: genes[name].fillna(False).to_numpy(dtype=bool)
+            for name in ANNOTATION_TYPES if name in genes and genes[name].notna().any()
+        }
+        index = pd.Index(genes["gene"])
+        subjects, objects = index.get_indexer(orthologs["subject"]), index.get_indexer(orthologs["object"])
+        known = (subjects >= 0) & (objects >= 0)
+        return cls(genes["gene"], genes["taxon"], annotations, subjects[known], objects[known])
+
+    @classmethod
+    def from_connection(cls, conn, db=None):
+        """Build from a Neo4jConnection or SnapshotConnection in two streamed queries."""
+        genes = conn.query_df(geneAnnotationTypes_query, db=db)
+        orthologs = conn.query_df(snapshotOrthologs_query, db=db, columns=["subject", "object"])
+        return cls.from_frames(genes, orthologs)
+
+    @classmethod
+    def from_kgx(cls, graph, types=ANNOTATION_TYPES, ortholog_predicate="biolink:orthologous_to"):
+        """Build from a kgxGraph.KGXGraph, which holds every annotation type."""
+        genes = np.flatnonzero(graph.has_category("biolink:Gene"))
+        annotations = {}
+        for name, (kind, values) in types.items():
+            if kind == "category":
+                has = graph.adjacency_matrix() @ graph.has_category(values).astype(np.int64) > 0
+            else:
+                has = graph.degree([v for v in values if v in graph.predicates]) > 0
+            annotations[name] = has[genes]
+        local = np.full(len(graph), -1, dtype=np.int64)
+        local[genes] = np.arange(len(genes))
+        subjects, objects = [], []
+        if ortholog_predicate in graph.out:
+            indptr, indices = graph.out[ortholog_predicate]
+            sources = np.repeat(np.arange(len(graph)), np.diff(indptr))
+            subjects, objects = local[sources], local[np.asarray(indices)]
+            known = (subjects >= 0) & (objects >= 0)
+            subjects, objects = subjects[known], objects[known]
+        return cls(graph.ids[genes], graph.nodes["taxon"].to_numpy()[genes], annotations,
+                   np.asarray(subjects, dtype=np.int64), np.asarray(objects, dtype=np.int64))
+
+    # -------------------------------
+    # Gene sets
+    # -------------------------------
+    def _from_mask(self, mask):
+        return bitmap(np.flatnonzero(mask), self.n)
+
+    def all(self):
+        return self._from_mask(np.ones(self.n, dtype=bool))
+
+    def annotated(self, name):
+        """Genes with at least one annotation of type `name`."""
+        if name not in self.annotations:
+            raise KeyError(f"No {name} annotations in this coverage index")
+        return self.annotations[name]
+
+    def taxon(self, *taxa):
+        return self._from_mask(np.isin(self.taxa, taxa))
+
+    def prefix(self, *prefixes):
+        """Genes whose ID prefix is one of prefixes, e.g. prefix('HGNC')."""
+        return self._from_mask(np.isin(self.prefixes, prefixes))
+
+    def ids(self, bm):
+        """Gene CURIEs of a bitmap."""
+        return self.genes[bitmap_ids(bm)]
+
+    def mask(self, bm):
+        mask = np.zeros(self.n, dtype=bool)
+        mask[bitmap_ids(bm)] = True
+        return mask
+
+    def project(self, bm):
+        """Ortholog projection: genes with at least one ortholog in `bm`."""
+        return self._from_mask(self.orthologs @ self.mask(bm).astype(np.int64) > 0)
+
+    # -------------------------------
+    # Statistics
+    # -------------------------------
+    def gap(self, name, within=None):
+        """Genes of `within` (default: human) lacking `name` annotations while an ortholog has one."""
+        within = self.prefix(HUMAN_PREFIX) if within is None else within
+        has = self.annotated(name)
+        return (within - has) & self.project(has)
+
+    def gap_counts(self, within=None):
+        """annotation type -> size of gap(), for every available type."""
+        within = self.prefix(HUMAN_PREFIX) if within is None else within
+        return {name: len(self.gap(name, within)) for name in self.annotations}
+
+    def ortholog_buckets(self):
+        """
+        orthoSankey's split of the genes with orthologs by the ID prefixes of
+        their orthologs: 'one' (a single ortholog), 'one_org' (several, one
+        prefix) and 'many' (several prefixes).
+        """
+        if self._buckets is None:
+            prefix_onehot = sparse.csr_matrix(
+                (np.ones(self.n, dtype=np.int64), (np.arange(self.n), self.prefixes.codes)),
+                shape=(self.n, len(self.prefixes.categories)))
+            per_prefix = self.orthologs @ prefix_onehot
+            per_prefix.eliminate_zeros()
+            n_prefixes = np.diff(per_prefix.indptr)
+            total = np.asarray(self.orthologs.sum(axis=1)).ravel()
+            bucket = ortholog_bucket(n_prefixes, total)
+            self._buckets = {name: self._from_mask(bucket == name) for name in SANKEY_BUCKETS}
+        return self._buckets
+
+    def sankey(self, within=None):
+        """The orthoSankey source/target/value flows from bitmap operations."""
+        within = self.prefix(HUMAN_PREFIX) if within is None else within
+        buckets = {name: bm & within for name, bm in self.ortholog_buckets().items()}
+        phen, dis = self.annotated("phenotype"), self.annotated("disease")
+        return sankey_flows({b: {
+            'genes': len(bm),
+            'disease': len(bm & dis),
+            'no_disease': len(bm - dis),
+            'disease_phenotype': len(bm & dis & phen),
+            'no_disease_phenotype': len(bm - dis - phen),
+        } for b, bm in buckets.items()})
+
+
+if __name__ == "__main__":
+    from neo4jConfig import configDict
+    from neo4jConnection import connect
+
+    conn = connect(configDict)
+    coverage = CoverageIndex.from_connection(conn, configDict['db'])
+    print(f"{coverage.n} genes, bitmaps: {', '.join(coverage.annotations)}")
+    for name, count in coverage.gap_counts().items():
+        print(f"Human genes without {name} annotations whose orthologs have them: {count}")
@@ -0,0 +1,103 @@
+"""
+jaccardEngine.py
+
+All-pairs ancestor Jaccard similarity with sparse matrices.
+
+Each phenotype set is expanded to its ancestor closure and encoded as one row
+of a binary CSR matrix over a shared term vocabulary. For two such matrices A
+(e.g. orthologs) and B (e.g. diseases), A @ B.T gives every pairwise
+intersection size at once, and
+
+    jaccard(a, b) = |a & b| / (|a| + |b| - |a & b|)
+
+follows from the row sums. Only pairs that share at least one term appear in
+the product, so pairs scoring 0 are never materialised.
+"""
+
+import numpy as np
+from scipy import sparse
+
+
+def build_ancestor_matrices(ancestors, *term_set_lists):
+    """
+    Encode lists of phenotype sets as ancestor-closed binary CSR matrices.
+
+    Parameters
+    ----------
+    ancestors : callable
+        term -> iterable of its ancestors, including the term itself.
+        Called once per distinct term.
+    *term_set_lists : list of iterables
+        One list of phenotype sets per matrix to build.
+
+    Returns
+    -------
+    matrices : list of scipy.sparse.csr_matrix
+        One (len(term_sets) x n_terms) int32 matrix per input list, all over
+        the same columns.
+    vocabulary : dict
+        term -> column index.
+    """
+    vocabulary = {}
+    closures = {}
+    encoded = []
+    for term_sets in term_set_lists:
+        indptr, indices = [0], []
+        for terms in term_sets:
+            columns = set()
+            for term in terms:
+                if term not in closures:
+                    closures[term] = [vocabulary.setdefault(a, len(vocabulary)) for a in ancestors(term)]
+                columns.update(closures[term])
+            indices.extend(sorted(columns))
+            indptr.append(len(indices))
+        encoded.append((np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int32)))
+
+    matrices = [
+        sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                          shape=(len(indptr) - 1, len(vocabulary)))
+        for indptr, indices in encoded
+    ]
+    return matrices, vocabulary
+
+
+def jaccard_pairs(A, B, threshold=0.0, block_size=2048):
+    """
+    Jaccard scores of every row of A against every row of B above a threshold.
+
+    Parameters
+    ----------
+    A, B : scipy.sparse.csr_matrix
+        Binary matrices over the same columns (see build_ancestor_matrices).
+    threshold : float
+        Only pairs with score > threshold are returned.
+    block_size : int
+        Rows of A multiplied at a time; bounds the size of each partial product.
+
+    Returns
+    -------
+    rows, cols : np.ndarray
+        Row indices into A and B of each returned pair.
+    scores : np.ndarray
+        Jaccard score of each pair.
+    """
+    A = sparse.csr_matrix(A)
+    B = sparse.csr_matrix(B)
+    BT = B.T.tocsr()
+    sizeA = np.diff(A.indptr)
+    sizeB = np.diff(B.indptr)
+
+    rows, cols, scores = [], [], []
+    for start in range(0, A.shape[0], block_size):
+        inter = (A[start:start + block_size] @ BT).tocoo()
+        r = inter.row + start
+        union = sizeA[r] + sizeB[inter.col] - inter.data
+        score = inter.data / union
+        keep = score > threshold
+        rows.append(r[keep])
+        cols.append(inter.col[keep])
+        scores.append(score[keep])
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
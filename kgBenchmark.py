@@ -0,0 +1,284 @@
+"""
+kgBenchmark.py
+
+Benchmark suite for the analyses, run against a synthetic Monarch-shaped KG
+(see syntheticKG) instead of a production Neo4j.
+
+The synthetic graph is written as a kgSnapshot directory and configDict is
+pointed at it, so every module's connect() returns a SnapshotConnection: the
+same registered queries and parameters the analyses send to Neo4j, answered
+locally. Each connection is wrapped in a CountingConnection to count the
+queries sent. Only the query and compute part of each analysis is timed: the
+data functions behind the plots, without plotting or writing CSV files. A
+benchmark that needs an optional package that is not installed is reported as
+"skipped". Per benchmark the suite records wall time, query count and the
+peak traced memory (tracemalloc) and writes them to JSON. With --compare, the
+results are checked against an earlier JSON file and regressions in wall time
+or query count are reported (exit status 1).
+
+Usage:
+    python kgBenchmark.py --scale small --out benchmark.json
+    python kgBenchmark.py --scale small --compare benchmark.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import traceback
+from datetime import datetime, timezone
+
+import syntheticKG
+from neo4jConfig import configDict
+from neo4jConnection import RecordDecoder
+
+
+class CountingConnection(RecordDecoder):
+    """
+    Wrap a connection (Neo4jConnection or SnapshotConnection) and count the
+    queries sent through it, including those of the RecordDecoder helpers.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.count = 0
+
+    def query(self, *args, **kwargs):
+        self.count += 1
+        return self.conn.query(*args, **kwargs)
+
+    def query_many(self, jobs, *args, **kwargs):
+        jobs = list(jobs)
+        self.count += len(jobs)
+        return self.conn.query_many(jobs, *args, **kwargs)
+
+    def query_iter(self, *args, **kwargs):
+        self.count += 1
+        return self.conn.query_iter(*args, **kwargs)
+
+    def query_chunks(self, *args, **kwargs):
+        self.count += 1
+        return self.conn.query_chunks(*args, **kwargs)
+
+    def query_df(self, *args, **kwargs):
+        self.count += 1
+        return self.conn.query_df(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+# -------------------------------
+# Benchmarks
+# -------------------------------
+# name -> (module, setup(module, paths) returning the callable to time)
+def _orthoSankey(module, paths):
+    return module.orthoSankeyData
+
+
+def _ortholog_pattern(module, paths):
+    return module.orthologCounts
+
+
+def _phenotype_pattern(module, paths):
+    return module.phenotypeConnectionCounts
+
+
+def _load_categories(paths):
+    import pickle
+    with open(paths["categories"], "rb") as f:
+        return pickle.load(f)
+
+
+def _category_rollup_local(module, paths):
+    import pandas as pd
+    import queries
+    categories = _load_categories(paths)
+
+    def run():
+        response = module.conn.query(queries.namePhens_query, db=configDict['db'])
+        df = pd.DataFrame(response, columns=["phenotype", "ontology"])
+        return module.categoryCounts(df, categories)
+    return run
+
+
+def _category_rollup_server(module, paths):
+    categories = _load_categories(paths)
+    return lambda: module.serverCategoryCounts(module.conn, configDict['db'], categories)
+
+
+def _runAnalysis(module, paths):
+    module.CLOSURE_DIR = paths["closure"]
+
+    def run():
+        # start cold: no cached closure or gene-disease index from earlier runs
+        module._closure = None
+        module._gene_diseases = None
+        return module.scoreGenes(module.prepareAnalysis())
+    return run
+
+
+BENCHMARKS = {
+    "orthoSankey": ("orthologSankey", _orthoSankey),
+    "ortholog_pattern": ("uphenoConns", _ortholog_pattern),
+    "phenotype_pattern": ("uphenoConns", _phenotype_pattern),
+    "category_rollup_local": ("phenotypeCategories", _category_rollup_local),
+    "category_rollup_server": ("phenotypeCategories", _category_rollup_server),
+    "runAnalysis": ("semSimPipeline", _runAnalysis),
+}
+
+
+def measure(function, repeat=1):
+    """
+    Time `function` `repeat` times, then run it once more under tracemalloc
+    (which slows it down) for the memory peak.
+
+    Returns
+    -------
+    dict
+        wall_seconds (every timed run), wall_min, wall_median and peak_bytes.
+    """
+    walls = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        walls.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "wall_seconds": walls,
+        "wall_min": min(walls),
+        "wall_median": statistics.median(walls),
+        "peak_bytes": peak,
+    }
+
+
+def run_benchmark(name, paths, repeat=1):
+    """Import the benchmark's module against the synthetic KG and measure it."""
+    module_name, setup = BENCHMARKS[name]
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        return {"status": "skipped", "error": f"cannot import {module_name}: {e}"}
+
+    counter = CountingConnection(module.conn)
+    module.conn = counter
+    try:
+        result = measure(setup(module, paths), repeat)
+    except ImportError as e:
+        # optional dependencies are imported lazily, on the first run
+        return {"status": "skipped", "error": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        traceback.print_exc()
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    finally:
+        module.conn = counter.conn
+    result["queries"] = counter.count // (repeat + 1)
+    result["status"] = "ok"
+    return result
+
+
+def run_suite(scale="small", seed=1, names=None, repeat=1, work_dir=None):
+    """
+    Generate the synthetic KG, point configDict at it and run the benchmarks.
+
+    The synthetic KG and snapshot are written into work_dir (a temporary
+    directory by default), which is also the working directory while the
+    benchmarks run.
+
+    Returns
+    -------
+    dict
+        Run metadata and one result per benchmark.
+    """
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    work_dir = os.path.abspath(work_dir or tempfile.mkdtemp(prefix="kgBenchmark-"))
+    start = time.perf_counter()
+    kg = syntheticKG.generate(scale, seed)
+    paths = syntheticKG.write_kg(kg, work_dir)
+    generate_seconds = time.perf_counter() - start
+
+    configDict['snapshot'] = paths["snapshot"]
+    configDict['cache_dir'] = None
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        results = {}
+        for name in names or BENCHMARKS:
+            print(f"--- {name}")
+            results[name] = run_benchmark(name, paths, repeat)
+            print(f"{name}: {results[name]}")
+    finally:
+        os.chdir(cwd)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "scale": scale,
+        "seed": seed,
+        "repeat": repeat,
+        "generate_seconds": generate_seconds,
+        "tables": {name: len(table) for name, table in kg.tables.items()},
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.2):
+    """
+    Regressions of `report` against `baseline`: benchmarks whose wall_min grew
+    by more than `tolerance` (a fraction) or that send more queries.
+
+    Returns
+    -------
+    list of str
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if result.get("status") != "ok" or not before or before.get("status") != "ok":
+            continue
+        if result["wall_min"] > before["wall_min"] * (1 + tolerance):
+            regressions.append(f"{name}: wall time {before['wall_min']:.3f}s -> {result['wall_min']:.3f}s")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analyses on a synthetic Monarch-shaped KG.")
+    parser.add_argument("--scale", default="small", help=f"one of {', '.join(syntheticKG.SCALES)} or a human gene count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per benchmark")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--work-dir", help="directory for the synthetic KG and analysis outputs (default: temporary)")
+    parser.add_argument("--out", default="benchmark.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier JSON results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed wall time increase, as a fraction")
+    args = parser.parse_args()
+
+    scale = int(args.scale) if args.scale.isdigit() else args.scale
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report = run_suite(scale, args.seed, args.only, args.repeat, args.work_dir)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", args.out)
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        sys.exit(1 if regressions else 0)
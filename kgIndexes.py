@@ -0,0 +1,267 @@
+"""
+kgIndexes.py
+
+Index provisioning and query-plan checks for a Monarch KG release.
+
+INDEXES declares the indexes the queries.py workload relies on: the gene
+and phenotype lookups by id (including the `id STARTS WITH prefix`
+filters, which range indexes serve), genes by in_taxon and phenotypes by
+namespace. ensure_indexes() creates the missing ones idempotently
+(CREATE ... IF NOT EXISTS) and waits for them to come online.
+
+plan_report() sends every registered query with EXPLAIN, which plans it
+without running it, and flags in each plan:
+
+- label scans: NodeByLabelScan / AllNodesScan operators;
+- cartesian products: CartesianProduct operators;
+- missing index use: a property the query filters on has a declared index,
+  but no index operator in the plan uses it on that label and property;
+- unknown index use: the only index operators left have no details to tell
+  which index they read, so the declared index is neither confirmed nor ruled
+  out.
+
+Label scans are expected for queries that read every node of a label (the
+summary counts, the snapshot exports), so only cartesian products and missing
+index use count as problems; label scans and unknown index use are warnings. Run it after loading each release, before the
+long analyses:
+
+    python kgIndexes.py --db monarch20250815 --create --out index_report.json
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import namedtuple
+
+from queries import QUERIES, query_parameters
+
+# kind is the Neo4j index type: RANGE (equality, IN, STARTS WITH, ranges) or TEXT
+IndexSpec = namedtuple("IndexSpec", ["name", "kind", "label", "property"])
+
+INDEXES = [
+    IndexSpec("gene_id", "RANGE", "biolink:Gene", "id"),
+    IndexSpec("gene_in_taxon", "RANGE", "biolink:Gene", "in_taxon"),
+    IndexSpec("phenotype_id", "RANGE", "biolink:PhenotypicFeature", "id"),
+    IndexSpec("phenotype_namespace", "RANGE", "biolink:PhenotypicFeature", "namespace"),
+]
+
+LABEL_SCANS = ("NodeByLabelScan", "AllNodesScan")
+CARTESIAN = ("CartesianProduct",)
+
+# (var:`label` ...) bindings, var.property filters and inline {property: ...} maps
+_BINDING = re.compile(r"\((\w+):`([^`]+)`")
+_FILTER = re.compile(r"\b(\w+)\.(\w+)\s+(?:STARTS WITH|IN\b|=)")
+_INLINE = re.compile(r"\((\w+):`[^`]+`\s*\{\s*(\w+)\s*:")
+# var:`label`(property, ...) in index operator details
+_INDEX_DETAILS = re.compile(r"\w+:(?:`([^`]+)`|(\w+))\(([^)]*)\)")
+
+
+# -------------------------------
+# Index provisioning
+# -------------------------------
+def create_statement(spec):
+    """CREATE ... INDEX ... IF NOT EXISTS statement for an IndexSpec."""
+    return (f"CREATE {spec.kind} INDEX {spec.name} IF NOT EXISTS "
+            f"FOR (n:`{spec.label}`) ON (n.{spec.property})")
+
+
+def existing_indexes(conn, db=None):
+    """
+    Indexes in the database, from SHOW INDEXES.
+
+    Returns
+    -------
+    list of dict
+        name, type, labelsOrTypes, properties and state of each index.
+    """
+    records = conn.query_iter("SHOW INDEXES YIELD name, type, labelsOrTypes, properties, state", db=db)
+    return [dict(zip(record.keys(), record.values())) for record in records]
+
+
+def missing_indexes(existing, specs=INDEXES):
+    """Declared indexes with no existing index of the same type on the same label and property."""
+    present = {(index["type"], tuple(index["labelsOrTypes"] or ()), tuple(index["properties"] or ()))
+               for index in existing}
+    return [spec for spec in specs if (spec.kind, (spec.label,), (spec.property,)) not in present]
+
+
+def ensure_indexes(conn, db=None, specs=INDEXES, wait_seconds=600):
+    """
+    Create the declared indexes that do not exist yet and wait for them to
+    come online. Existing indexes are left alone, so this can be run against
+    every release.
+
+    Returns
+    -------
+    list of IndexSpec
+        The indexes that were created.
+    """
+    created = missing_indexes(existing_indexes(conn, db), specs)
+    for spec in created:
+        list(conn.query_iter(create_statement(spec), db=db))
+    if created and wait_seconds:
+        list(conn.query_iter("CALL db.awaitIndexes($timeout)", {"timeout": wait_seconds}, db=db))
+    return created
+
+
+# -------------------------------
+# Query plan checks
+# -------------------------------
+def expected_indexes(query, specs=INDEXES):
+    """Declared indexes on the properties a query filters its labelled nodes by."""
+    labels = dict(_BINDING.findall(query))
+    filters = set(_FILTER.findall(query)) | set(_INLINE.findall(query))
+    wanted = {(labels[var], prop) for var, prop in filters if var in labels}
+    return [spec for spec in specs if (spec.label, spec.property) in wanted]
+
+
+def plan_operators(plan):
+    """Flatten an EXPLAIN plan tree (ResultSummary.plan) into (operator, details) pairs."""
+    if not plan:
+        return []
+    operator = plan.get("operatorType", "").split("@")[0]
+    arguments = plan.get("args") or plan.get("arguments") or {}
+    operators = [(operator, str(arguments.get("Details", "")))]
+    for child in plan.get("children", []):
+        operators.extend(plan_operators(child))
+    return operators
+
+
+def _uses_index(operators, spec):
+    """
+    Whether an index operator in the plan reads `spec`'s label and property:
+    True or False, or None when no operator matches but some index operator
+    has no details to check.
+    """
+    unknown = False
+    for operator, details in operators:
+        if "Index" in operator and operator.startswith(("Node", "MultiNode")):
+            if not details:
+                unknown = True
+                continue
+            # details read e.g. "RANGE INDEX m:`biolink:Gene`(id) WHERE id STARTS WITH ..."
+            for quoted, plain, properties in _INDEX_DETAILS.findall(details):
+                if (quoted or plain) == spec.label and \
+                        spec.property in [p.strip().strip("`") for p in properties.split(",")]:
+                    return True
+    return None if unknown else False
+
+
+def check_plan(name, query, plan, specs=INDEXES):
+    """
+    Findings for one query plan.
+
+    Returns
+    -------
+    dict
+        query name, operators, label_scans, cartesian_products,
+        missing_indexes (names of declared indexes the plan does not use),
+        unknown_indexes (names of declared indexes whose use the plan does not
+        show) and status: 'ok', 'warn' (label scans or unknown index use only)
+        or 'fail'.
+    """
+    operators = plan_operators(plan)
+    names = [operator for operator, _ in operators]
+    label_scans = [operator for operator in names if operator in LABEL_SCANS]
+    cartesian = [operator for operator in names if operator in CARTESIAN]
+    used = {spec.name: _uses_index(operators, spec) for spec in expected_indexes(query, specs)}
+    missing = [name for name, uses in used.items() if uses is False]
+    unknown = [name for name, uses in used.items() if uses is None]
+    status = "fail" if cartesian or missing else "warn" if label_scans or unknown else "ok"
+    return {
+        "query": name,
+        "status": status,
+        "operators": names,
+        "label_scans": len(label_scans),
+        "cartesian_products": len(cartesian),
+        "missing_indexes": missing,
+        "unknown_indexes": unknown,
+    }
+
+
+def plan_report(conn, db=None, names=None, specs=INDEXES):
+    """
+    EXPLAIN every registered query (or `names`) and check its plan.
+
+    Parameters are bound to null, as in queries.warmup; the plan does not
+    depend on their values. A query that fails to plan is reported with
+    status 'error'.
+
+    Returns
+    -------
+    list of dict
+        One check_plan result per query.
+    """
+    report = []
+    for name in names or QUERIES:
+        query = QUERIES[name]
+        plan = conn.explain(query, {p: None for p in query_parameters(query)}, db=db)
+        if plan is None:
+            report.append({"query": name, "status": "error"})
+            continue
+        report.append(check_plan(name, query, plan, specs))
+    return report
+
+
+def format_report(report, created=None):
+    """The plan report as text, problems first."""
+    order = {"error": 0, "fail": 1, "warn": 2, "ok": 3}
+    lines = []
+    if created is not None:
+        lines.append("Created indexes: " + (", ".join(spec.name for spec in created) or "none"))
+    for entry in sorted(report, key=lambda e: (order[e["status"]], e["query"])):
+        line = f"{entry['status'].upper():5} {entry['query']}"
+        notes = []
+        if entry.get("missing_indexes"):
+            notes.append("no index use: " + ", ".join(entry["missing_indexes"]))
+        if entry.get("unknown_indexes"):
+            notes.append("index use unknown: " + ", ".join(entry["unknown_indexes"]))
+        if entry.get("cartesian_products"):
+            notes.append(f"{entry['cartesian_products']} cartesian product(s)")
+        if entry.get("label_scans"):
+            notes.append(f"{entry['label_scans']} label scan(s)")
+        lines.append(line + ("  " + "; ".join(notes) if notes else ""))
+    return "\n".join(lines)
+
+
+def check_release(conn, db=None, create=False, out=None):
+    """
+    Optionally create the missing indexes, then plan every registered query.
+    Prints the report and, if `out` is given, writes it as JSON.
+
+    Returns
+    -------
+    list of dict
+        The plan report.
+    """
+    created = ensure_indexes(conn, db) if create else None
+    if created is None:
+        missing = missing_indexes(existing_indexes(conn, db))
+        if missing:
+            print("Missing indexes:", ", ".join(spec.name for spec in missing))
+    report = plan_report(conn, db)
+    print(format_report(report, created))
+    if out is not None:
+        with open(out, "w") as f:
+            json.dump({"db": db, "created": [spec.name for spec in created or []], "queries": report},
+                      f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    from neo4jConfig import configDict
+    from neo4jConnection import Neo4jConnection
+
+    parser = argparse.ArgumentParser(description="Check the indexes and query plans of a Monarch KG release.")
+    parser.add_argument("--db", default=configDict['db'], help="Neo4j database to check")
+    parser.add_argument("--create", action="store_true", help="create the missing declared indexes first")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    conn = Neo4jConnection(uri=configDict['uri'], user=configDict['user'], pwd=configDict['pwd'])
+    try:
+        report = check_release(conn, args.db, args.create, args.out)
+    finally:
+        conn.close()
+    sys.exit(1 if any(entry["status"] in ("fail", "error") for entry in report) else 0)
@@ -0,0 +1,495 @@
+"""
+kgSnapshot.py
+
+Versioned columnar snapshot of the Monarch KG working set.
+
+export_snapshot pulls the tables every analysis here reads (genes, ortholog
+edges, gene-phenotype and gene-disease edges, phenotype namespaces, disease
+phenotypes and uPheno links) from Neo4j once per database and writes them as
+zstd-compressed Parquet files next to a manifest.json:
+
+    snapshots/monarch20250815/
+        manifest.json
+        genes.parquet
+        orthologs.parquet
+        ...
+
+SnapshotConnection answers the registered queries in queries.py from those
+files, so the analyses run against a snapshot without a Neo4j server. Set
+configDict['snapshot'] to a snapshot directory (or a directory of per-database
+snapshots) and neo4jConnection.connect() returns one.
+
+Usage:
+    python kgSnapshot.py snapshots --db monarch20250815
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import queries
+from neo4jConnection import DEFAULT_CHUNK_SIZE, QueryResult, RecordDecoder, concat_chunks, records_to_chunks
+from queries import QUERIES
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+# table name -> (export query, columns)
+SNAPSHOT_TABLES = {
+    "genes": (queries.snapshotGenes_query, ["id", "in_taxon", "degree"]),
+    "orthologs": (queries.snapshotOrthologs_query, ["subject", "object"]),
+    "gene_phenotypes": (queries.snapshotGenePhenotypes_query, ["gene", "phenotype", "predicate"]),
+    "gene_diseases": (queries.snapshotGeneDiseases_query, ["gene", "disease", "predicate"]),
+    "phenotypes": (queries.snapshotPhenotypes_query, ["id", "namespace", "type"]),
+    "disease_phenotypes": (queries.snapshotDiseasePhenotypes_query, ["disease", "phenotype"]),
+    "upheno_links": (queries.snapshotUphenoLinks_query, ["upheno", "phenotype"]),
+}
+
+# every other column is stored as a string
+INT_COLUMNS = {"degree"}
+
+HAS_PHENOTYPE = "biolink:has_phenotype"
+
+
+# -------------------------------
+# Export
+# -------------------------------
+def export_snapshot(conn, db, root="snapshots", tables=None):
+    """
+    Export the KG working set of database `db` to `root/db`.
+
+    Parameters
+    ----------
+    conn : Neo4jConnection
+        Live connection to read from.
+    db : str
+        Database name, e.g. "monarch20250815". Also names the snapshot directory.
+    root : str
+        Directory holding one snapshot directory per database.
+    tables : list, optional
+        Subset of SNAPSHOT_TABLES to export (default: all).
+
+    Returns
+    -------
+    str
+        Path of the snapshot directory.
+    """
+    path = os.path.join(root, db)
+    os.makedirs(path, exist_ok=True)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "db": db,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "tables": {},
+    }
+    for name in tables or SNAPSHOT_TABLES:
+        query, columns = SNAPSHOT_TABLES[name]
+        schema = pa.schema([(c, pa.int64() if c in INT_COLUMNS else pa.string()) for c in columns])
+        filename = f"{name}.parquet"
+        rows = 0
+        # stream the table to disk chunk by chunk so no export holds it all in memory
+        with pq.ParquetWriter(os.path.join(path, filename), schema, compression="zstd") as writer:
+            for chunk in conn.query_chunks(query, db=db, columns=columns):
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        manifest["tables"][name] = {"file": filename, "rows": rows, "columns": columns}
+        print(f"{name}: {rows} rows")
+
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+
+def read_manifest(path):
+    """Read and validate the manifest of the snapshot directory at `path`."""
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Snapshot {path} has format version {manifest.get('format_version')}, "
+                         f"expected {FORMAT_VERSION}")
+    return manifest
+
+
+# -------------------------------
+# Snapshot-backed data source
+# -------------------------------
+class SnapshotRecord(tuple):
+    """Minimal stand-in for neo4j.Record: a tuple whose values can also be read by key."""
+
+    def __new__(cls, keys, values):
+        record = super().__new__(cls, values)
+        record._keys = tuple(keys)
+        return record
+
+    def __reduce__(self):
+        return SnapshotRecord, (self._keys, tuple(self))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._keys.index(key)
+            except ValueError:
+                raise KeyError(key) from None
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except (KeyError, IndexError):
+            return default
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return list(zip(self._keys, self))
+
+    def data(self):
+        return dict(zip(self._keys, self))
+
+    def __repr__(self):
+        return "<Record %s>" % " ".join(f"{k}={v!r}" for k, v in zip(self._keys, self))
+
+
+def _records(keys, rows):
+    """Build SnapshotRecords from an iterable of value tuples."""
+    return [SnapshotRecord(keys, row) for row in rows]
+
+
+def _prefix_matches(ids, prefixes):
+    """Boolean matrix (ids x prefixes): does each id STARTS WITH each prefix."""
+    ids = pd.Series(ids, dtype=object).fillna("")
+    return np.column_stack([ids.str.startswith(p).to_numpy(dtype=bool) for p in prefixes]) \
+        if len(prefixes) else np.zeros((len(ids), 0), dtype=bool)
+
+
+class SnapshotConnection(RecordDecoder):
+    """
+    Read-only data source with the Neo4jConnection.query interface, backed by
+    a snapshot directory.
+
+    Queries are matched against the registry in queries.py by their text and
+    answered with pandas over the snapshot tables, so callers pass the same
+    registered query and parameters they would send to Neo4j. EXPLAIN queries
+    return no rows. Unregistered queries fail the same way
+    Neo4jConnection does: a message is printed and None is returned. A `db`
+    with no snapshot raises FileNotFoundError instead.
+
+    Parameters
+    ----------
+    path : str
+        Either a snapshot directory (containing manifest.json), which then
+        answers every `db`, or a directory of per-database snapshots, in which
+        case the `db` passed to query() picks the subdirectory.
+    default_db : str, optional
+        Database used when query() is called without `db`.
+    profiler : queryProfiler.QueryProfiler, optional
+        Records the time and row count of every query.
+    """
+
+    def __init__(self, path, default_db=None, profiler=None):
+        self.path = path
+        self.default_db = default_db
+        self.profiler = profiler
+        self._names = {text: name for name, text in QUERIES.items()}
+        self._snapshots = {}
+
+    def close(self):
+        self._snapshots.clear()
+
+    def query_many(self, jobs, db=None, max_workers=None, timeout=None):
+        """Answer (query, parameters) jobs in order as QueryResults, like Neo4jConnection.query_many."""
+        self.snapshot(db)
+        results = []
+        for query, parameters in jobs:
+            start = time.perf_counter()
+            try:
+                records = self.query_iter(query, parameters, db)
+                results.append(QueryResult(list(records), None, time.perf_counter() - start))
+            except Exception as e:
+                results.append(QueryResult(None, e, time.perf_counter() - start))
+        return results
+
+    def query_iter(self, query, parameters=None, db=None, fetch_size=None):
+        """Yield the records of query(); errors are raised as in Neo4jConnection.query_iter."""
+        response = self.query(query, parameters, db)
+        if response is None:
+            raise RuntimeError("Snapshot query failed")
+        yield from response
+
+    def query_chunks(self, query, parameters=None, db=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                     columns=None, fetch_size=None, arrow=False):
+        return records_to_chunks(self.query_iter(query, parameters, db), chunk_size, columns, arrow)
+
+    def query_df(self, query, parameters=None, db=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 columns=None, fetch_size=None, arrow=False):
+        return concat_chunks(self.query_chunks(query, parameters, db, chunk_size, columns, arrow=arrow),
+                             columns, arrow)
+
+    def snapshot(self, db=None):
+        """Return the _Snapshot serving database `db`."""
+        if os.path.exists(os.path.join(self.path, MANIFEST)):
+            path = self.path
+        else:
+            db = db or self.default_db
+            if db is None:
+                raise ValueError(f"{self.path} holds per-database snapshots; pass db")
+            path = os.path.join(self.path, db)
+            if not os.path.exists(os.path.join(path, MANIFEST)):
+                raise FileNotFoundError(f"No snapshot for db {db!r} in {self.path} (expected {path}/{MANIFEST})")
+        if path not in self._snapshots:
+            self._snapshots[path] = _Snapshot(path)
+        return self._snapshots[path]
+
+    def query(self, query, parameters=None, db=None):
+        """Answer a registered query from the snapshot and return its records."""
+        if query.lstrip().upper().startswith("EXPLAIN"):
+            return []
+        # a missing snapshot is a configuration error, not a failed query: raise it to the caller
+        snapshot = self.snapshot(db)
+        timer = self.profiler.start(query, db) if self.profiler is not None else None
+        response = None
+        try:
+            name = self._names.get(query)
+            if name is None:
+                raise KeyError("query is not in the queries.py registry")
+            handler = getattr(snapshot, "q_" + name, None)
+            if handler is None:
+                raise NotImplementedError(f"registered query '{name}' has no snapshot implementation")
+            response = handler(**(parameters or {}))
+            if timer is not None:
+                timer.finish(len(response))
+        except Exception as e:
+            print("Query failed:", e)
+            if timer is not None:
+                timer.finish(error=e)
+        return response
+
+
+class _Snapshot:
+    """Tables of one snapshot directory, loaded lazily, with one handler per registered query."""
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = read_manifest(path)
+        self._tables = {}
+        self._cache = {}
+
+    def table(self, name):
+        if name not in self._tables:
+            info = self.manifest["tables"][name]
+            self._tables[name] = pd.read_parquet(os.path.join(self.path, info["file"]), memory_map=True)
+        return self._tables[name]
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    # --- derived views ---
+    def orthologs_undirected(self):
+        """Ortholog edges in both directions as (n, m) columns, like an undirected MATCH."""
+        def build():
+            o = self.table("orthologs")
+            return pd.concat([
+                pd.DataFrame({"n": o["subject"].to_numpy(), "m": o["object"].to_numpy()}),
+                pd.DataFrame({"n": o["object"].to_numpy(), "m": o["subject"].to_numpy()}),
+            ], ignore_index=True)
+        return self._cached("orthologs_undirected", build)
+
+    def orthologs_by_gene(self):
+        return self._cached("orthologs_by_gene",
+                            lambda: self.orthologs_undirected().groupby("m")["n"].apply(list).to_dict())
+
+    def gene_ids(self):
+        return self._cached("gene_ids", lambda: set(self.table("genes")["id"]))
+
+    def phenotype_counts(self, has_phenotype_only=False):
+        def build():
+            gp = self.table("gene_phenotypes")
+            if has_phenotype_only:
+                gp = gp[gp["predicate"] == HAS_PHENOTYPE]
+            return gp.groupby("gene").size().to_dict()
+        return self._cached(("phenotype_counts", has_phenotype_only), build)
+
+    def disease_counts(self):
+        return self._cached("disease_counts",
+                            lambda: self.table("gene_diseases").groupby("gene").size().to_dict())
+
+    def phenotypes_by_gene(self):
+        def build():
+            gp = self.table("gene_phenotypes")
+            gp = gp[gp["predicate"] == HAS_PHENOTYPE]
+            return gp.groupby("gene")["phenotype"].apply(list).to_dict()
+        return self._cached("phenotypes_by_gene", build)
+
+    # --- Basic queries ---
+    def q_nameHGNC(self):
+        ids = self.table("genes")["id"]
+        return _records(["m.id"], ((g,) for g in ids[ids.str.startswith("HGNC")]))
+
+    def q_nameHGNCOrthos(self):
+        o = self.orthologs_undirected()
+        o = o[o["m"].str.startswith("HGNC")]
+        return _records(["n.id", "m.id"], zip(o["n"], o["m"]))
+
+    def q_nameHGNCPhens(self):
+        gp = self.table("gene_phenotypes")
+        gp = gp[(gp["predicate"] == HAS_PHENOTYPE) & gp["gene"].str.startswith("HGNC")]
+        return _records(["n.id", "m.id"], zip(gp["phenotype"], gp["gene"]))
+
+    def q_namePhens(self):
+        p = self.table("phenotypes")
+        return _records(["phenotype.id", "phenotype.namespace"], zip(p["id"], p["namespace"]))
+
+    def q_categoryCounts(self, categories):
+        members = pd.DataFrame(categories, columns=["category", "members"]).explode("members")
+        p = self.table("phenotypes")
+        matched = members.merge(p, left_on="members", right_on="id")
+        counts = matched.groupby(["category", "namespace"], dropna=False, sort=False).size()
+        return _records(["category", "ontology", "count"], ((c, ns, int(v)) for (c, ns), v in counts.items()))
+
+    def q_diseasePhens(self):
+        grouped = self.table("disease_phenotypes").groupby("disease", sort=False)["phenotype"].apply(list)
+        return _records(["d.id", "collect(p.id)"], grouped.items())
+
+    def q_geneDisease(self):
+        gd = self.table("gene_diseases")
+        return _records(["gene", "disease"], zip(gd["gene"], gd["disease"]))
+
+    def q_geneAnnotationTypes(self):
+        # interactions, activities, expression and pathways are not in the snapshot: null
+        g = self.table("genes")
+        phenotype = g["id"].isin(self.table("gene_phenotypes")["gene"])
+        disease = g["id"].isin(self.table("gene_diseases")["gene"])
+        return _records(["gene", "taxon", "phenotype", "disease", "interaction", "activity", "expression", "pathway"],
+                        ((gene, taxon, bool(p), bool(d), None, None, None, None)
+                         for gene, taxon, p, d in zip(g["id"], g["in_taxon"], phenotype, disease)))
+
+    # --- Snapshot export queries: the stored tables themselves ---
+    def _table_records(self, name):
+        columns = SNAPSHOT_TABLES[name][1]
+        t = self.table(name)
+        return _records(columns, zip(*(t[c] for c in columns)))
+
+    def q_snapshotGenes(self):
+        return self._table_records("genes")
+
+    def q_snapshotOrthologs(self):
+        return self._table_records("orthologs")
+
+    def q_snapshotGenePhenotypes(self):
+        return self._table_records("gene_phenotypes")
+
+    def q_snapshotGeneDiseases(self):
+        return self._table_records("gene_diseases")
+
+    # --- Summary statistics ---
+    def q_geneEdgeCounts(self):
+        stats = self.table("genes").groupby("in_taxon", dropna=False)["degree"].agg(["sum", "mean", "size"])
+        return _records(["taxon", "total_edges", "avg_edges", "gene_count"],
+                        ((t, int(row["sum"]), float(row["mean"]), int(row["size"])) for t, row in stats.iterrows()))
+
+    def q_geneDegrees(self):
+        g = self.table("genes")
+        return _records(["gene", "taxon", "edge_count"],
+                        zip(g["id"], g["in_taxon"], (int(d) for d in g["degree"])))
+
+    def q_phenCountsByNamespace(self):
+        counts = self.table("phenotypes").groupby("namespace", dropna=False).size()
+        return _records(["feature_count", "type"], ((int(v), t) for t, v in counts.items()))
+
+    def q_phenCountsByType(self):
+        counts = self.table("phenotypes").groupby("type", dropna=False).size()
+        return _records(["type", "feature_count"], ((t, int(v)) for t, v in counts.items()))
+
+    def q_geneCountsByTaxon(self):
+        counts = self.table("genes").groupby("in_taxon", dropna=False).size()
+        return _records(["taxon", "gene_count"], ((t, int(v)) for t, v in counts.items()))
+
+    # --- Gene-specific queries ---
+    def q_namesgeneOrthos(self, gene):
+        return _records(["n.id", "m.id"], ((n, gene) for n in self.orthologs_by_gene().get(gene, [])))
+
+    def q_numgeneDis(self, gene):
+        return _records(["count(*)"], [(self.disease_counts().get(gene, 0),)])
+
+    def q_numGenePhens(self, gene):
+        return _records(["count(*)"], [(self.phenotype_counts().get(gene, 0),)])
+
+    def q_numGenePhen(self, gene):
+        return _records(["count(*)"], [(self.phenotype_counts(has_phenotype_only=True).get(gene, 0),)])
+
+    def q_nameGenePhen(self, gene):
+        return _records(["n.id"], ((p,) for p in self.phenotypes_by_gene().get(gene, [])))
+
+    def q_genePhens_batch(self, genes):
+        phenotypes = self.phenotypes_by_gene()
+        return _records(["gene", "phenotypes"], ((g, phenotypes[g]) for g in genes if g in phenotypes))
+
+    # --- Organism-level queries ---
+    def orthologs_by_taxon(self):
+        def build():
+            taxon = self.table("genes").set_index("id")["in_taxon"]
+            o = self.orthologs_undirected()
+            return pd.DataFrame({"taxon1": o["n"].map(taxon), "taxon2": o["m"].map(taxon)})
+        return self._cached("orthologs_by_taxon", build)
+
+    def q_numGeneOrthoTaxon(self, taxon1, taxon2):
+        o = self.orthologs_by_taxon()
+        return _records(["count(*)"], [(int(((o["taxon1"] == taxon1) & (o["taxon2"] == taxon2)).sum()),)])
+
+    def q_orthoTaxonMatrix(self, taxa):
+        o = self.orthologs_by_taxon()
+        o = o[o["taxon1"].isin(taxa) & o["taxon2"].isin(taxa)]
+        counts = o.groupby(["taxon1", "taxon2"]).size()
+        return _records(["taxon1", "taxon2", "count"], ((t1, t2, int(v)) for (t1, t2), v in counts.items()))
+
+    def q_numOrgPhens(self, prefix):
+        gp = self.table("gene_phenotypes")
+        n = ((gp["predicate"] == HAS_PHENOTYPE) & gp["gene"].str.startswith(prefix)).sum()
+        return _records(["count(*)"], [(int(n),)])
+
+    def q_uphenoPrefixMatrix(self, prefixes):
+        # For each uPheno term u, a (n, m) path pairs two distinct edges incident
+        # to u: sum_u C[u,p1] * C[u,p2] minus the pairs that reuse one edge.
+        prefixes = list(prefixes)
+        links = self.table("upheno_links")
+        matches = _prefix_matches(links["phenotype"], prefixes).astype(np.int64)
+        per_term = pd.DataFrame(matches).groupby(links["upheno"].to_numpy()).sum().to_numpy()
+        pairs = per_term.T @ per_term - matches.T @ matches
+        return _records(["prefix1", "prefix2", "count"],
+                        ((p1, p2, int(pairs[i, j])) for i, p1 in enumerate(prefixes)
+                         for j, p2 in enumerate(prefixes) if pairs[i, j]))
+
+    def q_numUPHENOrg(self, prefix1, prefix2):
+        counts = {(r[0], r[1]): r[2] for r in self.q_uphenoPrefixMatrix([prefix1, prefix2])}
+        return _records(["count(*)"], [(counts.get((prefix1, prefix2), 0),)])
+
+
+if __name__ == "__main__":
+    from neo4jConfig import configDict
+    from neo4jConnection import Neo4jConnection
+
+    parser = argparse.ArgumentParser(description="Export a columnar snapshot of the Monarch KG working set.")
+    parser.add_argument("root", nargs="?", default="snapshots", help="directory holding per-database snapshots")
+    parser.add_argument("--db", default=configDict['db'], help="Neo4j database to export")
+    parser.add_argument("--tables", nargs="+", choices=list(SNAPSHOT_TABLES), help="subset of tables to export")
+    args = parser.parse_args()
+
+    conn = Neo4jConnection(uri=configDict['uri'], user=configDict['user'], pwd=configDict['pwd'])
+    try:
+        print("Snapshot written to", export_snapshot(conn, args.db, args.root, args.tables))
+    finally:
+        conn.close()
@@ -0,0 +1,363 @@
+"""
+kgxGraph.py
+
+In-memory Monarch KG loaded from the KGX TSV node and edge files, for
+analyses that run on NumPy arrays instead of Neo4j.
+
+Nodes are numbered 0..n-1 in file order. Their id, prefix, first category,
+namespace and in_taxon are kept as columns (prefix, category, namespace and
+taxon as pandas Categoricals). Edges are stored as integer CSR adjacency
+arrays, one pair per predicate:
+
+    out[predicate]  subject -> objects   (indptr, indices)
+    in_[predicate]  object  -> subjects
+
+Primitives: neighbors (by predicate and direction, for one node or many),
+degree, prefix / taxon / category filters, two_hop (e.g. phenotype ->
+uPheno term -> phenotype) and scipy adjacency matrices. save() writes the
+arrays as .npy files that open() memory-maps, so later runs skip the TSV parse.
+
+Usage:
+    python kgxGraph.py monarch-kg_nodes.tsv monarch-kg_edges.tsv kgx_graph
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+FORMAT_VERSION = 1
+
+ORTHOLOGOUS_TO = "biolink:orthologous_to"
+HAS_PHENOTYPE = "biolink:has_phenotype"
+
+NODE_COLUMNS = ["id", "category", "namespace", "in_taxon"]
+EDGE_COLUMNS = ["subject", "predicate", "object"]
+CHUNK_SIZE = 1_000_000
+
+
+def _csr(sources, targets, n):
+    """CSR (indptr, indices) of the edges sources -> targets over n nodes."""
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
+
+
+def _read_tsv(path, columns, chunk_size=CHUNK_SIZE):
+    """Read the wanted columns of a KGX TSV file in chunks; missing columns are filled with None."""
+    present = pd.read_csv(path, sep="\t", nrows=0).columns
+    chunks = pd.read_csv(path, sep="\t", usecols=[c for c in columns if c in present], dtype=str,
+                         keep_default_na=False, na_values=[""], quoting=3, chunksize=chunk_size)
+    for chunk in chunks:
+        for c in columns:
+            if c not in chunk:
+                chunk[c] = None
+        yield chunk[columns]
+
+
+class KGXGraph:
+    """
+    Integer-indexed KG with per-predicate CSR adjacency.
+
+    Parameters
+    ----------
+    nodes : pd.DataFrame
+        One row per node: id, prefix, category, namespace, taxon.
+    out, in_ : dict
+        predicate -> (indptr, indices) of outgoing / incoming edges.
+    """
+
+    def __init__(self, nodes, out, in_):
+        self.nodes = nodes
+        self.ids = nodes["id"].to_numpy()
+        self.index = pd.Index(self.ids)
+        self.out = out
+        self.in_ = in_
+        # predicate -> edge number of each incoming CSR entry (see _edge_numbers)
+        self._in_edges = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def predicates(self):
+        return list(self.out)
+
+    # -------------------------------
+    # Loading
+    # -------------------------------
+    @classmethod
+    def from_frames(cls, nodes, edges):
+        """
+        Build from node (id, category, namespace, in_taxon) and edge (subject,
+        predicate, object) DataFrames. Edges with an endpoint missing from
+        nodes are dropped.
+        """
+        nodes = nodes.drop_duplicates("id", ignore_index=True)
+        ids = nodes["id"].astype(str)
+        frame = pd.DataFrame({
+            "id": ids.to_numpy(dtype=object),
+            "prefix": ids.str.split(":", n=1).str[0].astype("category"),
+            "category": nodes["category"].str.split("|", n=1).str[0].astype("category"),
+            "namespace": nodes["namespace"].astype("category"),
+            "taxon": nodes["in_taxon"].astype("category"),
+        })
+        index = pd.Index(frame["id"])
+        subjects = index.get_indexer(edges["subject"])
+        objects = index.get_indexer(edges["object"])
+        known = (subjects >= 0) & (objects >= 0)
+        if not known.all():
+            print(f"Dropped {int((~known).sum())} edges with endpoints missing from the nodes")
+        predicates = pd.Categorical(edges["predicate"].to_numpy()[known])
+        subjects, objects = subjects[known], objects[known]
+
+        out, in_ = {}, {}
+        for code, predicate in enumerate(predicates.categories):
+            mask = predicates.codes == code
+            out[predicate] = _csr(subjects[mask], objects[mask], len(frame))
+            in_[predicate] = _csr(objects[mask], subjects[mask], len(frame))
+        return cls(frame, out, in_)
+
+    @classmethod
+    def load_kgx(cls, nodes_path, edges_path, predicates=None, chunk_size=CHUNK_SIZE):
+        """
+        Load KGX node and edge TSV files.
+
+        Parameters
+        ----------
+        predicates : list, optional
+            Only keep edges with these predicates (default: all).
+        """
+        nodes = pd.concat(_read_tsv(nodes_path, NODE_COLUMNS, chunk_size), ignore_index=True)
+        edges = []
+        for chunk in _read_tsv(edges_path, EDGE_COLUMNS, chunk_size):
+            if predicates is not None:
+                chunk = chunk[chunk["predicate"].isin(predicates)]
+            edges.append(chunk)
+        edges = pd.concat(edges, ignore_index=True) if edges else pd.DataFrame(columns=EDGE_COLUMNS)
+        return cls.from_frames(nodes, edges)
+
+    def save(self, path):
+        """Write the graph as .npy arrays plus nodes.parquet for open()."""
+        os.makedirs(path, exist_ok=True)
+        self.nodes.to_parquet(os.path.join(path, "nodes.parquet"), index=False)
+        files = {}
+        for direction, adjacency in (("out", self.out), ("in", self.in_)):
+            for i, (predicate, (indptr, indices)) in enumerate(adjacency.items()):
+                stem = f"{direction}-{i}"
+                np.save(os.path.join(path, stem + "-indptr.npy"), indptr)
+                np.save(os.path.join(path, stem + "-indices.npy"), indices)
+                files.setdefault(direction, {})[predicate] = stem
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            json.dump({"format_version": FORMAT_VERSION, "nodes": len(self), "adjacency": files}, f, indent=2)
+        return path
+
+    @classmethod
+    def open(cls, path):
+        """Open a graph written by save(), memory-mapping the adjacency arrays."""
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Graph {path} has format version {manifest.get('format_version')}, "
+                             f"expected {FORMAT_VERSION}")
+
+        def arrays(stem):
+            return (np.load(os.path.join(path, stem + "-indptr.npy"), mmap_mode="r"),
+                    np.load(os.path.join(path, stem + "-indices.npy"), mmap_mode="r"))
+        adjacency = {direction: {p: arrays(stem) for p, stem in manifest["adjacency"].get(direction, {}).items()}
+                     for direction in ("out", "in")}
+        return cls(pd.read_parquet(os.path.join(path, "nodes.parquet")), adjacency["out"], adjacency["in"])
+
+    # -------------------------------
+    # Node lookups and filters
+    # -------------------------------
+    def lookup(self, ids):
+        """Node numbers of IDs; -1 for IDs not in the graph."""
+        return self.index.get_indexer(pd.Index(np.atleast_1d(ids)))
+
+    def has_prefix(self, prefixes):
+        """Boolean mask of nodes whose ID prefix is one of prefixes."""
+        return self.nodes["prefix"].isin(np.atleast_1d(prefixes)).to_numpy()
+
+    def starts_with(self, prefix):
+        """Boolean mask of nodes whose ID starts with prefix, like Cypher STARTS WITH."""
+        return pd.Series(self.ids).str.startswith(prefix).to_numpy(dtype=bool)
+
+    def in_taxon(self, taxa):
+        """Boolean mask of nodes in any of the taxa."""
+        return self.nodes["taxon"].isin(np.atleast_1d(taxa)).to_numpy()
+
+    def has_category(self, categories):
+        """Boolean mask of nodes whose (first) category is one of categories."""
+        return self.nodes["category"].isin(np.atleast_1d(categories)).to_numpy()
+
+    # -------------------------------
+    # Adjacency
+    # -------------------------------
+    def _adjacency(self, predicate, direction, edges=False):
+        """
+        CSR (indptr, indices) parts for the predicate(s) and direction; with
+        edges=True each part also carries the edge number of every entry.
+        """
+        if direction not in ("out", "in", "both"):
+            raise ValueError(f"Unknown direction: {direction}")
+        predicates = self.predicates if predicate is None else np.atleast_1d(predicate)
+        parts = []
+        for p in predicates:
+            if p not in self.out:
+                continue
+            if direction in ("out", "both"):
+                parts.append(self.out[p] + ((self._edge_numbers(p, "out"),) if edges else ()))
+            if direction in ("in", "both"):
+                parts.append(self.in_[p] + ((self._edge_numbers(p, "in"),) if edges else ()))
+        return parts
+
+    def _edge_numbers(self, predicate, direction):
+        """
+        Edge number of every CSR entry of one predicate: edges are numbered by
+        their position in the outgoing CSR, offset per predicate, and each
+        incoming entry gets the number of the same edge. Parallel edges are
+        told apart by their order among the entries with the same subject and
+        object.
+        """
+        base = 0
+        for p in self.predicates:
+            if p == predicate:
+                break
+            base += len(self.out[p][1])
+        if direction == "out":
+            return base + np.arange(len(self.out[predicate][1]), dtype=np.int64)
+        if predicate not in self._in_edges:
+            def entries(indptr, indices):
+                indptr = np.asarray(indptr)
+                return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)), np.asarray(indices)
+            subjects, objects = entries(*self.out[predicate])
+            in_objects, in_subjects = entries(*self.in_[predicate])
+            # both orders are stable, so the k-th (subject, object) entry of one
+            # view pairs with the k-th of the other
+            in_order = np.lexsort((in_objects, in_subjects))
+            numbers = np.empty(len(in_order), dtype=np.int64)
+            numbers[in_order] = np.lexsort((objects, subjects))
+            self._in_edges[predicate] = numbers
+        return base + self._in_edges[predicate]
+
+    def degree(self, predicate=None, direction="both"):
+        """Degree of every node over the given predicate(s) (default: all) as an int64 array."""
+        degree = np.zeros(len(self), dtype=np.int64)
+        for indptr, _ in self._adjacency(predicate, direction):
+            degree += np.diff(indptr)
+        return degree
+
+    def neighbors(self, node, predicate=None, direction="both"):
+        """Neighbour node numbers of one node (with repeats for parallel edges)."""
+        parts = [indices[indptr[node]:indptr[node + 1]] for indptr, indices in self._adjacency(predicate, direction)]
+        return np.concatenate(parts).astype(np.int64) if parts else np.empty(0, dtype=np.int64)
+
+    def edges_from(self, nodes, predicate=None, direction="both", edges=False):
+        """
+        Every edge incident to the given nodes, vectorized.
+
+        Returns
+        -------
+        sources, targets : np.ndarray
+            sources[i] is one of `nodes`, targets[i] its neighbour.
+        edges : np.ndarray
+            With edges=True, also the edge number of each entry; an edge seen
+            from both of its ends has the same number.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        sources, targets, numbers = [], [], []
+        for part in self._adjacency(predicate, direction, edges):
+            indptr, indices = part[:2]
+            starts, ends = np.asarray(indptr)[nodes], np.asarray(indptr)[nodes + 1]
+            counts = ends - starts
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            sources.append(np.repeat(nodes, counts))
+            targets.append(np.asarray(indices)[offsets].astype(np.int64))
+            if edges:
+                numbers.append(part[2][offsets])
+        empty = np.empty(0, dtype=np.int64)
+        result = [np.concatenate(a) if a else empty for a in (sources, targets) + ((numbers,) if edges else ())]
+        return tuple(result)
+
+    def two_hop(self, nodes, via, predicate=None, second_predicate=None, direction="both"):
+        """
+        Paths node -> middle -> end where the middle node is in the `via` mask,
+        e.g. phenotype -> uPheno term -> phenotype with via=starts_with("UPHENO").
+        As in a Cypher path pattern, the two hops never reuse the same edge.
+
+        Returns
+        -------
+        sources, middles, ends : np.ndarray
+            One entry per path.
+        """
+        sources, middles, first = self.edges_from(nodes, predicate, direction, edges=True)
+        keep = via[middles]
+        sources, middles, first = sources[keep], middles[keep], first[keep]
+        unique, inverse = np.unique(middles, return_inverse=True)
+        mids, ends, second = self.edges_from(unique, predicate if second_predicate is None else second_predicate,
+                                             direction, edges=True)
+        # join each first hop with every second hop from the same middle node
+        order = np.argsort(mids, kind="stable")
+        mids, ends, second = mids[order], ends[order], second[order]
+        starts = np.searchsorted(mids, unique, side="left")
+        counts = np.searchsorted(mids, unique, side="right") - starts
+        per_path = counts[inverse]
+        offsets = np.repeat(starts[inverse] - np.cumsum(per_path) + per_path, per_path) + np.arange(per_path.sum())
+        sources, middles, ends = np.repeat(sources, per_path), np.repeat(middles, per_path), ends[offsets]
+        # drop the paths that go back over the first hop's own edge; parallel and
+        # reverse edges back to the start node are other edges and stay
+        keep = np.repeat(first, per_path) != second[offsets]
+        return sources[keep], middles[keep], ends[keep]
+
+    def adjacency_matrix(self, predicate=None, direction="both"):
+        """n x n scipy CSR matrix of edge counts over the given predicate(s)."""
+        matrix = sparse.csr_matrix((len(self), len(self)), dtype=np.int64)
+        for indptr, indices in self._adjacency(predicate, direction):
+            data = np.ones(len(indices), dtype=np.int64)
+            matrix = matrix + sparse.csr_matrix((data, np.asarray(indices), np.asarray(indptr)),
+                                                shape=(len(self), len(self)))
+        return matrix
+
+
+# -------------------------------
+# Analyses on the graph
+# -------------------------------
+def ortholog_taxon_matrix(graph, taxa):
+    """Ortholog edges between genes of each pair of taxa (both directions), like orthoTaxonMatrix_query."""
+    sources, targets = graph.edges_from(np.flatnonzero(graph.in_taxon(taxa)), ORTHOLOGOUS_TO)
+    taxon = graph.nodes["taxon"]
+    pairs = pd.DataFrame({"taxon1": taxon.to_numpy()[sources], "taxon2": taxon.to_numpy()[targets]})
+    pairs = pairs[pairs["taxon2"].isin(taxa)]
+    counts = pairs.groupby(["taxon1", "taxon2"], observed=True).size()
+    return counts.unstack(fill_value=0).reindex(index=taxa, columns=taxa, fill_value=0)
+
+
+def upheno_prefix_matrix(graph, prefixes, via_prefix="UPHENO"):
+    """
+    Phenotype -> uPheno term -> phenotype paths between each pair of phenotype
+    ID prefixes, like uphenoPrefixMatrix_query.
+    """
+    via = graph.starts_with(via_prefix)
+    matches = np.column_stack([graph.starts_with(p) for p in prefixes])
+    starts = np.flatnonzero(matches.any(axis=1))
+    sources, _, ends = graph.two_hop(starts, via)
+    counts = matches[sources].T.astype(np.int64) @ matches[ends].astype(np.int64)
+    return pd.DataFrame(counts, index=list(prefixes), columns=list(prefixes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load KGX node/edge TSV files into a memory-mappable CSR graph.")
+    parser.add_argument("nodes", help="KGX nodes TSV")
+    parser.add_argument("edges", help="KGX edges TSV")
+    parser.add_argument("out_dir", nargs="?", default="kgx_graph")
+    parser.add_argument("--predicates", nargs="+", help="edge predicates to keep (default: all)")
+    args = parser.parse_args()
+
+    graph = KGXGraph.load_kgx(args.nodes, args.edges, args.predicates)
+    print(f"{len(graph)} nodes, predicates: {', '.join(graph.predicates)}")
+    print("Graph written to", graph.save(args.out_dir))
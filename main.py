@@ -1,20 +1,11 @@
 import pandas as pd
-import os, json, statistics
-import upsetplot as usplt
-from matplotlib import pyplot as plt
-import seaborn as sns
-from matplotlib.colors import LogNorm
-from sqlalchemy.dialects.mssql.information_schema import columns
-from matplotlib.colors import LogNorm
-from neo4jConnection import Neo4jConnection
+from neo4jConnection import lazy_connect
 from neo4jConfig import configDict
 
-#import orthologSankey, neo4jQueries, neo4jConfig, neo4jConnection, phenotypeCategories, queries
-import queries, neo4jConfig, neo4jConnection
+import queries
 
-conn = Neo4jConnection(uri=configDict['uri'],
-                       user=configDict['user'],
-                       pwd=configDict['pwd'])
+# connection to neo4j, opened on the first query
+conn = lazy_connect(configDict)
 
 db = configDict['db']
 
@@ -23,21 +14,34 @@ db = configDict['db']
 # -------------------------------
 def get_gene_taxon_counts():
     """
-    Query Neo4j for the number of edges connected to each taxon gene type.
+    Query Neo4j for the edges connected to the genes of each taxon, aggregated
+    on the server from per-gene degree lookups.
 
     Returns
     -------
     pd.DataFrame
-        A DataFrame with:
-        - edge_count: number of edges connected to the gene
-        - taxon: the NCBITaxon identifier for the gene
+        A DataFrame with one row per taxon containing:
+        - taxon: the NCBITaxon identifier
+        - total_edges: total number of edges across all genes in that taxon
+        - avg_edges: average number of edges per gene in that taxon
+        - gene_count: number of genes in that taxon
     """
-    query = '''
-    MATCH (g:`biolink:Gene`)-[e]-()
-    RETURN count(e) AS edge_count, g.in_taxon AS taxon
-    '''
-    response = conn.query(query, db=configDict['db'])
-    return pd.DataFrame(response)
+    return queries.get_gene_edge_counts_by_taxon(conn, db=configDict['db'])
+
+# -------------------------------
+# Query 2: Gene edge counts by relationship type
+# -------------------------------
+def get_gene_edge_type_counts():
+    """
+    Query Neo4j for the edges connected to the genes of each taxon,
+    broken down by relationship type.
+
+    Returns
+    -------
+    pd.DataFrame
+        taxon x relationship type edge counts.
+    """
+    return queries.get_gene_edge_counts_by_type(conn, db=configDict['db'])
 
 # -------------------------------
 # Query 3: Phenotypic feature counts by type
@@ -54,11 +58,7 @@ def get_phenotypic_feature_counts_by_type():
         - type: the category/type of the phenotypic feature
         - feature_count: number of phenotypic features of this type
     """
-    query = '''
-    MATCH (g:`biolink:PhenotypicFeature`)
-    RETURN count(g) AS feature_count, g.namespace AS type
-    '''
-    response = conn.query(query, db=configDict['db'])
+    response = conn.query(queries.phenCountsByNamespace_query, db=configDict['db'])
     return pd.DataFrame(response)
 
 def get_gene_counts_by_taxon():
@@ -72,13 +72,32 @@ def get_gene_counts_by_taxon():
         - taxon: the NCBITaxon identifier
         - gene_count: number of genes in that taxon
     """
-    query = '''
-    MATCH (g:`biolink:Gene`)
-    RETURN g.in_taxon AS taxon, count(g) AS gene_count
-    '''
-    response = conn.query(query, db=configDict['db'])
+    response = conn.query(queries.geneCountsByTaxon_query, db=configDict['db'])
     return pd.DataFrame(response)
 
+# -------------------------------
+# Query 4: Ortholog annotation gaps
+# -------------------------------
+def get_ortholog_gap_counts():
+    """
+    Count the human genes lacking each annotation type while at least one
+    of their orthologs has it, from coverageBitmaps annotation bitmaps.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per available annotation type containing:
+        - annotation: the annotation type (phenotype, disease, ...)
+        - human_genes: human genes with that annotation
+        - gap: human genes without it whose orthologs have it
+    """
+    from coverageBitmaps import CoverageIndex
+    coverage = CoverageIndex.from_connection(conn, db=configDict['db'])
+    human = coverage.prefix("HGNC")
+    rows = [(name, len(coverage.annotated(name) & human), gap)
+            for name, gap in coverage.gap_counts(human).items()]
+    return pd.DataFrame(rows, columns=["annotation", "human_genes", "gap"])
+
 
 # -------------------------------
 # Usage
@@ -88,6 +107,10 @@ if __name__ == "__main__":
     print("Taxon gene edge counts:")
     print(raw_gene_results)
 
+    type_results = get_gene_edge_type_counts()
+    print("\nGene edge counts by relationship type:")
+    print(type_results)
+
     phen_results = get_phenotypic_feature_counts_by_type()
     print("\nPhenotypic feature counts by type:")
     print(phen_results)
@@ -95,3 +118,9 @@ if __name__ == "__main__":
     gene_counts = get_gene_counts_by_taxon()
     print("Number of genes per taxon:")
     print(gene_counts)
+
+    print("\nHuman genes lacking an annotation type their orthologs have:")
+    print(get_ortholog_gap_counts())
+
+    if getattr(conn, 'cache', None) is not None:
+        print("Query cache:", conn.cache.stats())
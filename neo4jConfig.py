@@ -1,5 +1,19 @@
 configDict = {'db': 'monarch20250815',
     'uri': "bolt://localhost:7687",
     'user': "",
-    'pwd': ""}
+    'pwd': "",
+    # path to a kgSnapshot directory; when set, connect() reads it instead of Neo4j
+    'snapshot': None,
+    # directory for the persistent query result cache (queryCache.py); None disables it
+    'cache_dir': None,
+    # per-query profiling (queryProfiler.py): report written at exit, .json or .prom; None disables it
+    'profile_report': None,
+    # queries at least this many milliseconds long go to the slow-query log (also enables profiling)
+    'slow_query_ms': None,
+    # JSON-lines file for the slow-query log; printed if None
+    'slow_query_log': None,
+    # share of queries sent with PROFILE to record their db hits
+    'profile_sample_rate': 0.0,
+    # pre-plan registered queries when a Neo4j connection opens: True for all, or a list of names
+    'warmup': False}
 
@@ -1,15 +1,103 @@
-from neo4j import GraphDatabase
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# records pulled from the server per round trip when streaming
+DEFAULT_FETCH_SIZE = 1000
+# rows per DataFrame chunk built by query_chunks / query_df
+DEFAULT_CHUNK_SIZE = 50000
+# concurrent sessions used by query_many
+DEFAULT_WORKERS = 8
+
+# outcome of one query_many job: records is None when error is set
+QueryResult = namedtuple("QueryResult", ["records", "error", "elapsed"])
+
+
+class RecordDecoder:
+    """
+    Typed decoding of query() results, shared by Neo4jConnection and
+    kgSnapshot.SnapshotConnection. Values are read from the records by
+    position; like query(), a failed query prints its error and returns None.
+    """
+
+    def scalar(self, query, parameters=None, db=None, default=None):
+        """First value of the first record, e.g. a count; `default` if there are no rows."""
+        response = self.query(query, parameters, db)
+        if response is None:
+            return None
+        return response[0][0] if response else default
+
+    def column(self, query, parameters=None, db=None, index=0, dtype=object, arrow=False):
+        """
+        One column of the result as a NumPy array of `dtype` (or a pyarrow Array).
+
+        Parameters
+        ----------
+        index : int or str
+            Position or key of the column.
+        dtype : numpy dtype
+            Use e.g. np.int64 for counts; the default keeps the values as objects.
+        """
+        response = self.query(query, parameters, db)
+        if response is None:
+            return None
+        if isinstance(index, int):
+            # records are tuples; plain tuple indexing skips Record.__getitem__'s key handling
+            values = [row[index] for row in map(tuple, response)]
+        else:
+            values = [record[index] for record in response]
+        if arrow:
+            import pyarrow as pa
+            return pa.array(values)
+        import numpy as np
+        if np.dtype(dtype) == object:
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+            return array
+        return np.array(values, dtype=dtype)
+
+    def pairs(self, query, parameters=None, db=None):
+        """The first two values of every record as a list of tuples."""
+        response = self.query(query, parameters, db)
+        if response is None:
+            return None
+        return [row[:2] for row in map(tuple, response)]
+
+    @staticmethod
+    def records_to_frame(records, dtypes=None, columns=None):
+        """
+        Decode records (e.g. a query() response or QueryResult.records) into a
+        DataFrame.
+
+        Parameters
+        ----------
+        dtypes : dict, optional
+            column -> dtype; columns not listed keep the inferred dtype.
+        columns : list, optional
+            Column names; defaults to the keys of the first record, or the
+            dtypes keys when there are no records.
+        """
+        import pandas as pd
+        if columns is None:
+            columns = list(records[0].keys()) if records else list(dtypes or {})
+        df = pd.DataFrame.from_records([tuple(record) for record in records or []], columns=columns)
+        return df.astype(dtypes) if dtypes else df
 
 
 # code to create neo4j connection taken from: https://towardsdatascience.com/create-a-graph-database-in-neo4j-using-python-4172d40f89c4
-class Neo4jConnection:
+class Neo4jConnection(RecordDecoder):
 
-    def __init__(self, uri, user, pwd):
+    def __init__(self, uri, user, pwd, cache=None, profiler=None):
         self.__uri = uri
         self.__user = user
         self.__pwd = pwd
         self.__driver = None
+        # optional queryCache.QueryCache; results are stored as (keys, rows)
+        self.cache = cache
+        # optional queryProfiler.QueryProfiler timing every query
+        self.profiler = profiler
         try:
+            from neo4j import GraphDatabase
             self.__driver = GraphDatabase.driver(self.__uri, auth=(self.__user, self.__pwd))
         except Exception as e:
             print("Failed to create the driver:", e)
@@ -18,18 +106,317 @@ class Neo4jConnection:
         if self.__driver is not None:
             self.__driver.close()
 
+    def _timer(self, query, db):
+        return self.profiler.start(query, db) if self.profiler is not None else None
+
+    def _run(self, session, query, parameters, timer=None, timeout=None):
+        """
+        Run a query in `session` and collect its records. With a timer the
+        time to first record, row count and result summary are recorded, and
+        sampled queries are sent with PROFILE.
+        """
+        from neo4j import Query
+        if timer is not None and self.profiler.sample_profile(query):
+            query = "PROFILE " + query
+        result = session.run(Query(query, timeout=timeout) if timeout is not None else query, parameters)
+        if timer is None:
+            return list(result)
+        records = []
+        for record in result:
+            timer.first_record()
+            records.append(record)
+        timer.finish(len(records), result.consume())
+        return records
+
     def query(self, query, parameters=None, db=None):
+        """Run a Cypher query, binding `parameters` to its $placeholders, and return its records."""
+        timer = self._timer(query, db)
+        if self.cache is not None:
+            hit, packed = self.cache.get(db, query, parameters)
+            if hit:
+                response = unpack_records(packed)
+                if timer is not None:
+                    timer.finish(len(response), cached=True)
+                return response
         assert self.__driver is not None, "Driver not initialized!"
         session = None
         response = None
         try:
             session = self.__driver.session(database=db) if db is not None else self.__driver.session()
-            response = list(session.run(query, parameters))
+            response = self._run(session, query, parameters, timer)
         except Exception as e:
             print("Query failed:", e)
+            if timer is not None:
+                timer.finish(error=e)
         finally:
             if session is not None:
                 session.close()
+        if response is not None and self.cache is not None:
+            self.cache.put(db, query, parameters, pack_records(response))
         return response
 
+    def explain(self, query, parameters=None, db=None):
+        """
+        Plan a query with EXPLAIN, without running it, and return the plan
+        tree (ResultSummary.plan). Failures are printed and return None.
+        """
+        assert self.__driver is not None, "Driver not initialized!"
+        try:
+            with self.__driver.session(database=db) as session:
+                return session.run("EXPLAIN " + query, parameters).consume().plan
+        except Exception as e:
+            print("Query failed:", e)
+            return None
+
+    def query_many(self, jobs, db=None, max_workers=DEFAULT_WORKERS, timeout=None):
+        """
+        Run independent queries concurrently on a bounded thread pool.
+
+        Each worker opens its own session, so up to `max_workers` jobs run at
+        once over the driver's connection pool. Cached results are looked up
+        before the jobs are submitted and new results stored once they all
+        finish; a failed cache write is printed and leaves the job's result alone.
+
+        Parameters
+        ----------
+        jobs : list
+            (query, parameters) pairs, e.g. [numOrgPhens_query(p) for p in prefixes].
+        db : str, optional
+            Database all jobs run against.
+        max_workers : int
+            Maximum concurrent sessions.
+        timeout : float, optional
+            Per-job transaction timeout in seconds, enforced by the server.
+
+        Returns
+        -------
+        list of QueryResult
+            One per job, in input order. A failed or timed-out job has
+            records=None and the exception in `error`; other jobs are unaffected.
+        """
+        assert self.__driver is not None, "Driver not initialized!"
+        jobs = list(jobs)
+        results = [None] * len(jobs)
+        pending = []
+        # the cache is read and written here, outside the workers, so a cache
+        # error never turns a successful query into a failed job
+        for i, (query, parameters) in enumerate(jobs):
+            if self.cache is not None:
+                start = time.perf_counter()
+                timer = self._timer(query, db)
+                hit, packed = self.cache.get(db, query, parameters)
+                if hit:
+                    records = unpack_records(packed)
+                    if timer is not None:
+                        timer.finish(len(records), cached=True)
+                    results[i] = QueryResult(records, None, time.perf_counter() - start)
+                    continue
+            pending.append(i)
+
+        def run(i):
+            query, parameters = jobs[i]
+            start = time.perf_counter()
+            timer = self._timer(query, db)
+            try:
+                with self.__driver.session(database=db) as session:
+                    records = self._run(session, query, parameters, timer, timeout)
+            except Exception as e:
+                if timer is not None:
+                    timer.finish(error=e)
+                return QueryResult(None, e, time.perf_counter() - start)
+            return QueryResult(records, None, time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for i, result in zip(pending, pool.map(run, pending)):
+                results[i] = result
+        if self.cache is not None:
+            for i in pending:
+                if results[i].error is None:
+                    query, parameters = jobs[i]
+                    try:
+                        self.cache.put(db, query, parameters, pack_records(results[i].records))
+                    except Exception as e:
+                        print("Query cache write failed:", e)
+        return results
+
+    def query_iter(self, query, parameters=None, db=None, fetch_size=DEFAULT_FETCH_SIZE):
+        """
+        Yield the records of a query as they arrive instead of collecting them.
+
+        The driver pulls `fetch_size` records per round trip, so memory is
+        bounded by the fetch size and the first records reach the caller before
+        the query finishes. The session stays open until the generator is
+        exhausted or closed. Unlike query(), errors are raised rather than
+        printed, and results bypass the cache.
+        """
+        assert self.__driver is not None, "Driver not initialized!"
+        timer = self._timer(query, db)
+        with self.__driver.session(database=db, fetch_size=fetch_size) as session:
+            if timer is None:
+                yield from session.run(query, parameters)
+                return
+            rows = 0
+            try:
+                result = session.run(query, parameters)
+                for record in result:
+                    timer.first_record()
+                    rows += 1
+                    yield record
+                timer.finish(rows, result.consume())
+            except Exception as e:
+                timer.finish(rows, error=e)
+                raise
+            finally:
+                # a consumer that stops early still gets its execution recorded
+                timer.finish(rows)
+
+    def query_chunks(self, query, parameters=None, db=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                     columns=None, fetch_size=DEFAULT_FETCH_SIZE, arrow=False):
+        """
+        Stream a query as DataFrames (or pyarrow RecordBatches) of at most
+        `chunk_size` rows each. See records_to_chunks.
+        """
+        return records_to_chunks(self.query_iter(query, parameters, db, fetch_size),
+                                 chunk_size, columns, arrow)
+
+    def query_df(self, query, parameters=None, db=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 columns=None, fetch_size=DEFAULT_FETCH_SIZE, arrow=False):
+        """
+        Run a query straight into one columnar pandas DataFrame (or pyarrow Table).
+
+        Records are decoded chunk by chunk as they arrive, so at most
+        `chunk_size` Record objects are alive at once and the result is held
+        only in columnar form.
+        """
+        return concat_chunks(self.query_chunks(query, parameters, db, chunk_size, columns, fetch_size, arrow),
+                             columns, arrow)
+
+
+def pack_records(records):
+    """Convert records to a picklable (keys, rows) pair."""
+    keys = list(records[0].keys()) if records else []
+    return keys, [list(record.values()) for record in records]
+
+
+def unpack_records(packed):
+    """Rebuild records from pack_records output."""
+    from neo4j import Record
+    keys, rows = packed
+    return [Record(zip(keys, row)) for row in rows]
+
+
+def records_to_chunks(records, chunk_size=DEFAULT_CHUNK_SIZE, columns=None, arrow=False):
+    """
+    Group an iterable of records into columnar chunks.
+
+    Parameters
+    ----------
+    records : iterable
+        Records (anything with keys() and positional values).
+    chunk_size : int
+        Maximum rows per chunk.
+    columns : list, optional
+        Column names; defaults to the keys of the first record.
+    arrow : bool
+        Yield pyarrow.RecordBatch instead of pandas.DataFrame.
+
+    Yields
+    ------
+    pandas.DataFrame or pyarrow.RecordBatch
+    """
+    rows = []
+    for record in records:
+        if columns is None:
+            columns = list(record.keys())
+        rows.append(tuple(record))
+        if len(rows) >= chunk_size:
+            yield _chunk(rows, columns, arrow)
+            rows = []
+    if rows:
+        yield _chunk(rows, columns, arrow)
+
+
+def _chunk(rows, columns, arrow):
+    if arrow:
+        import pyarrow as pa
+        return pa.RecordBatch.from_pydict({c: list(v) for c, v in zip(columns, zip(*rows))})
+    import pandas as pd
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def concat_chunks(chunks, columns=None, arrow=False):
+    """Concatenate records_to_chunks output into one DataFrame or pyarrow Table."""
+    chunks = list(chunks)
+    if arrow:
+        import pyarrow as pa
+        if not chunks:
+            return pa.table({c: [] for c in columns or []})
+        return pa.Table.from_batches(chunks)
+    import pandas as pd
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def connect(config=None):
+    """
+    Open the data source named by the config: a kgSnapshot.SnapshotConnection
+    when config['snapshot'] is set, otherwise a live Neo4jConnection, with a
+    result cache in config['cache_dir'] if that is set.
+
+    Setting config['profile_report'] or config['slow_query_ms'] attaches a
+    queryProfiler.QueryProfiler; its report is written to profile_report
+    when the process exits. Setting config['warmup'] pre-plans the registered
+    queries on a live connection (True for all of them, or a list of names);
+    see queries.warmup.
+    """
+    if config is None:
+        from neo4jConfig import configDict as config
+    profiler = None
+    if config.get('profile_report') or config.get('slow_query_ms') is not None:
+        import atexit
+        from queryProfiler import QueryProfiler
+        profiler = QueryProfiler(slow_query_ms=config.get('slow_query_ms'),
+                                 slow_log=config.get('slow_query_log'),
+                                 profile_sample_rate=config.get('profile_sample_rate') or 0.0,
+                                 report_path=config.get('profile_report'))
+        atexit.register(profiler.write_report)
+    if config.get('snapshot'):
+        from kgSnapshot import SnapshotConnection
+        return SnapshotConnection(config['snapshot'], default_db=config.get('db'), profiler=profiler)
+    cache = None
+    if config.get('cache_dir'):
+        from queryCache import QueryCache
+        cache = QueryCache(config['cache_dir'])
+    conn = Neo4jConnection(uri=config['uri'], user=config['user'], pwd=config['pwd'], cache=cache,
+                           profiler=profiler)
+    if config.get('warmup'):
+        from queries import warmup
+        warmup(conn, config.get('db'), None if config['warmup'] is True else config['warmup'])
+    return conn
+
+
+class LazyConnection:
+    """
+    Stand-in for the connection returned by connect(config), opened on first
+    use. Modules create one at import time without starting a driver or
+    reading a snapshot until a query is actually sent.
+    """
+
+    def __init__(self, config=None):
+        self._config = config
+        self._conn = None
+
+    def connection(self):
+        """Return the underlying connection, opening it if needed."""
+        if self._conn is None:
+            self._conn = connect(self._config)
+        return self._conn
+
+    def __getattr__(self, name):
+        return getattr(self.connection(), name)
+
 
+def lazy_connect(config=None):
+    """connect(config), deferred until the connection is first used."""
+    return LazyConnection(config)
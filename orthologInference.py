@@ -0,0 +1,341 @@
+"""
+orthologInference.py
+
+Human gene annotations inferred through orthologs, for every HGNC gene at once.
+
+The per-gene case studies (e.g. SFMBT2 <-> SMOC1) follow a human gene to its
+orthologs and from there to their phenotypes, interactions and activities.
+Here that walk is a sparse matrix product over the whole KG:
+
+    O  human genes x ortholog genes     (biolink:orthologous_to, both directions)
+    A  ortholog genes x annotations     (one matrix per annotation type)
+    O @ A                               orthologs of each human gene carrying each annotation
+
+Interactions are mapped back to human genes on both sides (an interolog): the
+annotation matrix is I @ O.T, so an inferred interaction is between two human
+genes whose orthologs interact. Each product is evaluated per source taxon,
+which gives the taxa supporting every inferred annotation.
+
+The result is one table per annotation type, streamed to Parquet in blocks
+of human genes:
+
+    inferred_annotations/
+        phenotype.parquet
+        interaction.parquet
+        activity.parquet
+
+with the columns human_gene, annotation, support (orthologs carrying the
+annotation), orthologs (orthologs of the human gene), n_taxa, source_taxa
+(';'-joined taxon IDs) and known (whether the human gene has the annotation
+itself). New case-study candidates are then a filter on the table, e.g.
+read_inferred(out_dir, "interaction", min_taxa=2, novel=True).
+
+Inputs come from a KGXGraph (all three types) or from a Neo4j or snapshot
+connection; snapshots hold gene-phenotype edges only, so interactions and
+activities are skipped there.
+
+Usage:
+    python orthologInference.py inferred_annotations
+    python orthologInference.py inferred_annotations --graph kgx_graph
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
+
+from coverageBitmaps import ANNOTATION_TYPES, HUMAN_PREFIX
+from queries import (geneActivities_query, geneInteractions_query, snapshotGenePhenotypes_query,
+                     snapshotGenes_query, snapshotOrthologs_query)
+
+INFERRED_TYPES = ["phenotype", "interaction", "activity"]
+
+# annotation type -> (query, annotation column) read from a connection
+ANNOTATION_QUERIES = {
+    "phenotype": (snapshotGenePhenotypes_query, "phenotype"),
+    "interaction": (geneInteractions_query, "partner"),
+    "activity": (geneActivities_query, "activity"),
+}
+
+BLOCK_SIZE = 4096
+
+SCHEMA = pa.schema([
+    ("human_gene", pa.string()),
+    ("annotation", pa.string()),
+    ("support", pa.int64()),
+    ("orthologs", pa.int64()),
+    ("n_taxa", pa.int64()),
+    ("source_taxa", pa.string()),
+    ("known", pa.bool_()),
+])
+
+
+# -------------------------------
+# Inputs
+# -------------------------------
+def inputs_from_connection(conn, db=None, types=INFERRED_TYPES):
+    """
+    Genes, ortholog edges and annotation edges from a Neo4jConnection or
+    SnapshotConnection. Annotation types the source cannot answer are skipped.
+
+    Returns
+    -------
+    genes : pandas.DataFrame
+        id, taxon.
+    orthologs : pandas.DataFrame
+        subject, object.
+    annotations : dict
+        annotation type -> DataFrame of gene, annotation.
+    """
+    genes = conn.query_df(snapshotGenes_query, db=db, columns=["id", "in_taxon", "degree"])
+    genes = genes.rename(columns={"in_taxon": "taxon"})[["id", "taxon"]]
+    orthologs = conn.query_df(snapshotOrthologs_query, db=db, columns=["subject", "object"])
+    annotations = {}
+    for name in types:
+        query, column = ANNOTATION_QUERIES[name]
+        try:
+            edges = conn.query_df(query, db=db)
+        except RuntimeError:
+            print(f"No {name} edges available, skipping")
+            continue
+        annotations[name] = edges.rename(columns={column: "annotation"})[["gene", "annotation"]]
+    return genes, orthologs, annotations
+
+
+def inputs_from_kgx(graph, types=INFERRED_TYPES, ortholog_predicate="biolink:orthologous_to"):
+    """inputs_from_connection() for a kgxGraph.KGXGraph, with the annotation types of ANNOTATION_TYPES."""
+    gene_nodes = np.flatnonzero(graph.has_category("biolink:Gene"))
+    genes = pd.DataFrame({"id": graph.ids[gene_nodes], "taxon": graph.nodes["taxon"].to_numpy()[gene_nodes]})
+    sources, targets = graph.edges_from(gene_nodes, ortholog_predicate, direction="out")
+    orthologs = pd.DataFrame({"subject": graph.ids[sources], "object": graph.ids[targets]})
+    annotations = {}
+    for name in types:
+        kind, values = ANNOTATION_TYPES[name]
+        if kind == "category":
+            sources, targets = graph.edges_from(gene_nodes)
+            keep = graph.has_category(values)[targets]
+        else:
+            sources, targets = graph.edges_from(gene_nodes, [v for v in values if v in graph.predicates],
+                                                direction="out")
+            keep = graph.has_category("biolink:Gene")[targets]
+        annotations[name] = pd.DataFrame({"gene": graph.ids[sources[keep]], "annotation": graph.ids[targets[keep]]})
+    return genes, orthologs, annotations
+
+
+# -------------------------------
+# Sparse matrices
+# -------------------------------
+def _binary(matrix):
+    """Sparse 0/1 matrix with the same nonzero pattern (parallel edges counted once)."""
+    matrix = sparse.csr_matrix(matrix, dtype=np.int64, copy=True)
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def _matrix(rows, cols, shape):
+    known = (rows >= 0) & (cols >= 0)
+    return _binary(sparse.csr_matrix((np.ones(known.sum(), dtype=np.int64), (rows[known], cols[known])),
+                                     shape=shape))
+
+
+class OrthologInference:
+    """
+    Ortholog and annotation matrices over the genes of one KG release.
+
+    Parameters
+    ----------
+    genes : pandas.DataFrame
+        id, taxon of every gene.
+    orthologs : pandas.DataFrame
+        subject, object ortholog edges (read in both directions).
+    human_prefix : str
+        ID prefix of the human genes the annotations are inferred for.
+    """
+
+    def __init__(self, genes, orthologs, human_prefix=HUMAN_PREFIX):
+        genes = genes.drop_duplicates("id", ignore_index=True)
+        self.index = pd.Index(genes["id"])
+        self.taxa = pd.Categorical(genes["taxon"])
+        human = genes["id"].str.startswith(human_prefix).to_numpy(dtype=bool)
+        self.humans = np.flatnonzero(human)
+        self.sources = np.flatnonzero(~human)
+        n = len(self.index)
+        subjects = self.index.get_indexer(orthologs["subject"])
+        objects = self.index.get_indexer(orthologs["object"])
+        adjacency = _matrix(np.concatenate([subjects, objects]), np.concatenate([objects, subjects]), (n, n))
+        # human genes x non-human ortholog genes
+        self.orthologs = adjacency[self.humans][:, self.sources].tocsr()
+        self.ortholog_counts = np.diff(self.orthologs.indptr)
+        self.source_taxa = self.taxa.codes[self.sources]
+        if len(self.taxa.categories) > 63:
+            raise ValueError("Source taxa are tracked as a 64-bit mask; too many taxa")
+
+    @classmethod
+    def from_connection(cls, conn, db=None, types=INFERRED_TYPES):
+        """The model and annotation edges of a connection (see inputs_from_connection)."""
+        genes, orthologs, annotations = inputs_from_connection(conn, db, types)
+        return cls(genes, orthologs), annotations
+
+    @classmethod
+    def from_kgx(cls, graph, types=INFERRED_TYPES):
+        genes, orthologs, annotations = inputs_from_kgx(graph, types)
+        return cls(genes, orthologs), annotations
+
+    def annotation_matrix(self, edges, interolog=False):
+        """
+        Annotation matrices for one annotation type.
+
+        Returns
+        -------
+        source : scipy.sparse.csr_matrix
+            Non-human genes x annotations.
+        direct : scipy.sparse.csr_matrix
+            Human genes x annotations, the annotations they already have.
+        labels : numpy.ndarray
+            Annotation ID of each column.
+        """
+        genes = self.index.get_indexer(edges["gene"])
+        if interolog:
+            # partners are genes: both ends are undirected, and partners map back to human genes
+            partners = self.index.get_indexer(edges["annotation"])
+            rows, cols = np.concatenate([genes, partners]), np.concatenate([partners, genes])
+            n = len(self.index)
+            interactions = _matrix(rows, cols, (n, n))
+            human_columns = interactions[:, self.humans]
+            source = _binary(interactions[self.sources][:, self.sources] @ self.orthologs.T)
+            return source, human_columns[self.humans].tocsr(), self.index[self.humans].to_numpy()
+        labels, cols = np.unique(edges["annotation"].to_numpy(dtype=object), return_inverse=True)
+        matrix = _matrix(genes, cols.astype(np.int64), (len(self.index), len(labels)))
+        return matrix[self.sources].tocsr(), matrix[self.humans].tocsr(), labels
+
+    def infer(self, edges, interolog=False, block_size=BLOCK_SIZE):
+        """
+        Inferred annotations of the human genes, in blocks of block_size genes.
+
+        Yields
+        ------
+        pandas.DataFrame
+            Rows in the SCHEMA layout, one per (human gene, inferred annotation).
+        """
+        source, direct, labels = self.annotation_matrix(edges, interolog)
+        taxa = np.unique(self.source_taxa[self.source_taxa >= 0])
+        taxon_names = np.asarray(self.taxa.categories, dtype=object)
+        human_ids = self.index[self.humans].to_numpy()
+        for start in range(0, len(self.humans), block_size):
+            block = self.orthologs[start:start + block_size]
+            support = (block @ source).tocsr()
+            # each matrix below is support's pattern (all ones) plus a subset of it, so it keeps
+            # exactly support's nonzero pattern and the data arrays line up; the ones are taken off after
+            pattern = _binary(support)
+            taxon_mask = pattern
+            for code in taxa:
+                columns = self.source_taxa == code
+                # per-taxon product: which annotations this taxon's orthologs carry
+                taxon_mask = taxon_mask + _binary(block[:, columns] @ source[columns]) * (1 << int(code))
+            known = pattern + pattern.multiply(direct[start:start + block_size])
+            for matrix in (support, taxon_mask, known):
+                matrix.sort_indices()
+            rows = np.repeat(np.arange(support.shape[0]), np.diff(support.indptr))
+            cols = support.indices
+            keep = support.data > 0
+            if interolog:
+                # a gene is not its own interaction partner
+                keep &= cols != start + rows
+            rows, cols = rows[keep], cols[keep]
+            unique_masks, inverse = np.unique(taxon_mask.data[keep] - 1, return_inverse=True)
+            names = [";".join(taxon_names[[bit for bit in range(64) if mask >> bit & 1]]) for mask in unique_masks]
+            n_taxa = np.array([bin(mask).count("1") for mask in unique_masks], dtype=np.int64)
+            yield pd.DataFrame({
+                "human_gene": human_ids[start + rows],
+                "annotation": labels[cols],
+                "support": support.data[keep].astype(np.int64),
+                "orthologs": self.ortholog_counts[start + rows].astype(np.int64),
+                "n_taxa": n_taxa[inverse],
+                "source_taxa": np.asarray(names, dtype=object)[inverse],
+                "known": known.data[keep] > 1,
+            })
+
+
+# -------------------------------
+# Output
+# -------------------------------
+def write_inferred(model, annotations, out_dir, block_size=BLOCK_SIZE):
+    """
+    Stream the inferred annotations of every type to out_dir/<type>.parquet.
+
+    Returns
+    -------
+    dict
+        annotation type -> number of inferred rows.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for name, edges in annotations.items():
+        rows = 0
+        with pq.ParquetWriter(os.path.join(out_dir, f"{name}.parquet"), SCHEMA, compression="zstd") as writer:
+            for chunk in model.infer(edges, interolog=name == "interaction", block_size=block_size):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=SCHEMA, preserve_index=False))
+                rows += len(chunk)
+        written[name] = rows
+        print(f"{name}: {rows} inferred annotations")
+    return written
+
+
+def read_inferred(out_dir, name, genes=None, min_support=1, min_taxa=1, novel=False):
+    """
+    Read one inferred annotation table, filtered while reading.
+
+    Parameters
+    ----------
+    name : str
+        Annotation type, e.g. "phenotype" or "interaction".
+    genes : list, optional
+        Only these human genes.
+    min_support, min_taxa : int
+        Minimum supporting orthologs and source taxa.
+    novel : bool
+        Only annotations the human gene does not already have.
+    """
+    filters = [("support", ">=", min_support), ("n_taxa", ">=", min_taxa)]
+    if genes is not None:
+        filters.append(("human_gene", "in", list(genes)))
+    if novel:
+        filters.append(("known", "==", False))
+    return pd.read_parquet(os.path.join(out_dir, f"{name}.parquet"), filters=filters)
+
+
+def infer_release(out_dir, conn=None, db=None, graph=None, types=INFERRED_TYPES, block_size=BLOCK_SIZE):
+    """Build the model from a KGXGraph (if given) or a connection and write every inferred table."""
+    if graph is not None:
+        model, annotations = OrthologInference.from_kgx(graph, types)
+    else:
+        model, annotations = OrthologInference.from_connection(conn, db, types)
+    print(f"{len(model.humans)} human genes, {model.orthologs.nnz} ortholog pairs")
+    return write_inferred(model, annotations, out_dir, block_size)
+
+
+if __name__ == "__main__":
+    from neo4jConfig import configDict
+
+    parser = argparse.ArgumentParser(description="Infer human gene annotations through orthologs.")
+    parser.add_argument("out_dir", nargs="?", default="inferred_annotations")
+    parser.add_argument("--graph", help="saved KGXGraph directory to read instead of Neo4j")
+    parser.add_argument("--types", nargs="+", default=INFERRED_TYPES, choices=list(ANNOTATION_QUERIES))
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="human genes per product block")
+    args = parser.parse_args()
+
+    if args.graph:
+        from kgxGraph import KGXGraph
+        infer_release(args.out_dir, graph=KGXGraph.open(args.graph), types=args.types, block_size=args.block_size)
+    else:
+        from neo4jConnection import connect
+        conn = connect(configDict)
+        try:
+            infer_release(args.out_dir, conn, configDict['db'], types=args.types, block_size=args.block_size)
+        finally:
+            conn.close()
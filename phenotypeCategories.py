@@ -1,51 +1,96 @@
-from neo4j import GraphDatabase
 import pandas as pd
 import pickle
-import seaborn as sns
-import matplotlib.pyplot as plt
-from matplotlib.colors import LogNorm
 
-from neo4jConnection import Neo4jConnection
+from neo4jConnection import lazy_connect
 from neo4jConfig import configDict
 import queries
 
 
-# establishing connection with neo4j
-conn = Neo4jConnection(uri=configDict['uri'],
-                       user=configDict['user'],
-                       pwd=configDict['pwd'])
+def categoryIndex(uphenoDict):
+    """
+    Invert the high level category -> member terms mapping into a
+    (phenotype, category) DataFrame, one row per distinct pair.
+    """
+    index = pd.DataFrame({"category": list(uphenoDict), "phenotype": list(uphenoDict.values())})
+    index = index.explode("phenotype").dropna(subset=["phenotype"])
+    return index.drop_duplicates()[["phenotype", "category"]].reset_index(drop=True)
 
-db = configDict['db']
-response = conn.query(queries.namePhens_query, db=db)
 
-df = pd.DataFrame(response, columns=["phenotype", "ontology"])
+def categoryCounts(df, uphenoDict):
+    """
+    Count the phenotypes of df (columns phenotype, ontology) under each high
+    level category. Returns an ontology x category DataFrame of counts, in
+    uphenoDict category order; categories and ontologies with no phenotypes
+    are left out.
+    """
+    matched = df.merge(categoryIndex(uphenoDict), on="phenotype")
+    counts = pd.crosstab(matched["ontology"], matched["category"])
+    counts = counts[[c for c in uphenoDict if c in counts.columns]]
+    counts.index.name = None
+    counts.columns.name = None
+    return counts
 
-# Dictionary of high level upheno terms
-with open('uphenoNew.pkl', 'rb') as f:
-    uphenoDict = pickle.load(f)
 
-phenCounts = {}
+def categoryParameter(uphenoDict):
+    """The category mapping as the $categories parameter of categoryCounts_query."""
+    return [{"category": category, "members": list(dict.fromkeys(members))}
+            for category, members in uphenoDict.items()]
 
 
-for index, row in df.iterrows():
-    upheno = row['phenotype']
-    org = row['ontology']
-    taxon= org
-    for highTerm in uphenoDict.keys():
-        if upheno in uphenoDict[highTerm]:
-            if highTerm in phenCounts:
-                if taxon in phenCounts[highTerm]:
-                    phenCounts[highTerm][taxon] += 1
-                else: phenCounts[highTerm][taxon] = 1
-            else:
-                phenCounts[highTerm] = {taxon: 1}
+def serverCategoryCounts(conn, db, uphenoDict):
+    """
+    categoryCounts computed by Neo4j: the mapping is sent as a parameter and
+    only the category x namespace counts come back. Same result as
+    categoryCounts over all phenotypes.
+    """
+    response = conn.query(queries.categoryCounts_query, {"categories": categoryParameter(uphenoDict)}, db=db)
+    if response is None:
+        return None
+    rows = pd.DataFrame(response, columns=["category", "ontology", "count"]).dropna(subset=["ontology"])
+    counts = rows.pivot_table(index="ontology", columns="category", values="count", aggfunc="sum", fill_value=0)
+    counts = counts[[c for c in uphenoDict if c in counts.columns]].sort_index()
+    counts.index.name = None
+    counts.columns.name = None
+    return counts
 
-countDF = pd.DataFrame(phenCounts).fillna(0)
 
-sns.heatmap(countDF, annot=False, square=True,  cmap="YlGnBu", norm=LogNorm(vmin=1, vmax=12200))
-fig = plt.gcf()
-fig.set_size_inches(15, 8)
-plt.xticks(rotation=85)
-plt.title("Phenotype HeatMap")
-plt.savefig("PhenotypeHeatmap.svg")
-plt.show()
+# count on the server instead of downloading every phenotype
+SERVER_SIDE = True
+
+# connection to neo4j, opened on the first query
+conn = lazy_connect(configDict)
+
+
+def loadCategories(path='uphenoNew.pkl'):
+    """Dictionary of high level upheno terms -> member phenotype terms."""
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def phenotypeHeatmap(server_side=SERVER_SIDE, categories_path='uphenoNew.pkl'):
+    """Count phenotypes per high level uPheno category and namespace and plot them as a heatmap."""
+    db = configDict['db']
+    uphenoDict = loadCategories(categories_path)
+
+    if server_side:
+        countDF = serverCategoryCounts(conn, db, uphenoDict)
+    else:
+        response = conn.query(queries.namePhens_query, db=db)
+        df = pd.DataFrame(response, columns=["phenotype", "ontology"])
+        countDF = categoryCounts(df, uphenoDict)
+
+    import seaborn as sns
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+    sns.heatmap(countDF, annot=False, square=True,  cmap="YlGnBu", norm=LogNorm(vmin=1, vmax=12200))
+    fig = plt.gcf()
+    fig.set_size_inches(15, 8)
+    plt.xticks(rotation=85)
+    plt.title("Phenotype HeatMap")
+    plt.savefig("PhenotypeHeatmap.svg")
+    plt.show()
+    return countDF
+
+
+if __name__ == "__main__":
+    phenotypeHeatmap()
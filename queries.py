@@ -3,50 +3,220 @@ queries.py
 
 This module contains Cypher queries for exploring the Monarch Initiative
 Knowledge Graph (Neo4j). Each query is documented with its purpose and output.
+
+Queries are registered by name in QUERIES and take their values as Cypher
+parameters ($gene, $taxon1, $prefix, ...) rather than pasting them into the
+query text, so each query has a single text that Neo4j plans once and caches.
+The gene- and organism-level builders return a (query, parameters) pair for
+Neo4jConnection.query:
+
+    conn.query(*numGenePhens_query("HGNC:12345"), db=configDict['db'])
 """
 
+import re
+
+# name -> parameterized Cypher text
+QUERIES = {}
+
+
+def register(name: str, query: str) -> str:
+    """Add a query to the registry under `name` and return its text."""
+    QUERIES[name] = query
+    return query
+
+
+def query_parameters(query: str) -> list:
+    """Return the names of the $parameters used by a query, in order of appearance."""
+    return list(dict.fromkeys(re.findall(r"\$(\w+)", query)))
+
+
+def warmup(conn, db=None, names=None):
+    """
+    Pre-plan registered queries at startup.
+
+    Each query is planned once with conn.explain, which parses and plans it on
+    the server without executing it, so the first real call skips planning.
+    Going through explain rather than query keeps the plans out of the result
+    cache and the query profiler. Connections that cannot plan (snapshots)
+    are left alone. connect() runs this for every query when
+    configDict['warmup'] is set.
+
+    Args:
+        conn: Neo4jConnection to plan the queries on.
+        db (str): Database name.
+        names (list): Registry names to warm up (default: all).
+    """
+    explain = getattr(conn, "explain", None)
+    if explain is None:
+        return
+    for name in names or QUERIES:
+        query = QUERIES[name]
+        explain(query, {p: None for p in query_parameters(query)}, db=db)
+
+
 # -------------------------------
 # Basic Queries
 # -------------------------------
 
 # Get all human genes (HGNC identifiers)
-nameHGNC_query = """
+nameHGNC_query = register("nameHGNC", """
 MATCH (m:`biolink:Gene`)
 WHERE m.id STARTS WITH "HGNC"
 RETURN m.id
-"""
+""")
 #  Returns all HGNC gene IDs in the graph.
 
 
 # Get orthologs for all human genes
-nameHGNCOrthos_query = """
+nameHGNCOrthos_query = register("nameHGNCOrthos", """
 MATCH (m:`biolink:Gene`)-[:`biolink:orthologous_to`]-(n:`biolink:Gene`)
 WHERE m.id STARTS WITH "HGNC"
 RETURN n.id, m.id
-"""
+""")
 # For each human gene (HGNC), return its orthologous partner(s).
 
 
 # Get phenotypes associated with human genes
-nameHGNCPhens_query = """
+nameHGNCPhens_query = register("nameHGNCPhens", """
 MATCH (m:`biolink:Gene`)-[:`biolink:has_phenotype`]-(n:`biolink:PhenotypicFeature`)
 WHERE m.id STARTS WITH "HGNC"
 RETURN n.id, m.id
-"""
+""")
 #  For each human gene (HGNC), return linked phenotypic features.
 
 
 # Get all phenotypes, their id and namespace i.e. human phenotype ontology (HPO)
-namePhens_query = """
+namePhens_query = register("namePhens", """
 MATCH (phenotype:`biolink:PhenotypicFeature`)
-          RETURN phenotype.id, phenotype.namespace"""
+          RETURN phenotype.id, phenotype.namespace""")
+
+
+# Count phenotypic features per high level uPheno category and namespace on the server.
+# $categories is a list of {category, members} maps (see phenotypeCategories.categoryParameter).
+categoryCounts_query = register("categoryCounts", """
+UNWIND $categories AS c
+UNWIND c.members AS member
+MATCH (phenotype:`biolink:PhenotypicFeature` {id: member})
+RETURN c.category AS category, phenotype.namespace AS ontology, count(*) AS count
+""")
+
+
+# Get all gene-disease associations
+geneDisease_query = register("geneDisease", """
+MATCH (m:`biolink:Gene`)--(n:`biolink:Disease`)
+RETURN m.id AS gene, n.id AS disease
+""")
+# One row per gene-disease edge, any predicate; the pattern of numgeneDis_query.
+
+
+# Get all diseases with their phenotypes
+diseasePhens_query = register("diseasePhens", """
+MATCH (d:`biolink:Disease`)-[:`biolink:has_phenotype`]-(p:`biolink:PhenotypicFeature`)
+RETURN d.id, collect(p.id)
+""")
+# One row per disease: (disease id, list of phenotype ids).
+
+
+# Which annotation types each gene has, one row per gene (coverageBitmaps)
+geneAnnotationTypes_query = register("geneAnnotationTypes", """
+MATCH (g:`biolink:Gene`)
+RETURN g.id AS gene, g.in_taxon AS taxon,
+       EXISTS { (g)--(:`biolink:PhenotypicFeature`) } AS phenotype,
+       EXISTS { (g)--(:`biolink:Disease`) } AS disease,
+       EXISTS { (g)-[:`biolink:interacts_with`]-(:`biolink:Gene`) } AS interaction,
+       EXISTS { (g)--(:`biolink:BiologicalProcessOrActivity`) } AS activity,
+       EXISTS { (g)-[:`biolink:expressed_in`]-() } AS expression,
+       EXISTS { (g)--(:`biolink:Pathway`) } AS pathway
+""")
+# Phenotype and disease follow the undirected patterns of numGenePhens_query and numgeneDis_query.
+
+# Gene-gene interaction edges, one row per edge (orthologInference)
+geneInteractions_query = register("geneInteractions", """
+MATCH (g:`biolink:Gene`)-[:`biolink:interacts_with`]->(h:`biolink:Gene`)
+RETURN g.id AS gene, h.id AS partner
+""")
+
+# Gene-process/activity edges, one row per edge (orthologInference)
+geneActivities_query = register("geneActivities", """
+MATCH (g:`biolink:Gene`)--(a:`biolink:BiologicalProcessOrActivity`)
+RETURN g.id AS gene, a.id AS activity
+""")
+
+
+# -------------------------------
+# Summary Statistics
+# -------------------------------
+
+# Edge statistics of the genes of each taxon, aggregated on the server. COUNT { }
+# reads each gene's degree from the node store instead of expanding its relationships.
+geneEdgeCounts_query = register("geneEdgeCounts", """
+MATCH (g:`biolink:Gene`)
+WITH g, COUNT { (g)--() } AS degree
+RETURN g.in_taxon AS taxon, sum(degree) AS total_edges, avg(degree) AS avg_edges, count(g) AS gene_count
+""")
+
+# Degree of every gene, one row per gene so the result can be streamed
+geneDegrees_query = register("geneDegrees", """
+MATCH (g:`biolink:Gene`)
+RETURN g.id AS gene, g.in_taxon AS taxon, COUNT { (g)--() } AS edge_count
+""")
+
+# All relationship types in the database
+relationshipTypes_query = register("relationshipTypes", """
+CALL db.relationshipTypes() YIELD relationshipType
+RETURN relationshipType
+""")
+
+# Number of phenotypic features per namespace
+phenCountsByNamespace_query = register("phenCountsByNamespace", """
+MATCH (g:`biolink:PhenotypicFeature`)
+RETURN count(g) AS feature_count, g.namespace AS type
+""")
+
+# Number of phenotypic features per type
+phenCountsByType_query = register("phenCountsByType", """
+MATCH (g:`biolink:PhenotypicFeature`)
+RETURN g.type AS type, count(g) AS feature_count
+""")
+
+# Number of genes per taxon
+geneCountsByTaxon_query = register("geneCountsByTaxon", """
+MATCH (g:`biolink:Gene`)
+RETURN g.in_taxon AS taxon, count(g) AS gene_count
+""")
 
 
 # -------------------------------
 # Gene-Specific Queries
 # -------------------------------
 
-def namesgeneOrthos_query(gene: str) -> str:
+register("namesgeneOrthos", """
+MATCH (m:`biolink:Gene` {id: $gene})-[:`biolink:orthologous_to`]-(n:`biolink:Gene`)
+RETURN n.id, m.id
+""")
+
+register("numgeneDis", """
+MATCH (m:`biolink:Gene` {id: $gene})--(n:`biolink:Disease`)
+RETURN count(*)
+""")
+
+register("numGenePhens", """
+MATCH (m:`biolink:Gene` {id: $gene})--(n:`biolink:PhenotypicFeature`)
+RETURN count(*)
+""")
+
+register("numGenePhen", """
+MATCH (m:`biolink:Gene` {id: $gene})-[:`biolink:has_phenotype`]->(n:`biolink:PhenotypicFeature`)
+RETURN count(*)
+""")
+
+register("nameGenePhen", """
+MATCH (m:`biolink:Gene` {id: $gene})-[:`biolink:has_phenotype`]->(n:`biolink:PhenotypicFeature`)
+RETURN n.id
+""")
+
+
+def namesgeneOrthos_query(gene: str) -> tuple:
     """
     Find orthologs for a specific gene.
 
@@ -54,57 +224,113 @@ def namesgeneOrthos_query(gene: str) -> str:
         gene (str): Gene ID (e.g., "HGNC:12345").
 
     Returns:
-        str: Cypher query string.
-    """
-    return f"""
-    MATCH (m:`biolink:Gene` {{id: "{gene}"}})-[:`biolink:orthologous_to`]-(n:`biolink:Gene`)
-    RETURN n.id, m.id
+        tuple: (Cypher query string, parameters dict).
     """
+    return QUERIES["namesgeneOrthos"], {"gene": gene}
 
 
-def numgeneDis_query(gene: str) -> str:
+def numgeneDis_query(gene: str) -> tuple:
     """
     Count how many diseases a given gene is associated with.
     """
-    return f"""
-    MATCH (m:`biolink:Gene` {{id: "{gene}"}})--(n:`biolink:Disease`)
-    RETURN count(*)
-    """
+    return QUERIES["numgeneDis"], {"gene": gene}
 
 
-def numGenePhens_query(gene: str) -> str:
+def numGenePhens_query(gene: str) -> tuple:
     """
     Count how many phenotypes are associated with a given gene.
     """
-    return f"""
-    MATCH (m:`biolink:Gene` {{id: "{gene}"}})--(n:`biolink:PhenotypicFeature`)
-    RETURN count(*)
-    """
+    return QUERIES["numGenePhens"], {"gene": gene}
 
 
-def numGenePhen_query(gene: str) -> str:
+def numGenePhen_query(gene: str) -> tuple:
     """
     Count phenotype associations where the gene explicitly has a 'has_phenotype' edge.
     """
-    return f"""
-    MATCH (m:`biolink:Gene` {{id: "{gene}"}})-[:`biolink:has_phenotype`]->(n:`biolink:PhenotypicFeature`)
-    RETURN count(*)
-    """
+    return QUERIES["numGenePhen"], {"gene": gene}
 
-def nameGenePhen_query(gene: str) -> str:
+def nameGenePhen_query(gene: str) -> tuple:
     """
     Get phenotype associations where the gene explicitly has a 'has_phenotype' edge.
     """
-    return f"""
-    MATCH (m:`biolink:Gene` {{id: "{gene}"}})-[:`biolink:has_phenotype`]->(n:`biolink:PhenotypicFeature`)
-    RETURN n.id
-    """
+    return QUERIES["nameGenePhen"], {"gene": gene}
+
+# -------------------------------
+# Batched Gene Queries
+# -------------------------------
+# These take a list of gene IDs as $genes; send them in chunks of BATCH_SIZE.
+
+# number of gene IDs sent per batched query
+BATCH_SIZE = 1000
+
+
+def chunked(items, batch_size=BATCH_SIZE):
+    """Yield successive lists of at most batch_size items."""
+    items = list(items)
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
+
+
+# 'has_phenotype' phenotypes of a list of genes
+genePhens_batch_query = register("genePhens_batch", """
+UNWIND $genes AS gene
+MATCH (m:`biolink:Gene` {id: gene})-[:`biolink:has_phenotype`]->(n:`biolink:PhenotypicFeature`)
+RETURN m.id AS gene, collect(n.id) AS phenotypes
+""")
+# One row per gene in $genes that has phenotypes; batched nameGenePhen_query.
+
 
 # -------------------------------
 # Organism-Level Queries
 # -------------------------------
 
-def numGeneOrthoTaxon_query(org1: str, org2: str) -> str:
+register("numGeneOrthoTaxon", """
+MATCH (n:`biolink:Gene` {in_taxon: $taxon1})-[:`biolink:orthologous_to`]-
+      (m:`biolink:Gene` {in_taxon: $taxon2})
+RETURN count(*)
+""")
+
+register("numOrgPhens", """
+MATCH (n:`biolink:Gene`)
+WHERE n.id STARTS WITH $prefix
+MATCH (n)-[:`biolink:has_phenotype`]->()
+RETURN count(*)
+""")
+
+register("numUPHENOrg", """
+MATCH (n:`biolink:PhenotypicFeature`)
+WHERE n.id STARTS WITH $prefix1
+MATCH (n)--(u:`biolink:PhenotypicFeature` WHERE u.id STARTS WITH "UPHENO")--
+      (m:`biolink:PhenotypicFeature` WHERE m.id STARTS WITH $prefix2)
+RETURN count(*)
+""")
+
+
+# Ortholog pair counts for every ordered pair of taxa in $taxa
+orthoTaxonMatrix_query = register("orthoTaxonMatrix", """
+MATCH (n:`biolink:Gene`)-[:`biolink:orthologous_to`]-(m:`biolink:Gene`)
+WHERE n.in_taxon IN $taxa AND m.in_taxon IN $taxa
+RETURN n.in_taxon AS taxon1, m.in_taxon AS taxon2, count(*) AS count
+""")
+# Walks the ortholog edges once; each (taxon1, taxon2) row equals
+# numGeneOrthoTaxon_query(taxon1, taxon2).
+
+# Cross-species phenotype connection counts for every ordered pair of prefixes in $prefixes
+uphenoPrefixMatrix_query = register("uphenoPrefixMatrix", """
+MATCH (u:`biolink:PhenotypicFeature`)
+WHERE u.id STARTS WITH "UPHENO"
+MATCH (n:`biolink:PhenotypicFeature`)--(u)--(m:`biolink:PhenotypicFeature`)
+WITH [p IN $prefixes WHERE n.id STARTS WITH p] AS prefixes1,
+     [p IN $prefixes WHERE m.id STARTS WITH p] AS prefixes2
+UNWIND prefixes1 AS prefix1
+UNWIND prefixes2 AS prefix2
+RETURN prefix1, prefix2, count(*) AS count
+""")
+# Walks the uPheno neighbourhoods once; each (prefix1, prefix2) row equals
+# numUPHENOrg_query(prefix1, prefix2).
+
+
+def numGeneOrthoTaxon_query(org1: str, org2: str) -> tuple:
     """
     Count the number of orthologous gene pairs between two organisms.
 
@@ -112,29 +338,20 @@ def numGeneOrthoTaxon_query(org1: str, org2: str) -> str:
         org1 (str): Taxon ID of first organism.
         org2 (str): Taxon ID of second organism.
     """
-    return f"""
-    MATCH (n:`biolink:Gene` {{in_taxon: "{org1}"}})-[:`biolink:orthologous_to`]-
-          (m:`biolink:Gene` {{in_taxon: "{org2}"}})
-    RETURN count(*)
-    """
+    return QUERIES["numGeneOrthoTaxon"], {"taxon1": org1, "taxon2": org2}
 
 
-def numOrgPhens_query(org_prefix: str) -> str:
+def numOrgPhens_query(org_prefix: str) -> tuple:
     """
     Count the number of phenotype associations for all genes in a given organism.
 
     Args:
         org_prefix (str): Prefix of gene IDs for the organism (e.g., "HGNC", "ZFIN").
     """
-    return f"""
-    MATCH (n:`biolink:Gene`)
-    WHERE n.id STARTS WITH "{org_prefix}"
-    MATCH (n)-[:`biolink:has_phenotype`]->()
-    RETURN count(*)
-    """
+    return QUERIES["numOrgPhens"], {"prefix": org_prefix}
 
 
-def numUPHENOrg_query(org1: str, org2: str) -> str:
+def numUPHENOrg_query(org1: str, org2: str) -> tuple:
     """
     Count cross-species phenotype connections via uPheno.
 
@@ -142,19 +359,91 @@ def numUPHENOrg_query(org1: str, org2: str) -> str:
         org1 (str): Prefix of phenotype IDs for organism 1.
         org2 (str): Prefix of phenotype IDs for organism 2.
     """
+    return QUERIES["numUPHENOrg"], {"prefix1": org1, "prefix2": org2}
+
+
+# -------------------------------
+# Snapshot Export Queries
+# -------------------------------
+# Working-set tables written by kgSnapshot.export_snapshot.
+
+snapshotGenes_query = register("snapshotGenes", """
+MATCH (g:`biolink:Gene`)
+RETURN g.id AS id, g.in_taxon AS in_taxon, COUNT { (g)--() } AS degree
+""")
+
+snapshotOrthologs_query = register("snapshotOrthologs", """
+MATCH (n:`biolink:Gene`)-[:`biolink:orthologous_to`]->(m:`biolink:Gene`)
+RETURN n.id AS subject, m.id AS object
+""")
+
+snapshotGenePhenotypes_query = register("snapshotGenePhenotypes", """
+MATCH (g:`biolink:Gene`)-[r]-(p:`biolink:PhenotypicFeature`)
+RETURN g.id AS gene, p.id AS phenotype, type(r) AS predicate
+""")
+
+snapshotGeneDiseases_query = register("snapshotGeneDiseases", """
+MATCH (g:`biolink:Gene`)-[r]-(d:`biolink:Disease`)
+RETURN g.id AS gene, d.id AS disease, type(r) AS predicate
+""")
+
+snapshotPhenotypes_query = register("snapshotPhenotypes", """
+MATCH (p:`biolink:PhenotypicFeature`)
+RETURN p.id AS id, p.namespace AS namespace, p.type AS type
+""")
+
+snapshotDiseasePhenotypes_query = register("snapshotDiseasePhenotypes", """
+MATCH (d:`biolink:Disease`)-[:`biolink:has_phenotype`]-(p:`biolink:PhenotypicFeature`)
+RETURN d.id AS disease, p.id AS phenotype
+""")
+
+snapshotUphenoLinks_query = register("snapshotUphenoLinks", """
+MATCH (u:`biolink:PhenotypicFeature`)-[]-(p:`biolink:PhenotypicFeature`)
+WHERE u.id STARTS WITH "UPHENO"
+RETURN u.id AS upheno, p.id AS phenotype
+""")
+# One row per (uPheno term, phenotype edge) incident to the uPheno term.
+
+
+def geneTypeDegrees_query(rel_types) -> str:
+    """
+    Edges of each relationship type connected to the genes of each taxon, one
+    column per type. A degree lookup needs the type in the pattern itself, so
+    the text depends on rel_types and is built here rather than registered.
+    """
+    columns = ",\n       ".join(
+        "sum(COUNT {{ (g)-[:`{0}`]-() }}) AS `{0}`".format(t.replace("`", "``")) for t in rel_types)
     return f"""
-    MATCH (n:`biolink:PhenotypicFeature`)
-    WHERE n.id STARTS WITH "{org1}"
-    MATCH (n)--(u:`biolink:PhenotypicFeature` WHERE u.id STARTS WITH "UPHENO")--
-          (m:`biolink:PhenotypicFeature` WHERE m.id STARTS WITH "{org2}")
-    RETURN count(*)
+MATCH (g:`biolink:Gene`)
+RETURN g.in_taxon AS taxon,
+       {columns}
+"""
+
+
+# -------------------------------
+# Gene degree statistics
+# -------------------------------
+# numpy/pandas are imported inside these helpers so importing the query
+# registry itself stays cheap.
+def get_gene_edge_counts_raw(conn, db=None):
+    """
+    Number of edges connected to each gene.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per gene with:
+        - gene: the gene ID
+        - taxon: the NCBITaxon identifier for the gene (categorical)
+        - edge_count: number of edges connected to the gene
     """
+    df = conn.query_df(geneDegrees_query, db=db, columns=["gene", "taxon", "edge_count"])
+    return df.astype({"taxon": "category", "edge_count": "int64"})
 
 
-def get_gene_edge_counts_by_taxon():
+def get_gene_edge_counts_by_taxon(conn, db=None):
     """
-    Query Neo4j for the number of edges connected to each gene,
-    then aggregate results by taxon.
+    Per-taxon edge statistics, aggregated on the server from the degree of every gene.
 
     Returns
     -------
@@ -165,32 +454,43 @@ def get_gene_edge_counts_by_taxon():
         - avg_edges: average number of edges per gene in that taxon
         - gene_count: number of genes in that taxon
     """
-    query = '''
-    MATCH (g:`biolink:Gene`)-[e]-()
-    RETURN g.in_taxon AS taxon, count(e) AS edge_count
-    '''
-    response = conn.query(query, db='monarch-20250217')
+    response = conn.query(geneEdgeCounts_query, db=db)
+    if response is None:
+        return None
+    df = conn.records_to_frame(response, {"total_edges": "int64", "avg_edges": "float64", "gene_count": "int64"},
+                               columns=["taxon", "total_edges", "avg_edges", "gene_count"])
+    return df.sort_values("taxon", ignore_index=True)
 
-    # Convert Neo4j response to DataFrame
-    df = pd.DataFrame(response)
 
-    # Aggregate by taxon
-    agg_df = (
-        df.groupby("taxon")
-          .agg(
-              total_edges=("edge_count", "sum"),
-              avg_edges=("edge_count", "mean"),
-              gene_count=("edge_count", "count")
-          )
-          .reset_index()
-    )
+def get_gene_edge_counts_by_type(conn, db=None, rel_types=None):
+    """
+    Edges connected to the genes of each taxon, broken down by relationship type.
 
-    return agg_df
+    Args:
+        rel_types (list): Relationship types to count (default: every type in the database).
 
-# -------------------------------
-# Phenotypic feature counts by type
-# -------------------------------
-def get_phenotypic_feature_counts_by_type():
+    Returns
+    -------
+    pd.DataFrame
+        taxon x relationship type edge counts; types no gene has are left out.
+    """
+    import pandas as pd
+    if rel_types is None:
+        response = conn.query(relationshipTypes_query, db=db)
+        if response is None:
+            return None
+        rel_types = [record[0] for record in response]
+    if not rel_types:
+        return pd.DataFrame()
+    response = conn.query(geneTypeDegrees_query(rel_types), db=db)
+    if response is None:
+        return None
+    df = pd.DataFrame([list(record) for record in response], columns=["taxon"] + list(rel_types))
+    df = df.set_index("taxon").sort_index()
+    return df.loc[:, df.sum() > 0]
+
+
+def get_phenotypic_feature_counts_by_type(conn, db=None):
     """
     Query Neo4j for the number of phenotypic features,
     grouped by their type.
@@ -202,31 +502,4 @@ def get_phenotypic_feature_counts_by_type():
         - type: the category/type of the phenotypic feature
         - feature_count: number of phenotypic features of this type
     """
-    query = '''
-    MATCH (g:`biolink:PhenotypicFeature`)
-    RETURN g.type AS type, count(g) AS feature_count
-    '''
-    response = conn.query(query, db=configDict['db'])
-
-    df = pd.DataFrame(response)
-    return df
-
-
-
-def get_gene_edge_counts_raw():
-    """
-    Query Neo4j for the number of edges connected to each gene.
-
-    Returns
-    -------
-    pd.DataFrame
-        A DataFrame with:
-        - edge_count: number of edges connected to the gene
-        - taxon: the NCBITaxon identifier for the gene
-    """
-    query = '''
-    MATCH (g:`biolink:Gene`)-[e]-()
-    RETURN count(e) AS edge_count, g.in_taxon AS taxon
-    '''
-    response = conn.query(query, db=configDict['db'])
-    return pd.DataFrame(response)
\ No newline at end of file
+    return conn.query_df(phenCountsByType_query, db=db)
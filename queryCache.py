@@ -0,0 +1,193 @@
+"""
+queryCache.py
+
+Opt-in result cache for Neo4jConnection.query.
+
+Results are keyed by (database, query text, parameters). Recently used
+results are kept in an in-memory LRU tier; with a cache directory they are
+also pickled to disk under one subdirectory per database, so they survive
+across script runs. A new KG release is loaded as a new database, so its
+queries never see an older release's results; prune() drops the directories
+of releases no longer in use. A QueryCache can be shared by threads (e.g.
+Neo4jConnection.query_many): each operation holds the cache's lock.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def _mtime(path):
+    """Modification time, or 0 for a file removed in the meantime."""
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+
+class QueryCache:
+    """
+    Two-tier (memory LRU + disk) query result cache with hit/miss statistics.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Directory for the on-disk tier. Memory only if None.
+    max_entries : int
+        Maximum number of results held in memory.
+    max_disk_bytes : int
+        Maximum total size of the on-disk tier; least recently used files are
+        removed when it is exceeded.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=1024, max_disk_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._disk_bytes = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        # guards the memory tier, the disk tier and the counters
+        self._lock = threading.RLock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(query, parameters=None):
+        """Stable hash of a query text and its parameters."""
+        payload = json.dumps([query, parameters or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, db, key):
+        return os.path.join(self.cache_dir, db or "default", key + ".pkl")
+
+    def get(self, db, query, parameters=None):
+        """Return (True, value) on a hit and (False, None) on a miss."""
+        key = (db, self.key(query, parameters))
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return True, self._memory[key]
+            if self.cache_dir is not None:
+                path = self._path(*key)
+                try:
+                    with open(path, "rb") as f:
+                        value = pickle.load(f)
+                    os.utime(path)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    pass
+                else:
+                    self.hits_disk += 1
+                    self._remember(key, value)
+                    return True, value
+            self.misses += 1
+            return False, None
+
+    def put(self, db, query, parameters, value):
+        """Store a query result in both tiers."""
+        key = (db, self.key(query, parameters))
+        with self._lock:
+            self._remember(key, value)
+            if self.cache_dir is not None:
+                path = self._path(*key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                # a unique temporary file, so writers in other processes never share it
+                fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp, path)
+                except BaseException:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+                self._disk_bytes = self.disk_bytes() - previous + os.path.getsize(path)
+                self._evict_disk()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _files(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".pkl"):
+                    yield os.path.join(root, name)
+
+    def disk_bytes(self):
+        """Total size of the on-disk tier."""
+        if self.cache_dir is None:
+            return 0
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(os.path.getsize(p) for p in self._files())
+            return self._disk_bytes
+
+    def _evict_disk(self):
+        if self.disk_bytes() <= self.max_disk_bytes:
+            return
+        for path in sorted(self._files(), key=_mtime):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                # removed by another process sharing the directory
+                continue
+            self._disk_bytes -= size
+            self.evictions += 1
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+
+    def invalidate(self, db=None):
+        """Drop cached results for one database, or everything if db is None."""
+        with self._lock:
+            if db is None:
+                self._memory.clear()
+            else:
+                for key in [k for k in self._memory if k[0] == db]:
+                    del self._memory[key]
+            if self.cache_dir is not None:
+                target = self.cache_dir if db is None else os.path.join(self.cache_dir, db)
+                shutil.rmtree(target, ignore_errors=True)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._disk_bytes = None
+
+    def prune(self, keep):
+        """Drop cached results of every database not in `keep`."""
+        keep = set(keep)
+        with self._lock:
+            for key in [k for k in self._memory if k[0] not in keep]:
+                del self._memory[key]
+            if self.cache_dir is not None:
+                for db in os.listdir(self.cache_dir):
+                    if db not in keep and os.path.isdir(os.path.join(self.cache_dir, db)):
+                        shutil.rmtree(os.path.join(self.cache_dir, db), ignore_errors=True)
+                self._disk_bytes = None
+
+    def stats(self):
+        """Hit/miss counters and current tier sizes."""
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            lookups = hits + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self.disk_bytes(),
+            }
@@ -0,0 +1,256 @@
+"""
+queryProfiler.py
+
+Opt-in per-query instrumentation for Neo4jConnection.
+
+Every query is attributed to a template: its name in the queries.py registry,
+or a short hash of its text for unregistered queries. For each execution the
+profiler records time to first record, total time, row count and, from the
+server's result summary, the planning/streaming times and update counters.
+A sampled share of executions is sent with PROFILE so their db hits are
+recorded as well.
+
+Executions slower than slow_query_ms are written to a slow-query log (JSON
+lines, or printed). report() aggregates the executions per template (count,
+p50/p95/p99, total time, rows, db hits) and can be exported as JSON or in
+the Prometheus text format, e.g. at the end of a run via write_report().
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+PREFIXES = ("EXPLAIN", "PROFILE")
+METRIC_PREFIX = "monarch_query"
+
+
+def template_id(query):
+    """Registry name of a query, or 'q_' + a short hash of its normalized text."""
+    from queries import QUERIES
+    text = query.strip()
+    for prefix in PREFIXES:
+        if text.upper().startswith(prefix):
+            text = text[len(prefix):].strip()
+    for name, registered in QUERIES.items():
+        if registered.strip() == text:
+            return name
+    return "q_" + hashlib.sha1(" ".join(text.split()).encode()).hexdigest()[:12]
+
+
+def profile_db_hits(profile):
+    """Total db hits of a PROFILE plan tree (ResultSummary.profile)."""
+    if not profile:
+        return 0
+    hits = profile.get("dbHits", 0) or 0
+    return hits + sum(profile_db_hits(child) for child in profile.get("children", []))
+
+
+class QueryProfiler:
+    """
+    Collects per-query timings and aggregates them by template.
+
+    Parameters
+    ----------
+    slow_query_ms : float, optional
+        Executions at least this slow are written to the slow-query log.
+    slow_log : str, optional
+        File the slow-query log is appended to as JSON lines; printed if None.
+    profile_sample_rate : float
+        Share of executions (0-1) run with PROFILE to record db hits.
+    report_path : str, optional
+        Where write_report() saves the report; a .prom path gives Prometheus
+        text, anything else JSON.
+    seed : int, optional
+        Seed for the PROFILE sampling.
+    """
+
+    def __init__(self, slow_query_ms=None, slow_log=None, profile_sample_rate=0.0,
+                 report_path=None, seed=None):
+        self.slow_query_ms = slow_query_ms
+        self.slow_log = slow_log
+        self.profile_sample_rate = profile_sample_rate
+        self.report_path = report_path
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._executions = defaultdict(list)
+
+    def template(self, query):
+        """Template ID of a query text (memoized)."""
+        with self._lock:
+            name = self._templates.get(query)
+        if name is None:
+            name = template_id(query)
+            with self._lock:
+                self._templates[query] = name
+        return name
+
+    def sample_profile(self, query):
+        """Whether this execution should run with PROFILE (never for EXPLAIN/PROFILE queries)."""
+        if self.profile_sample_rate <= 0 or query.lstrip().upper().startswith(PREFIXES):
+            return False
+        with self._lock:
+            return self._random.random() < self.profile_sample_rate
+
+    def start(self, query, db=None):
+        """Begin timing one execution; returns a QueryTimer."""
+        return QueryTimer(self, query, db)
+
+    def record(self, template, db=None, first_record=None, total=0.0, rows=0, summary=None,
+               error=None, cached=False):
+        """Record one finished execution (times in seconds)."""
+        execution = {
+            "template": template,
+            "db": db,
+            "first_record": first_record,
+            "total": total,
+            "rows": rows,
+            "cached": cached,
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+        }
+        if summary is not None:
+            execution.update(_summary_counters(summary))
+        with self._lock:
+            self._executions[template].append(execution)
+        if self.slow_query_ms is not None and not cached and total * 1000 >= self.slow_query_ms:
+            self._log_slow(execution)
+
+    def _log_slow(self, execution):
+        line = json.dumps({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), **execution}, default=str)
+        if self.slow_log is None:
+            print("Slow query:", line)
+            return
+        with self._lock, open(self.slow_log, "a") as f:
+            f.write(line + "\n")
+
+    # -------------------------------
+    # Reports
+    # -------------------------------
+    def report(self):
+        """
+        Executions aggregated by template.
+
+        Returns
+        -------
+        dict
+            template -> count, cache_hits, errors, rows, total_seconds,
+            p50/p95/p99 and max latency, p50 time to first record, and
+            profiled (executions sampled with PROFILE) with their db_hits.
+            Percentiles are over executions that reached the server.
+        """
+        with self._lock:
+            executions = {t: list(e) for t, e in self._executions.items()}
+        report = {}
+        for template, runs in sorted(executions.items()):
+            served = [r for r in runs if not r["cached"]]
+            totals = np.array([r["total"] for r in served])
+            firsts = np.array([r["first_record"] for r in served if r["first_record"] is not None])
+            profiled = [r for r in served if "db_hits" in r]
+            entry = {
+                "count": len(runs),
+                "cache_hits": len(runs) - len(served),
+                "errors": sum(r["error"] is not None for r in runs),
+                "rows": sum(r["rows"] for r in runs),
+                "total_seconds": float(totals.sum()),
+                "profiled": len(profiled),
+                "db_hits": sum(r["db_hits"] for r in profiled),
+            }
+            if len(totals):
+                entry.update({
+                    "p50": float(np.percentile(totals, 50)),
+                    "p95": float(np.percentile(totals, 95)),
+                    "p99": float(np.percentile(totals, 99)),
+                    "max": float(totals.max()),
+                })
+            if len(firsts):
+                entry["first_record_p50"] = float(np.percentile(firsts, 50))
+            report[template] = entry
+        return report
+
+    def to_json(self):
+        return json.dumps(self.report(), indent=2)
+
+    def to_prometheus(self):
+        """The report in the Prometheus text exposition format."""
+        report = self.report()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_duration_seconds Query latency by template.",
+            f"# TYPE {METRIC_PREFIX}_duration_seconds summary",
+        ]
+        for template, entry in report.items():
+            label = f'template="{_escape(template)}"'
+            for q in ("p50", "p95", "p99"):
+                if q in entry:
+                    lines.append(f'{METRIC_PREFIX}_duration_seconds{{{label},quantile="0.{q[1:]}"}} {entry[q]}')
+            lines.append(f"{METRIC_PREFIX}_duration_seconds_sum{{{label}}} {entry['total_seconds']}")
+            lines.append(f"{METRIC_PREFIX}_duration_seconds_count{{{label}}} {entry['count'] - entry['cache_hits']}")
+        for metric, key, help_text in (
+            ("rows_total", "rows", "Rows returned by template."),
+            ("errors_total", "errors", "Failed executions by template."),
+            ("cache_hits_total", "cache_hits", "Executions answered by the query cache."),
+            ("db_hits_total", "db_hits", "Database hits of the PROFILE-sampled executions."),
+            ("profiled_total", "profiled", "Executions sampled with PROFILE."),
+        ):
+            lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric} counter")
+            for template, entry in report.items():
+                lines.append(f'{METRIC_PREFIX}_{metric}{{template="{_escape(template)}"}} {entry[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path=None):
+        """Save the report to path (default: report_path); .prom gives Prometheus text, else JSON."""
+        path = path or self.report_path
+        if path is None:
+            return None
+        with open(path, "w") as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+        return path
+
+
+class QueryTimer:
+    """Times one execution: call first_record() when the first record arrives, then finish()."""
+
+    def __init__(self, profiler, query, db):
+        self.profiler = profiler
+        self.template = profiler.template(query)
+        self.db = db
+        self.started = time.perf_counter()
+        self.first = None
+        self.finished = False
+
+    def first_record(self):
+        if self.first is None:
+            self.first = time.perf_counter() - self.started
+
+    def finish(self, rows=0, summary=None, error=None, cached=False):
+        if self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self.started
+        if rows and self.first is None:
+            self.first = total
+        self.profiler.record(self.template, self.db, self.first, total, rows, summary, error, cached)
+
+
+def _summary_counters(summary):
+    """Server-side timings, update counters and (for PROFILE runs) db hits of a ResultSummary."""
+    counters = {
+        "available_after_ms": getattr(summary, "result_available_after", None),
+        "consumed_after_ms": getattr(summary, "result_consumed_after", None),
+    }
+    updates = getattr(summary, "counters", None)
+    if updates is not None and updates.contains_updates:
+        counters["updates"] = {k: v for k, v in vars(updates).items() if not k.startswith("_") and v}
+    profile = getattr(summary, "profile", None)
+    if profile:
+        counters["db_hits"] = profile_db_hits(profile)
+    return counters
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
@@ -0,0 +1,591 @@
+"""
+releaseDelta.py
+
+Incremental analysis outputs across KG releases.
+
+compute_outputs() derives, from one release snapshot (kgSnapshot), the
+outputs the analyses report and persists them with the per-item state they
+are aggregated from:
+
+    release_outputs/monarch20250815/
+        manifest.json               snapshot, similarity settings, prefixes
+        sankey_genes.parquet        Sankey category of every human gene with orthologs
+        sankey.csv                  Sankey flows (OrthologSankeyDataExpanded.csv layout)
+        ortholog_taxon_counts.csv   ortholog edges per ordered taxon pair
+        upheno_term_counts.parquet  phenotypes per uPheno term and prefix
+        upheno_prefix_counts.csv    uPheno connections per ordered prefix pair
+        similarity.parquet          ortholog-disease Jaccard results (semSimPipeline)
+        key_numbers.json            the paper's headline counts
+
+diff_releases() compares two snapshots table by table (row hashes, so the
+comparison is one columnar pass) and returns the added and removed genes,
+ortholog edges, gene-phenotype, gene-disease, disease-phenotype and uPheno
+edges. Rows are compared as multisets: a row that appears more (or fewer)
+times in the new release, e.g. a parallel ortholog edge, is added (removed)
+once per extra (missing) copy, since the outputs count repeated rows. update_outputs() starts from the previous release's outputs and
+recomputes only what the delta touches:
+
+- Sankey: the human genes incident to a changed edge;
+- ortholog taxon matrix: the changed edges (and those of genes whose taxon
+  changed) are subtracted and added;
+- uPheno prefix matrix: the counts of the uPheno terms with changed links;
+- similarity: orthologs whose phenotypes or human orthologs changed are
+  rescored against every disease, diseases whose phenotypes changed against
+  every ortholog, and the gene-disease filter and flag are reapplied.
+
+The remaining rows are carried over, so the scoring cost follows the size of
+the change. Similarity updates assume the uPheno closure did not change
+between the releases; rebuild from scratch with compute_outputs when it did.
+key_numbers_diff.md in the new output directory shows how the key numbers
+moved.
+
+Usage:
+    python releaseDelta.py baseline snapshots/monarch20250812 release_outputs/monarch20250812
+    python releaseDelta.py update snapshots/monarch20250812 snapshots/monarch20250815 \\
+        release_outputs/monarch20250812 release_outputs/monarch20250815
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import coverageBitmaps
+from coverageBitmaps import SANKEY_BUCKETS, ortholog_bucket
+from kgSnapshot import HAS_PHENOTYPE, SnapshotConnection
+
+MANIFEST = "manifest.json"
+
+# columns identifying a row of each snapshot table (genes ignore the derived degree)
+TABLE_KEYS = {
+    "genes": ["id", "in_taxon"],
+    "orthologs": ["subject", "object"],
+    "gene_phenotypes": ["gene", "phenotype", "predicate"],
+    "gene_diseases": ["gene", "disease", "predicate"],
+    "phenotypes": ["id", "namespace", "type"],
+    "disease_phenotypes": ["disease", "phenotype"],
+    "upheno_links": ["upheno", "phenotype"],
+}
+
+# phenotype prefixes of uphenoConns.phenotype_pattern
+DEFAULT_PREFIXES = ['HP', 'ZP', 'MP', 'WB', 'FYPO', 'XPO', 'DDPHENO']
+
+
+def open_release(path):
+    """The snapshot tables of one release directory (kgSnapshot layout)."""
+    return SnapshotConnection(path).snapshot()
+
+
+# -------------------------------
+# Release diff
+# -------------------------------
+def _row_hashes(df, columns):
+    return pd.util.hash_pandas_object(df[columns].astype(object), index=False).to_numpy()
+
+
+def _surplus(df, hashes, other_hashes, columns):
+    """Rows of df beyond the number of copies of the same row in the other table."""
+    available = pd.Series(other_hashes).value_counts().reindex(hashes, fill_value=0).to_numpy()
+    copy = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    return df.loc[copy >= available, columns].reset_index(drop=True)
+
+
+def table_delta(old, new, columns):
+    """
+    Rows of `new` missing from `old` (added) and of `old` missing from `new`
+    (removed), with one row per copy that differs: a row present twice in
+    `new` and once in `old` is added once.
+    """
+    old_hashes, new_hashes = _row_hashes(old, columns), _row_hashes(new, columns)
+    return _surplus(new, new_hashes, old_hashes, columns), _surplus(old, old_hashes, new_hashes, columns)
+
+
+class ReleaseDelta:
+    """
+    Added and removed rows of every snapshot table between two releases.
+
+    Attributes
+    ----------
+    added, removed : dict
+        table name -> DataFrame with the TABLE_KEYS columns.
+    """
+
+    def __init__(self, old, new, tables=TABLE_KEYS):
+        self.old = old
+        self.new = new
+        self.added, self.removed = {}, {}
+        for name, columns in tables.items():
+            self.added[name], self.removed[name] = table_delta(old.table(name), new.table(name), columns)
+
+    def changed(self, name):
+        """Added and removed rows of one table together."""
+        return pd.concat([self.added[name], self.removed[name]], ignore_index=True)
+
+    def retaxoned_genes(self):
+        """Genes present in both releases whose in_taxon changed."""
+        added, removed = self.added["genes"], self.removed["genes"]
+        return set(added["id"]) & set(removed["id"])
+
+    def summary(self):
+        """name -> (rows added, rows removed)."""
+        return {name: (len(self.added[name]), len(self.removed[name])) for name in self.added}
+
+
+def diff_releases(old_path, new_path):
+    """ReleaseDelta between two snapshot directories."""
+    return ReleaseDelta(open_release(old_path), open_release(new_path))
+
+
+# -------------------------------
+# Sankey categories
+# -------------------------------
+def sankey_genes(release, genes=None):
+    """
+    Sankey category of human genes with orthologs, as in orthologSankey.orthoSankey.
+
+    Parameters
+    ----------
+    genes : collection, optional
+        Restrict to these genes (default: every HGNC gene with an ortholog).
+
+    Returns
+    -------
+    pandas.DataFrame
+        gene, bucket ('one', 'one_org' or 'many'), has_phenotype, has_disease.
+    """
+    o = release.orthologs_undirected()
+    o = o[o["m"].str.startswith("HGNC")]
+    if genes is not None:
+        o = o[o["m"].isin(genes)]
+    prefixes = o.assign(prefix=o["n"].str.split(":").str[0]).groupby(["m", "prefix"]).size()
+    per_gene = prefixes.groupby(level="m").agg(["size", "sum"])
+    bucket = ortholog_bucket(per_gene["size"], per_gene["sum"])
+    gene_ids = per_gene.index.to_numpy()
+    return pd.DataFrame({
+        "gene": gene_ids,
+        "bucket": bucket,
+        "has_phenotype": np.isin(gene_ids, release.table("gene_phenotypes")["gene"].to_numpy()),
+        "has_disease": np.isin(gene_ids, release.table("gene_diseases")["gene"].to_numpy()),
+    })
+
+
+def sankey_flows(states):
+    """The orthoSankey source/target/value rows from sankey_genes states."""
+    counts = {}
+    for bucket in SANKEY_BUCKETS:
+        in_bucket = states[states["bucket"] == bucket]
+        disease, phenotype = in_bucket["has_disease"], in_bucket["has_phenotype"]
+        counts[bucket] = {
+            'genes': len(in_bucket),
+            'disease': int(disease.sum()),
+            'no_disease': int((~disease).sum()),
+            'disease_phenotype': int((disease & phenotype).sum()),
+            'no_disease_phenotype': int((~disease & ~phenotype).sum()),
+        }
+    return coverageBitmaps.sankey_flows(counts)
+
+
+def update_sankey(states, delta):
+    """Recompute the states of the human genes incident to a changed edge."""
+    affected = set()
+    for name, columns in (("orthologs", ["subject", "object"]), ("gene_phenotypes", ["gene"]),
+                          ("gene_diseases", ["gene"])):
+        changed = delta.changed(name)
+        for column in columns:
+            affected.update(changed[column][changed[column].str.startswith("HGNC")])
+    affected |= {g for g in delta.retaxoned_genes() if g.startswith("HGNC")}
+    kept = states[~states["gene"].isin(affected)]
+    updated = sankey_genes(delta.new, affected)
+    return pd.concat([kept, updated], ignore_index=True).sort_values("gene", ignore_index=True), len(affected)
+
+
+# -------------------------------
+# Ortholog taxon matrix
+# -------------------------------
+def _taxon_pairs(edges, taxa):
+    """Ordered (taxon1, taxon2) counts of undirected edges, as orthoTaxonMatrix counts them."""
+    t1, t2 = edges["subject"].map(taxa), edges["object"].map(taxa)
+    both = pd.DataFrame({"taxon1": pd.concat([t1, t2], ignore_index=True),
+                         "taxon2": pd.concat([t2, t1], ignore_index=True)})
+    return both.groupby(["taxon1", "taxon2"]).size()
+
+
+def ortholog_taxon_counts(release):
+    """Ortholog edges per ordered taxon pair (taxon1, taxon2, count)."""
+    taxa = release.table("genes").set_index("id")["in_taxon"]
+    counts = _taxon_pairs(release.table("orthologs"), taxa)
+    return counts.rename("count").reset_index()
+
+
+def _incident_edges(release, genes):
+    o = release.table("orthologs")
+    return o.loc[o["subject"].isin(genes) | o["object"].isin(genes), ["subject", "object"]]
+
+
+def update_ortholog_taxon_counts(counts, delta):
+    """Apply the changed ortholog edges (and those of re-taxoned genes) to the taxon pair counts."""
+    removed, added = delta.removed["orthologs"], delta.added["orthologs"]
+    retaxoned = delta.retaxoned_genes()
+    if retaxoned:
+        # all their edges move from the old taxon pair to the new one; their rows
+        # in the delta are covered by that and dropped
+        def untouched(edges):
+            return edges[~edges["subject"].isin(retaxoned) & ~edges["object"].isin(retaxoned)]
+        removed = pd.concat([untouched(removed), _incident_edges(delta.old, retaxoned)], ignore_index=True)
+        added = pd.concat([untouched(added), _incident_edges(delta.new, retaxoned)], ignore_index=True)
+    old_taxa = delta.old.table("genes").set_index("id")["in_taxon"]
+    new_taxa = delta.new.table("genes").set_index("id")["in_taxon"]
+    change = _taxon_pairs(added, new_taxa).sub(_taxon_pairs(removed, old_taxa), fill_value=0)
+    total = counts.set_index(["taxon1", "taxon2"])["count"].add(change, fill_value=0)
+    total = total[total != 0].astype(np.int64)
+    return total.rename("count").reset_index().sort_values(["taxon1", "taxon2"], ignore_index=True)
+
+
+# -------------------------------
+# uPheno prefix matrix
+# -------------------------------
+def _prefix_matrix(phenotypes, prefixes):
+    ids = pd.Series(phenotypes, dtype=object).fillna("")
+    return np.column_stack([ids.str.startswith(p).to_numpy(dtype=np.int64) for p in prefixes])
+
+
+def upheno_term_counts(release, prefixes=DEFAULT_PREFIXES, terms=None):
+    """Phenotypes of each prefix linked to each uPheno term (uPheno terms x prefixes)."""
+    links = release.table("upheno_links")
+    if terms is not None:
+        links = links[links["upheno"].isin(terms)]
+    matches = _prefix_matrix(links["phenotype"], prefixes)
+    return pd.DataFrame(matches, columns=list(prefixes)).groupby(links["upheno"].to_numpy()).sum()
+
+
+def upheno_prefix_counts(release, prefixes=DEFAULT_PREFIXES):
+    """
+    uPheno connections per ordered prefix pair, as uphenoPrefixMatrix counts
+    them: sum over uPheno terms of C[u,p1] * C[u,p2], minus the pairs that
+    reuse one link.
+
+    Returns
+    -------
+    per_term : pandas.DataFrame
+        upheno_term_counts.
+    pairs : pandas.DataFrame
+        prefixes x prefixes counts.
+    """
+    per_term = upheno_term_counts(release, prefixes)
+    matches = _prefix_matrix(release.table("upheno_links")["phenotype"], prefixes)
+    C = per_term.to_numpy()
+    pairs = C.T @ C - matches.T @ matches
+    return per_term, pd.DataFrame(pairs, index=list(prefixes), columns=list(prefixes))
+
+
+def update_upheno_prefix_counts(per_term, pairs, delta, prefixes=DEFAULT_PREFIXES):
+    """Replace the counts of the uPheno terms with changed links and adjust the pair matrix."""
+    added, removed = delta.added["upheno_links"], delta.removed["upheno_links"]
+    terms = set(added["upheno"]) | set(removed["upheno"])
+    old_C = per_term.reindex(sorted(terms), fill_value=0).to_numpy()
+    fresh = upheno_term_counts(delta.new, prefixes, terms)
+    new_C = fresh.to_numpy()
+    added_m, removed_m = _prefix_matrix(added["phenotype"], prefixes), _prefix_matrix(removed["phenotype"], prefixes)
+    change = new_C.T @ new_C - old_C.T @ old_C - (added_m.T @ added_m - removed_m.T @ removed_m)
+    pairs = pairs + change
+    per_term = pd.concat([per_term[~per_term.index.isin(terms)], fresh]).sort_index()
+    return per_term, pairs, len(terms)
+
+
+# -------------------------------
+# Similarity
+# -------------------------------
+def _phenotype_lists(release, orthologs=None):
+    gp = release.table("gene_phenotypes")
+    gp = gp[gp["predicate"] == HAS_PHENOTYPE]
+    if orthologs is not None:
+        gp = gp[gp["gene"].isin(orthologs)]
+    return gp.groupby("gene", sort=False)["phenotype"].apply(list).to_dict()
+
+
+def _humans_by_ortholog(release, orthologs=None):
+    o = release.orthologs_undirected()
+    o = o[o["m"].str.startswith("HGNC")]
+    if orthologs is not None:
+        o = o[o["n"].isin(orthologs)]
+    o = o.drop_duplicates()
+    return o.groupby("n", sort=False)["m"].apply(list).to_dict()
+
+
+def _prepare(release, orthologs=None, diseases=None, gene_diseases=None):
+    """semSimPipeline.PreparedAnalysis over a subset of orthologs and diseases, from snapshot tables."""
+    import semSimPipeline
+    humans_by_ortho = _humans_by_ortholog(release, orthologs)
+    phens = _phenotype_lists(release, humans_by_ortho.keys())
+    ortho_ids = [o for o in humans_by_ortho if len(phens.get(o, [])) >= semSimPipeline.MIN_PHENOTYPES]
+    dp = release.table("disease_phenotypes")
+    if diseases is not None:
+        dp = dp[dp["disease"].isin(diseases)]
+    disease_phens = dp.groupby("disease", sort=False)["phenotype"].apply(list)
+    ortho_matrix, disease_matrix = semSimPipeline.ancestorMatrices(
+        [phens[o] for o in ortho_ids], list(disease_phens))
+    human_genes = sorted({h for humans in humans_by_ortho.values() for h in humans})
+    return semSimPipeline.PreparedAnalysis(
+        human_genes, humans_by_ortho, ortho_ids, ortho_matrix,
+        list(disease_phens.index), disease_matrix, gene_diseases)
+
+
+def gene_disease_index(release):
+    import semSimPipeline
+    gd = release.table("gene_diseases")
+    return semSimPipeline.GeneDiseaseIndex(zip(gd["gene"], gd["disease"]))
+
+
+def similarity_results(release, threshold, candidates="exact", orthologs=None, diseases=None, gene_diseases=None):
+    """Jaccard results (semSimPipeline.RESULT_COLUMNS) for all or some orthologs and diseases."""
+    import semSimPipeline
+    if gene_diseases is None:
+        gene_diseases = gene_disease_index(release)
+    prepared = _prepare(release, orthologs, diseases, gene_diseases)
+    if not prepared.ortho_ids or not prepared.disease_ids:
+        return pd.DataFrame(columns=semSimPipeline.RESULT_COLUMNS)
+    return semSimPipeline.scoreGenes(prepared, threshold=threshold, candidates=candidates, backend="jaccard")
+
+
+def update_similarity(results, delta, threshold, candidates="exact"):
+    """
+    Carry over the similarity rows the delta leaves untouched and rescore the rest.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+    orthologs, diseases : set
+        The rescored orthologs and diseases.
+    """
+    def has_phenotype(frame):
+        return frame[frame["predicate"] == HAS_PHENOTYPE]
+
+    orthologs = set(has_phenotype(delta.changed("gene_phenotypes"))["gene"])
+    changed_orthologs = delta.changed("orthologs")
+    for a, b in (("subject", "object"), ("object", "subject")):
+        # a changed (human, ortholog) pair: rescore the ortholog for all its humans
+        orthologs.update(changed_orthologs.loc[changed_orthologs[a].str.startswith("HGNC"), b])
+    diseases = set(delta.changed("disease_phenotypes")["disease"])
+
+    new_gd = gene_disease_index(delta.new)
+    gd_added, gd_removed = delta.added["gene_diseases"], delta.removed["gene_diseases"]
+    # pairs no longer filtered out may now have rows: rescore the orthologs of those humans
+    freed = {h for h, d in zip(gd_removed["gene"], gd_removed["disease"]) if not new_gd.has(d, h)}
+    if freed:
+        for ortho, humans in _humans_by_ortholog(delta.new).items():
+            if freed.intersection(humans):
+                orthologs.add(ortho)
+
+    kept = results[~results["ortholog_gene"].isin(orthologs) & ~results["disease"].isin(diseases)]
+    blocked = {(h, d) for h, d in zip(gd_added["gene"], gd_added["disease"])}
+    if blocked:
+        pairs = pd.Series(list(zip(kept["human_gene"], kept["disease"])), index=kept.index)
+        kept = kept[~pairs.isin(blocked)]
+    flagged = set(gd_added["disease"]) | set(gd_removed["disease"])
+    if flagged:
+        kept = kept.copy()
+        rows = kept["disease"].isin(flagged)
+        kept.loc[rows, "disease_has_gene_assoc"] = [new_gd.disease_has_gene(d) for d in kept.loc[rows, "disease"]]
+
+    parts = [kept]
+    if orthologs:
+        parts.append(similarity_results(delta.new, threshold, candidates, orthologs=orthologs, gene_diseases=new_gd))
+    if diseases:
+        others = set(_humans_by_ortholog(delta.new)) - orthologs
+        parts.append(similarity_results(delta.new, threshold, candidates, orthologs=others, diseases=diseases,
+                                        gene_diseases=new_gd))
+    parts = [p for p in parts if len(p)]
+    updated = pd.concat(parts, ignore_index=True) if parts else results.iloc[:0]
+    updated = updated.sort_values(["human_gene", "ortholog_gene", "disease"], ignore_index=True)
+    return updated, orthologs, diseases
+
+
+# -------------------------------
+# Key numbers
+# -------------------------------
+def key_numbers(release, sankey=None, similarity=None):
+    """
+    The paper's headline counts for one release.
+
+    Returns
+    -------
+    dict
+        metric name -> count.
+    """
+    genes = release.table("genes")
+    gp, gd = release.table("gene_phenotypes"), release.table("gene_diseases")
+    human = genes["id"][genes["id"].str.startswith("HGNC")]
+    phenotyped = set(gp["gene"])
+    o = release.orthologs_undirected()
+    o = o[o["m"].str.startswith("HGNC")]
+    unannotated = o[~o["m"].isin(phenotyped) & o["n"].isin(phenotyped)]
+    numbers = {
+        "human genes": len(human),
+        "human genes with orthologs": int(o["m"].nunique()),
+        "human genes without phenotypes whose orthologs have phenotypes": int(unannotated["m"].nunique()),
+        "human genes with disease associations": int(gd["gene"][gd["gene"].str.startswith("HGNC")].nunique()),
+        "diseases with phenotypes": int(release.table("disease_phenotypes")["disease"].nunique()),
+        "diseases with human gene associations": int(gd["disease"][gd["gene"].str.startswith("HGNC")].nunique()),
+        "ortholog edges": len(release.table("orthologs")),
+        "gene-phenotype edges": len(gp),
+        "gene-disease edges": len(gd),
+        "uPheno links": len(release.table("upheno_links")),
+    }
+    for taxon, count in genes.groupby("in_taxon").size().items():
+        numbers[f"genes [{taxon}]"] = int(count)
+    for namespace, count in release.table("phenotypes").groupby("namespace").size().items():
+        numbers[f"phenotypes [{namespace}]"] = int(count)
+    if sankey is not None:
+        for source, target, value in sankey.itertuples(index=False):
+            numbers[f"sankey [{source} -> {target}]"] = int(value)
+    if similarity is not None:
+        numbers["similarity pairs"] = len(similarity)
+        numbers["similarity human genes"] = int(similarity["human_gene"].nunique())
+        numbers["similarity diseases"] = int(similarity["disease"].nunique())
+    return numbers
+
+
+def diff_key_numbers(old, new):
+    """Metrics of both releases side by side, changed ones first."""
+    df = pd.DataFrame({"old": pd.Series(old, dtype="Int64"), "new": pd.Series(new, dtype="Int64")})
+    df = df.fillna(0)
+    df["change"] = df["new"] - df["old"]
+    df["change_pct"] = (100 * df["change"] / df["old"].where(df["old"] != 0)).astype(float).round(2)
+    df.index.name = "metric"
+    return df.sort_values("change", key=lambda c: c == 0, kind="stable")
+
+
+def format_key_numbers_diff(diff, old_name, new_name):
+    """Markdown table of diff_key_numbers."""
+    lines = [f"| metric | {old_name} | {new_name} | change | % |", "|---|---:|---:|---:|---:|"]
+    for metric, row in diff.iterrows():
+        pct = "" if pd.isna(row["change_pct"]) else f"{row['change_pct']:+.2f}"
+        lines.append(f"| {metric} | {row['old']} | {row['new']} | {row['change']:+d} | {pct} |")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------
+# Persisted outputs
+# -------------------------------
+def _write_outputs(out_dir, manifest, states, taxon_counts, per_term, pairs, similarity, numbers):
+    os.makedirs(out_dir, exist_ok=True)
+    states.to_parquet(os.path.join(out_dir, "sankey_genes.parquet"), index=False)
+    sankey_flows(states).to_csv(os.path.join(out_dir, "sankey.csv"))
+    taxon_counts.to_csv(os.path.join(out_dir, "ortholog_taxon_counts.csv"), index=False)
+    per_term.to_parquet(os.path.join(out_dir, "upheno_term_counts.parquet"))
+    pairs.to_csv(os.path.join(out_dir, "upheno_prefix_counts.csv"))
+    similarity.to_parquet(os.path.join(out_dir, "similarity.parquet"), index=False)
+    with open(os.path.join(out_dir, "key_numbers.json"), "w") as f:
+        json.dump(numbers, f, indent=2)
+    manifest["created"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return out_dir
+
+
+def read_outputs(out_dir):
+    """Load the outputs written by compute_outputs / update_outputs."""
+    with open(os.path.join(out_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    return {
+        "manifest": manifest,
+        "states": pd.read_parquet(os.path.join(out_dir, "sankey_genes.parquet")),
+        "taxon_counts": pd.read_csv(os.path.join(out_dir, "ortholog_taxon_counts.csv")),
+        "per_term": pd.read_parquet(os.path.join(out_dir, "upheno_term_counts.parquet")),
+        "pairs": pd.read_csv(os.path.join(out_dir, "upheno_prefix_counts.csv"), index_col=0),
+        "similarity": pd.read_parquet(os.path.join(out_dir, "similarity.parquet")),
+    }
+
+
+def compute_outputs(snapshot, out_dir, threshold=None, candidates="exact", prefixes=DEFAULT_PREFIXES):
+    """
+    Compute every output of one release from scratch and write them to out_dir.
+
+    Returns
+    -------
+    str
+        out_dir.
+    """
+    import semSimPipeline
+    threshold = semSimPipeline.SIMILARITY_THRESHOLD if threshold is None else threshold
+    release = open_release(snapshot)
+    states = sankey_genes(release)
+    taxon_counts = ortholog_taxon_counts(release)
+    per_term, pairs = upheno_prefix_counts(release, prefixes)
+    similarity = similarity_results(release, threshold, candidates)
+    numbers = key_numbers(release, sankey_flows(states), similarity)
+    manifest = {"snapshot": os.path.abspath(snapshot), "threshold": threshold, "candidates": candidates,
+                "prefixes": list(prefixes), "update_of": None}
+    return _write_outputs(out_dir, manifest, states, taxon_counts, per_term, pairs, similarity, numbers)
+
+
+def update_outputs(old_snapshot, new_snapshot, old_out, new_out):
+    """
+    Derive the outputs of the new release from those of the old one and the
+    delta between the two snapshots, and write them to new_out together with
+    key_numbers_diff.md.
+
+    Returns
+    -------
+    dict
+        Rows changed per table and the work done per output.
+    """
+    previous = read_outputs(old_out)
+    manifest = previous["manifest"]
+    delta = diff_releases(old_snapshot, new_snapshot)
+    prefixes = manifest["prefixes"]
+
+    states, genes_updated = update_sankey(previous["states"], delta)
+    taxon_counts = update_ortholog_taxon_counts(previous["taxon_counts"], delta)
+    per_term, pairs, terms_updated = update_upheno_prefix_counts(previous["per_term"], previous["pairs"],
+                                                                 delta, prefixes)
+    similarity, orthologs, diseases = update_similarity(previous["similarity"], delta, manifest["threshold"],
+                                                        manifest["candidates"])
+    numbers = key_numbers(delta.new, sankey_flows(states), similarity)
+
+    new_manifest = dict(manifest, snapshot=os.path.abspath(new_snapshot), update_of=os.path.abspath(old_out))
+    _write_outputs(new_out, new_manifest, states, taxon_counts, per_term, pairs, similarity, numbers)
+    with open(os.path.join(old_out, "key_numbers.json")) as f:
+        old_numbers = json.load(f)
+    diff = diff_key_numbers(old_numbers, numbers)
+    with open(os.path.join(new_out, "key_numbers_diff.md"), "w") as f:
+        f.write(format_key_numbers_diff(diff, os.path.basename(os.path.normpath(old_snapshot)),
+                                        os.path.basename(os.path.normpath(new_snapshot))))
+    return {
+        "rows_changed": delta.summary(),
+        "sankey_genes_updated": genes_updated,
+        "upheno_terms_updated": terms_updated,
+        "orthologs_rescored": len(orthologs),
+        "diseases_rescored": len(diseases),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental analysis outputs across KG releases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    baseline = commands.add_parser("baseline", help="compute the outputs of one release from scratch")
+    baseline.add_argument("snapshot")
+    baseline.add_argument("out_dir")
+    baseline.add_argument("--threshold", type=float)
+    baseline.add_argument("--candidates", default="exact", choices=["exact", "minhash"])
+    update = commands.add_parser("update", help="update the previous release's outputs to a new release")
+    update.add_argument("old_snapshot")
+    update.add_argument("new_snapshot")
+    update.add_argument("old_out")
+    update.add_argument("new_out")
+    diff = commands.add_parser("diff", help="rows added and removed per table between two snapshots")
+    diff.add_argument("old_snapshot")
+    diff.add_argument("new_snapshot")
+    args = parser.parse_args()
+
+    if args.command == "baseline":
+        print("Outputs written to", compute_outputs(args.snapshot, args.out_dir, args.threshold, args.candidates))
+    elif args.command == "update":
+        print(json.dumps(update_outputs(args.old_snapshot, args.new_snapshot, args.old_out, args.new_out), indent=2))
+        print("Key number changes in", os.path.join(args.new_out, "key_numbers_diff.md"))
+    else:
+        for name, (added, removed) in diff_releases(args.old_snapshot, args.new_snapshot).summary().items():
+            print(f"{name}: +{added} -{removed}")
@@ -7,60 +7,106 @@ Pipeline:
 5. For diseases that are similar, check if they already have gene associations.
 """
 
-import json
+import os
+from collections import defaultdict
+
+import numpy as np
 import pandas as pd
-from semsimian import Semsimian
-from neo4jConnection import Neo4jConnection
+from scipy import sparse
+from neo4jConnection import lazy_connect
 from neo4jConfig import configDict
 from queries import *
-
-from oaklib import get_adapter
+from jaccardEngine import build_ancestor_matrices, jaccard_pairs
+from candidateIndex import candidate_pairs, score_pairs
+from uphenoClosure import ClosureIndex
+from similarityBackends import DEFAULT_BACKEND, get_backend, information_content
 
 # -------------------------------
-# Load UPheno ontology remotely
+# UPheno ontology
 # -------------------------------
-# This pulls from OBO PURL; no local file needed
-adapter = get_adapter("sqlite:obo:upheno")
+# Ancestors come from the precomputed closure in CLOSURE_DIR (build it with
+# `python uphenoClosure.py upheno.db`). Only if it is missing is the uPheno
+# SQLite adapter opened, on first use; it pulls from the OBO PURL.
+CLOSURE_DIR = "upheno_closure"
+_closure = None
+_adapter = None
+
+
+def getClosure():
+    """Return the precomputed ClosureIndex, or None if CLOSURE_DIR has not been built."""
+    global _closure
+    if _closure is None and os.path.exists(os.path.join(CLOSURE_DIR, "manifest.json")):
+        _closure = ClosureIndex.load(CLOSURE_DIR)
+    return _closure
+
+
+def getAdapter():
+    """Return the remote uPheno OAK adapter, opening it on first use."""
+    global _adapter
+    if _adapter is None:
+        from oaklib import get_adapter
+        _adapter = get_adapter("sqlite:obo:upheno")
+    return _adapter
 
 
 # -------------------------------
 # Connect to Neo4j
 # -------------------------------
-conn = Neo4jConnection(
-    uri=configDict['uri'],
-    user=configDict['user'],
-    pwd=configDict['pwd']
-)
+conn = lazy_connect(configDict)
 
-DB_NAME = "monarch-20250217"
+# minimum similarity_score for an (ortholog, disease) pair to be reported, in
+# the units of the similarity backend
+SIMILARITY_THRESHOLD = 0.4
+# ancestor Jaccard a pair needs to be scored by a non-Jaccard backend; looser
+# than SIMILARITY_THRESHOLD so those backends can report pairs Jaccard rejects
+BACKEND_CANDIDATE_THRESHOLD = 0.1
+# orthologs with fewer phenotypes than this are skipped
+MIN_PHENOTYPES = 4
+# how (ortholog, disease) pairs are chosen for scoring: "exact" (inverted
+# index with prefix filtering), "minhash" (approximate LSH), or None (all pairs)
+CANDIDATE_METHOD = "exact"
+# similarity measure reported for the candidate pairs: "jaccard", "resnik",
+# "phenodigm" or "semsimian" (see similarityBackends)
+SIMILARITY_BACKEND = DEFAULT_BACKEND
 
 # -------------------------------
 # Step 1: Get Human Genes + Orthologs
 # -------------------------------
 def getHumanGenes():
-    response = conn.query(nameHGNC_query, db=DB_NAME)
-    return [item for sublist in json.loads(json.dumps(response)) for item in sublist]
+    return conn.column(nameHGNC_query, db=configDict['db']).tolist()
 
 def getOrthologs(hgene):
-    query = namesgeneOrthos_query(hgene)
-    response = conn.query(query, db=DB_NAME)
-    return [item for sublist in json.loads(json.dumps(response)) for item in sublist]
+    return conn.column(*namesgeneOrthos_query(hgene), db=configDict['db']).tolist()
+
+def getOrthologMap(human_genes):
+    """Map each human gene in human_genes to its orthologs, from one query over all HGNC orthologs."""
+    human_genes = set(human_genes)
+    orthologs = defaultdict(list)
+    for record in conn.query_iter(nameHGNCOrthos_query, db=configDict['db']):
+        if record[1] in human_genes:
+            orthologs[record[1]].append(record[0])
+    return orthologs
 
 # -------------------------------
 # Step 2: Get Phenotypes for Ortholog Genes
 # -------------------------------
 def getPhenotypes(gene_id):
-    query = nameGenePhen_query(gene_id)
-    response = conn.query(query, db=DB_NAME)
-    return [item for sublist in json.loads(json.dumps(response)) for item in sublist]
+    return conn.column(*nameGenePhen_query(gene_id), db=configDict['db']).tolist()
+
+def getPhenotypesBatch(gene_ids, batch_size=BATCH_SIZE):
+    """Phenotypes of many genes, one query per batch of gene IDs."""
+    phenotypes = {}
+    for batch in chunked(gene_ids, batch_size):
+        for record in conn.query_iter(genePhens_batch_query, {'genes': batch}, db=configDict['db']):
+            phenotypes[record['gene']] = record['phenotypes']
+    return phenotypes
 
 # -------------------------------
 # Step 3: Get Disease Phenotypes
 # -------------------------------
 def getDiseasePhenotypes():
-    query = "MATCH (d:`biolink:Disease`)-[:`biolink:has_phenotype`]-(p:`biolink:PhenotypicFeature`) RETURN d.id, collect(p.id)"
-    response = conn.query(query, db=DB_NAME)
-    return [(row[0], row[1]) for row in response]
+    # stream rows so the full Record list is never held next to the tuples
+    return [(row[0], row[1]) for row in conn.query_iter(diseasePhens_query, db=configDict['db'])]
 
 # -------------------------------
 # Step 4: Semantic Similarity
@@ -69,11 +115,18 @@ def getDiseasePhenotypes():
 # -------------------------------
 # Ancestor-based Jaccard similarity
 # -------------------------------
+def term_ancestors(term):
+    """Return the ancestors of one phenotype term, including itself."""
+    closure = getClosure()
+    if closure is not None:
+        return closure.ancestors(term)
+    return getAdapter().ancestors(term, reflexive=True)
+
 def get_ancestors(terms):
     """Return set of ancestors + self for each phenotype term."""
     ancestors = set()
     for t in terms:
-        for a in adapter.ancestors(t, reflexive=True):
+        for a in term_ancestors(t):
             ancestors.add(a)
     return ancestors
 
@@ -83,14 +136,35 @@ def jaccard_similarity(set1, set2):
     return len(set1 & set2) / len(set1 | set2)
 
 
-def computeSimilarity(ortho_phens, disease_phens):
+def computeSimilarity(ortho_phens, disease_phens, backend=SIMILARITY_BACKEND, background=()):
+    """
+    Compute semantic similarity between two phenotype sets with a similarity
+    backend (a name or a SimilarityBackend; ancestor Jaccard by default).
+
+    The information content used by resnik and phenodigm is estimated from
+    the two sets plus the phenotype sets in `background`, e.g. every disease's
+    phenotypes; scoreGenes uses the whole prepared analysis instead.
+    """
+    if not ortho_phens or not disease_phens:
+        return 0.0
+    ortho_matrix, disease_matrix, terms, ortho_terms, disease_terms, term_matrix = \
+        encodePhenotypeSets([ortho_phens], [disease_phens, *background])
+    prepared = PreparedAnalysis([], {}, ["ortholog"], ortho_matrix, list(range(disease_matrix.shape[0])),
+                                disease_matrix, None, terms, ortho_terms, disease_terms, term_matrix)
+    return float(getBackend(backend, prepared).score(prepared, np.array([0]), np.array([0]))[0])
+
+def ontologyEdges(terms):
+    """subClassOf edges from each term to its ancestors, for loading into semsimian."""
+    return [(t, "rdfs:subClassOf", a) for t in terms for a in term_ancestors(t) if a != t]
+
+def getBackend(backend=SIMILARITY_BACKEND, prepared=None):
     """
-    Compute semantic similarity between two phenotype sets
-    using ancestor-based Jaccard index.
+    Similarity backend by name. The semsimian backend is loaded with the
+    ancestors of the prepared analysis terms.
     """
-    ortho_anc = get_ancestors(ortho_phens)
-    disease_anc = get_ancestors(disease_phens)
-    return jaccard_similarity(ortho_anc, disease_anc)
+    if backend == "semsimian" and prepared is not None:
+        return get_backend(backend, spo=ontologyEdges(prepared.terms))
+    return get_backend(backend)
 '''
 def computeSimilarity(ortho_phens, disease_phens):
     """
@@ -103,51 +177,234 @@ def computeSimilarity(ortho_phens, disease_phens):
 # -------------------------------
 # Step 5: Check if Disease Already Has a Gene Association
 # -------------------------------
-def diseaseHasGene(disease_id, gene_id):
-    query = numgeneDis_query(gene_id)
-    response = conn.query(query, db=DB_NAME)
-    count = [item for sublist in json.loads(json.dumps(response)) for item in sublist][0]
-    return int(count) > 0
+class GeneDiseaseIndex:
+    """Gene-disease associations held in memory, indexed by gene and by disease."""
+
+    def __init__(self, pairs=()):
+        self.by_gene = defaultdict(set)
+        self.by_disease = defaultdict(set)
+        for gene, disease in pairs:
+            self.by_gene[gene].add(disease)
+            self.by_disease[disease].add(gene)
+
+    def has(self, disease_id, gene_id):
+        return disease_id in self.by_gene.get(gene_id, ())
+
+    def disease_has_gene(self, disease_id, prefix="HGNC"):
+        """Whether the disease has any associated gene whose ID starts with prefix."""
+        return any(g.startswith(prefix) for g in self.by_disease.get(disease_id, ()))
+
+
+_gene_diseases = None
+
+
+def getGeneDiseaseIndex():
+    """Load every gene-disease association once and reuse it for all checks."""
+    global _gene_diseases
+    if _gene_diseases is None:
+        _gene_diseases = GeneDiseaseIndex(
+            (record[0], record[1]) for record in conn.query_iter(geneDisease_query, db=configDict['db']))
+    return _gene_diseases
+
+
+def diseaseHasGene(disease_id, gene_id=None):
+    """
+    Whether the disease is already associated with gene_id, or, without a
+    gene, with any human (HGNC) gene. Checked locally against the prefetched
+    GeneDiseaseIndex.
+    """
+    index = getGeneDiseaseIndex()
+    if gene_id is None:
+        return index.disease_has_gene(disease_id)
+    return index.has(disease_id, gene_id)
 
 # -------------------------------
 # Main Analysis
 # -------------------------------
-def runAnalysis():
-    human_genes = getHumanGenes()
+RESULT_COLUMNS = ["human_gene", "ortholog_gene", "disease", "similarity_score", "disease_has_gene_assoc"]
+
+
+class PreparedAnalysis:
+    """
+    Everything the similarity scoring needs, fetched from the KG once.
+
+    Ortholog and disease phenotype sets are encoded as ancestor-closed sparse
+    matrices over the same columns (see jaccardEngine / uphenoClosure), so
+    each ontology term is expanded once. For the term-pair similarity
+    backends the direct phenotype terms are kept as well: ortho_terms and
+    disease_terms index into `terms`, whose ancestor-closed rows are
+    term_matrix, and information_content gives the IC of every column.
+    Nothing here touches the database after construction, so it can be
+    shared read-only with worker processes.
+    """
+
+    def __init__(self, human_genes, humans_by_ortho, ortho_ids, ortho_matrix,
+                 disease_ids, disease_matrix, gene_diseases, terms=None,
+                 ortho_terms=None, disease_terms=None, term_matrix=None):
+        self.human_genes = human_genes
+        self.humans_by_ortho = humans_by_ortho
+        self.ortho_ids = ortho_ids
+        self.ortho_rows = {o: i for i, o in enumerate(ortho_ids)}
+        self.ortho_matrix = ortho_matrix
+        self.disease_ids = disease_ids
+        self.disease_matrix = disease_matrix
+        self.gene_diseases = gene_diseases
+        self.terms = terms
+        self.ortho_terms = ortho_terms
+        self.disease_terms = disease_terms
+        self.term_matrix = term_matrix
+        self.information_content = information_content(ortho_matrix, disease_matrix)
+
+
+def termIncidence(term_sets, vocabulary):
+    """CSR indptr/indices of the direct terms of each set, adding new terms to vocabulary."""
+    indptr, indices = [0], []
+    for terms in term_sets:
+        indices.extend(sorted({vocabulary.setdefault(t, len(vocabulary)) for t in terms}))
+        indptr.append(len(indices))
+    return indptr, indices
+
+
+def ancestorMatrices(*term_set_lists):
+    """Ancestor-closed CSR matrices of phenotype set lists, over shared columns."""
+    closure = getClosure()
+    if closure is not None:
+        matrices, _ = closure.build_matrices(*term_set_lists)
+    else:
+        matrices, _ = build_ancestor_matrices(term_ancestors, *term_set_lists)
+    return matrices
+
+
+def encodePhenotypeSets(ortho_sets, disease_sets):
+    """
+    Encode ortholog and disease phenotype sets for the similarity backends.
+
+    Returns
+    -------
+    tuple
+        ortho_matrix, disease_matrix (ancestor-closed, shared columns), terms
+        (the direct terms), ortho_terms, disease_terms (direct term incidence
+        over terms) and term_matrix (the ancestor-closed row of each term).
+    """
+    vocabulary = {}
+    ortho_direct = termIncidence(ortho_sets, vocabulary)
+    disease_direct = termIncidence(disease_sets, vocabulary)
+    terms = list(vocabulary)
+    term_sets = [[t] for t in terms]
+
+    ortho_matrix, disease_matrix, term_matrix = ancestorMatrices(ortho_sets, disease_sets, term_sets)
+    ortho_terms, disease_terms = [
+        sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr), shape=(len(indptr) - 1, len(terms)))
+        for indptr, indices in (ortho_direct, disease_direct)
+    ]
+    return ortho_matrix, disease_matrix, terms, ortho_terms, disease_terms, term_matrix
+
+
+def prepareAnalysis(human_genes=None):
+    """Fetch genes, orthologs, phenotypes and disease associations and encode them."""
+    if human_genes is None:
+        human_genes = getHumanGenes()
     disease_phens = getDiseasePhenotypes()
 
+    ortholog_map = getOrthologMap(human_genes)
+    humans_by_ortho = defaultdict(list)
+    for hgene, orthos in ortholog_map.items():
+        for ortho in dict.fromkeys(orthos):
+            humans_by_ortho[ortho].append(hgene)
+
+    ortho_phens = getPhenotypesBatch(list(humans_by_ortho))
+    ortho_ids = [o for o in humans_by_ortho if len(ortho_phens.get(o, [])) >= MIN_PHENOTYPES]
+
+    ortho_matrix, disease_matrix, terms, ortho_terms, disease_terms, term_matrix = encodePhenotypeSets(
+        [ortho_phens[o] for o in ortho_ids], [d_phens for _, d_phens in disease_phens])
+
+    return PreparedAnalysis(list(human_genes), dict(humans_by_ortho), ortho_ids, ortho_matrix,
+                            [d for d, _ in disease_phens], disease_matrix, getGeneDiseaseIndex(),
+                            terms, ortho_terms, disease_terms, term_matrix)
+
+
+def scoreGenes(prepared, human_genes=None, threshold=SIMILARITY_THRESHOLD, candidates=CANDIDATE_METHOD,
+               backend=SIMILARITY_BACKEND, candidate_threshold=None):
+    """
+    Score the phenotypes of every ortholog of the given human genes against
+    every disease and return the pairs above `threshold` as a DataFrame.
+
+    Candidate pairs are chosen by ancestor Jaccard: with candidates="exact"
+    only pairs that share an informative (rare) term are scored, without
+    losing any pair above the cutoff; "minhash" trades exact recall for fewer
+    candidates; None scores all pairs.
+
+    With the jaccard backend the cutoff is `threshold` itself. Any other
+    `backend` (a name or a SimilarityBackend) scores the pairs with Jaccard
+    above `candidate_threshold` (default BACKEND_CANDIDATE_THRESHOLD) and
+    keeps those whose backend score is above `threshold` (None keeps all),
+    so its scores are not gated on the Jaccard cutoff.
+    """
+    genes = set(prepared.human_genes if human_genes is None else human_genes)
+    ortho_ids = [o for o in prepared.ortho_ids if any(h in genes for h in prepared.humans_by_ortho[o])]
+    ortho_rows = np.array([prepared.ortho_rows[o] for o in ortho_ids], dtype=np.int64)
+    ortho_matrix = prepared.ortho_matrix[ortho_rows]
+    disease_matrix = prepared.disease_matrix
+
+    backend = getBackend(backend, prepared)
+    if backend.name == "jaccard":
+        cutoff = threshold
+    else:
+        cutoff = BACKEND_CANDIDATE_THRESHOLD if candidate_threshold is None else candidate_threshold
+
+    if candidates is None:
+        rows, cols, scores = jaccard_pairs(ortho_matrix, disease_matrix, cutoff)
+    else:
+        rows, cols = candidate_pairs(ortho_matrix, disease_matrix, cutoff, method=candidates)
+        print(f"Scoring {len(rows)} of {len(ortho_ids) * disease_matrix.shape[0]} ortholog-disease pairs")
+        scores = score_pairs(ortho_matrix, disease_matrix, rows, cols)
+        keep = scores > cutoff
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+    if backend.name != "jaccard":
+        scores = backend.score(prepared, ortho_rows[rows], cols)
+        if threshold is not None:
+            keep = scores > threshold
+            rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+    gene_diseases = prepared.gene_diseases
     results = []
+    for r, c, score in zip(rows, cols, scores):
+        ortho = ortho_ids[r]
+        disease_id = prepared.disease_ids[c]
+        for hgene in prepared.humans_by_ortho[ortho]:
+            if hgene not in genes or gene_diseases.has(disease_id, hgene):
+                continue # skip diseases already connected to this gene
+            results.append({
+                "human_gene": hgene,
+                "ortholog_gene": ortho,
+                "disease": disease_id,
+                "similarity_score": float(score),
+                "disease_has_gene_assoc": gene_diseases.disease_has_gene(disease_id)
+            })
+
+    df = pd.DataFrame(results, columns=RESULT_COLUMNS)
+    return df.sort_values(["human_gene", "ortholog_gene", "disease"], ignore_index=True)
 
-    for hgene in human_genes[:50]:  # limit for demo
-        orthos = getOrthologs(hgene)
-
-        for ortho in orthos:
-            ortho_phens = getPhenotypes(ortho)
-            print(ortho_phens)
-            if not ortho_phens:
-                continue
-            if len(ortho_phens) < 4:
-                continue
-
-            for disease_id, d_phens in disease_phens:
-                if diseaseHasGene(disease_id, hgene):
-                    continue # skip diseases with connected genes
-                score = computeSimilarity(ortho_phens, d_phens)
-                if score > 0.4:  # threshold for phenotypic similarity
-                    has_gene_assoc = diseaseHasGene(disease_id, hgene)
-                    results.append({
-                        "human_gene": hgene,
-                        "ortholog_gene": ortho,
-                        "disease": disease_id,
-                        "similarity_score": score,
-                        "disease_has_gene_assoc": has_gene_assoc
-                    })
-                    print(hgene, disease_id, ortho, score, has_gene_assoc)
-
-    df = pd.DataFrame(results)
+
+def runAnalysis(human_genes=None, threshold=SIMILARITY_THRESHOLD, candidates=CANDIDATE_METHOD,
+                backend=SIMILARITY_BACKEND, candidate_threshold=None):
+    """
+    Score the orthologs of every human gene against every disease in one
+    process and write the pairs above `threshold` to CSV. See semSimRunner
+    for the sharded, resumable multi-process version.
+    """
+    df = scoreGenes(prepareAnalysis(human_genes), threshold=threshold, candidates=candidates, backend=backend,
+                    candidate_threshold=candidate_threshold)
     df.to_csv("disease_gene_similarity_results.csv", index=False)
     print(df.head())
     return df
 
 if __name__ == "__main__":
+    # plan the batched query once before every batch reuses it (connect() already
+    # planned every query if configDict['warmup'] is set)
+    if not configDict.get('warmup'):
+        warmup(conn, configDict['db'], ["genePhens_batch"])
     runAnalysis()
+    if getattr(conn, 'cache', None) is not None:
+        print("Query cache:", conn.cache.stats())
@@ -0,0 +1,169 @@
+"""
+semSimRunner.py
+
+Sharded, checkpointed multi-process runner for the semSimPipeline analysis.
+
+The KG data is fetched and encoded once in the parent (prepareAnalysis). The
+human genes are then split into fixed-size shards that a process pool scores
+in parallel; workers share the prepared matrices read-only (inherited through
+fork where available). Each finished shard is written to its own CSV in the
+output directory and recorded in manifest.json, so an interrupted run
+restarted with --resume only scores the shards that are missing. The shard
+files are finally merged into one results CSV.
+
+Usage:
+    python semSimRunner.py --workers 32 --out semsim_shards
+    python semSimRunner.py --resume --out semsim_shards
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+
+import pandas as pd
+
+import semSimPipeline
+from neo4jConfig import configDict
+from semSimPipeline import CANDIDATE_METHOD, RESULT_COLUMNS, SIMILARITY_BACKEND, SIMILARITY_THRESHOLD
+from similarityBackends import BACKENDS
+
+MANIFEST = "manifest.json"
+DEFAULT_SHARD_SIZE = 500
+
+# prepared analysis shared with the workers
+_prepared = None
+# similarity backend, loaded once per worker
+_backend = None
+
+
+def _init_worker(prepared):
+    global _prepared
+    _prepared = prepared
+
+
+def shard_path(out_dir, shard_id):
+    return os.path.join(out_dir, f"shard-{shard_id:05d}.csv")
+
+
+def _run_shard(job):
+    """Score one shard of human genes and write its results; runs in a worker."""
+    global _backend
+    shard_id, genes, out_dir, threshold, candidates, backend, candidate_threshold = job
+    if _backend is None or _backend.name != backend:
+        _backend = semSimPipeline.getBackend(backend, _prepared)
+    df = semSimPipeline.scoreGenes(_prepared, genes, threshold, candidates, _backend, candidate_threshold)
+    path = shard_path(out_dir, shard_id)
+    df.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return shard_id, len(df)
+
+
+def _write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _genes_digest(genes):
+    return hashlib.sha256("\n".join(genes).encode()).hexdigest()
+
+
+def runSharded(out_dir="semsim_shards", output="disease_gene_similarity_results.csv",
+               shard_size=DEFAULT_SHARD_SIZE, workers=None, resume=False,
+               threshold=SIMILARITY_THRESHOLD, candidates=CANDIDATE_METHOD, human_genes=None,
+               backend=SIMILARITY_BACKEND, candidate_threshold=None):
+    """
+    Run the similarity analysis for all human genes across a process pool.
+
+    Parameters
+    ----------
+    out_dir : str
+        Directory for shard CSVs and the manifest.
+    output : str
+        Merged results CSV, written once every shard is complete.
+    shard_size : int
+        Human genes per shard.
+    workers : int, optional
+        Worker processes (default: all cores).
+    resume : bool
+        Skip shards the manifest records as complete. The shard size, gene
+        list and scoring settings must match the original run.
+
+    Returns
+    -------
+    pd.DataFrame
+        Merged results of all shards.
+    """
+    prepared = semSimPipeline.prepareAnalysis(human_genes)
+    genes = sorted(prepared.human_genes)
+    shards = [genes[i:i + shard_size] for i in range(0, len(genes), shard_size)]
+    settings = {
+        "shard_size": shard_size,
+        "n_shards": len(shards),
+        "genes_sha256": _genes_digest(genes),
+        "threshold": threshold,
+        "candidates": candidates,
+        "backend": backend,
+        "candidate_threshold": candidate_threshold,
+        "db": configDict['db'],
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    if resume and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        mismatched = [k for k, v in settings.items() if manifest.get(k) != v]
+        if mismatched:
+            raise ValueError(f"Cannot resume {out_dir}: {', '.join(mismatched)} changed since the original run")
+        completed = {i for i in manifest["completed"] if os.path.exists(shard_path(out_dir, i))}
+    else:
+        manifest = dict(settings)
+        completed = set()
+    manifest["completed"] = sorted(completed)
+    _write_manifest(out_dir, manifest)
+
+    todo = [i for i in range(len(shards)) if i not in completed]
+    print(f"{len(completed)} of {len(shards)} shards already done, {len(todo)} to run")
+    if todo:
+        jobs = [(i, shards[i], out_dir, threshold, candidates, backend, candidate_threshold) for i in todo]
+        if "fork" in mp.get_all_start_methods():
+            # workers inherit the prepared data copy-on-write
+            _init_worker(prepared)
+            pool = mp.get_context("fork").Pool(workers)
+        else:
+            pool = mp.get_context().Pool(workers, initializer=_init_worker, initargs=(prepared,))
+        with pool:
+            for shard_id, n_rows in pool.imap_unordered(_run_shard, jobs):
+                completed.add(shard_id)
+                manifest["completed"] = sorted(completed)
+                _write_manifest(out_dir, manifest)
+                print(f"shard {shard_id}: {n_rows} pairs ({len(completed)}/{len(shards)})")
+
+    parts = [pd.read_csv(shard_path(out_dir, i)) for i in range(len(shards))]
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=RESULT_COLUMNS)
+    df.to_csv(output, index=False)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded, resumable ortholog-disease similarity analysis.")
+    parser.add_argument("--out", default="semsim_shards", help="directory for shard results and the manifest")
+    parser.add_argument("--output", default="disease_gene_similarity_results.csv", help="merged results CSV")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--resume", action="store_true", help="skip shards already completed in --out")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--candidates", default=CANDIDATE_METHOD, choices=["exact", "minhash"])
+    parser.add_argument("--backend", default=SIMILARITY_BACKEND, choices=sorted(BACKENDS),
+                        help="similarity measure reported for the candidate pairs")
+    parser.add_argument("--candidate-threshold", type=float,
+                        help="ancestor Jaccard a pair needs to be scored by a non-Jaccard backend")
+    args = parser.parse_args()
+
+    runSharded(args.out, args.output, args.shard_size, args.workers, args.resume,
+               args.threshold, args.candidates, backend=args.backend,
+               candidate_threshold=args.candidate_threshold)
@@ -0,0 +1,247 @@
+"""
+similarityBackends.py
+
+Pluggable phenotype-set similarity measures for semSimPipeline.scoreGenes
+and semSimPipeline.computeSimilarity.
+
+Candidate (ortholog, disease) pairs are always chosen by ancestor Jaccard
+(see candidateIndex); a backend then gives the similarity_score of each
+candidate pair. Non-Jaccard backends get their own, looser candidate cutoff
+(semSimPipeline.BACKEND_CANDIDATE_THRESHOLD), and the reporting threshold
+applies to their own scores. Backends:
+
+jaccard (default)
+    Ancestor Jaccard of the two phenotype sets, as before.
+resnik
+    Best-match average of term-pair Resnik similarity, the information
+    content (IC) of the most informative common ancestor.
+phenodigm
+    Best-match average of sqrt(Resnik * ancestor Jaccard) per term pair.
+semsimian
+    The same best-match average over semsimian's native term-pair scores,
+    with one all-by-all call per ortholog against all of its candidate
+    diseases. Needs the semsimian package.
+
+Resnik and phenodigm work on the prepared sparse matrices: each ortholog's
+terms are compared against the union of its candidate diseases' terms in one
+dense block, and the best matches per disease are read off with sparse
+products, so no term pair is scored twice for the same ortholog.
+"""
+
+import numpy as np
+from scipy import sparse
+
+from candidateIndex import score_pairs
+
+DEFAULT_BACKEND = "jaccard"
+
+
+def information_content(*matrices):
+    """
+    Annotation-based IC of each column, -log(freq), where freq is the share of
+    rows (over all the ancestor-closed matrices) that contain the column.
+    Columns no row contains get IC 0.
+    """
+    counts = np.zeros(matrices[0].shape[1], dtype=np.int64)
+    n_rows = 0
+    for M in matrices:
+        counts += np.bincount(sparse.csr_matrix(M).indices, minlength=M.shape[1])
+        n_rows += M.shape[0]
+    ic = np.zeros(len(counts))
+    seen = counts > 0
+    ic[seen] = -np.log(counts[seen] / max(n_rows, 1))
+    return ic
+
+
+def _group_by_ortholog(orthos, diseases):
+    """Yield (ortholog row, positions of its pairs) for pairs sorted by ortholog."""
+    order = np.argsort(orthos, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(orthos[order]) != 0]) if len(order) else []
+    bounds = list(starts) + [len(order)]
+    for i in range(len(starts)):
+        positions = order[bounds[i]:bounds[i + 1]]
+        yield orthos[positions[0]], positions
+
+
+def best_match_average(term_scores, disease_terms):
+    """
+    Symmetric best-match average of one ortholog against several diseases.
+
+    Parameters
+    ----------
+    term_scores : np.ndarray
+        (ortholog terms x Y) term-pair scores, Y the union of the diseases' terms.
+    disease_terms : scipy.sparse.csr_matrix
+        (diseases x Y) binary membership of each disease's terms in Y.
+
+    Returns
+    -------
+    np.ndarray
+        One score per disease: the mean of the ortholog-side average best
+        match and the disease-side average best match.
+    """
+    sizes = np.diff(disease_terms.indptr)
+    ortho_side = np.zeros(disease_terms.shape[0])
+    for row in term_scores:
+        ortho_side += disease_terms.multiply(row).max(axis=1).toarray().ravel()
+    ortho_side /= max(len(term_scores), 1)
+    disease_side = disease_terms @ term_scores.max(axis=0) / np.maximum(sizes, 1)
+    return (ortho_side + disease_side) / 2
+
+
+class SimilarityBackend:
+    """
+    Base class: score(prepared, orthos, diseases) returns the similarity of
+    each (prepared.ortho_ids[orthos[i]], prepared.disease_ids[diseases[i]]) pair.
+    """
+
+    name = None
+
+    def score(self, prepared, orthos, diseases):
+        raise NotImplementedError
+
+
+class JaccardBackend(SimilarityBackend):
+    """Ancestor Jaccard of the whole phenotype sets."""
+
+    name = "jaccard"
+
+    def score(self, prepared, orthos, diseases):
+        return score_pairs(prepared.ortho_matrix, prepared.disease_matrix, orthos, diseases)
+
+
+class TermPairBackend(SimilarityBackend):
+    """
+    Best-match average over term-pair scores, one ortholog at a time.
+    Subclasses implement term_scores(prepared, x_terms, y_terms).
+    """
+
+    def score(self, prepared, orthos, diseases):
+        orthos = np.asarray(orthos)
+        diseases = np.asarray(diseases)
+        scores = np.zeros(len(orthos))
+        for ortho, positions in _group_by_ortholog(orthos, diseases):
+            x_terms = prepared.ortho_terms[ortho].indices
+            candidate_terms = prepared.disease_terms[diseases[positions]]
+            y_terms, local = np.unique(candidate_terms.indices, return_inverse=True)
+            membership = sparse.csr_matrix(
+                (np.ones(len(local)), local.ravel(), candidate_terms.indptr),
+                shape=(len(positions), len(y_terms)))
+            scores[positions] = best_match_average(self.term_scores(prepared, x_terms, y_terms), membership)
+        return scores
+
+    def term_scores(self, prepared, x_terms, y_terms):
+        raise NotImplementedError
+
+
+class ResnikBackend(TermPairBackend):
+    """Best-match average Resnik (IC of the most informative common ancestor)."""
+
+    name = "resnik"
+
+    def __init__(self, block_size=256):
+        self.block_size = block_size
+
+    def _common_ancestors(self, prepared, x_terms, y_terms):
+        """Dense ancestor blocks of both term lists over the ancestors of x_terms."""
+        X = prepared.term_matrix[x_terms]
+        columns = np.unique(X.indices)
+        X = X[:, columns].toarray().astype(bool)
+        Y = prepared.term_matrix[y_terms][:, columns]
+        return X, Y, columns
+
+    def term_scores(self, prepared, x_terms, y_terms):
+        X, Y, columns = self._common_ancestors(prepared, x_terms, y_terms)
+        ic = prepared.information_content[columns]
+        scores = np.zeros((len(x_terms), len(y_terms)))
+        for start in range(0, len(y_terms), self.block_size):
+            block = Y[start:start + self.block_size].toarray().astype(bool)
+            common = X[:, None, :] & block[None, :, :]
+            scores[:, start:start + len(block)] = np.where(common, ic, 0).max(axis=2, initial=0)
+        return scores
+
+
+class PhenodigmBackend(ResnikBackend):
+    """Best-match average of sqrt(Resnik * ancestor Jaccard) per term pair."""
+
+    name = "phenodigm"
+
+    def term_scores(self, prepared, x_terms, y_terms):
+        resnik = super().term_scores(prepared, x_terms, y_terms)
+        closed = prepared.term_matrix
+        inter = (closed[x_terms] @ closed[y_terms].T).toarray()
+        sizes = np.diff(closed.indptr)
+        union = sizes[x_terms][:, None] + sizes[y_terms][None, :] - inter
+        jaccard = np.divide(inter, union, out=np.zeros(inter.shape), where=union > 0)
+        return np.sqrt(resnik * jaccard)
+
+
+class SemsimianBackend(TermPairBackend):
+    """
+    Term-pair scores from semsimian, one all_by_all_pairwise_similarity call
+    per ortholog against the terms of all its candidate diseases.
+
+    Parameters
+    ----------
+    metric : str
+        'jaccard', 'resnik' or 'phenodigm'.
+    spo : list of (subject, predicate, object), optional
+        Ontology edges to load, e.g. from semSimPipeline.ontologyEdges.
+    resource_path : str, optional
+        semantic-sql database for semsimian to read instead of spo.
+    predicates : list
+        Predicates semsimian follows for ancestors.
+    """
+
+    name = "semsimian"
+    METRICS = {"jaccard": 0, "resnik": 1, "phenodigm": 2}
+
+    def __init__(self, metric="phenodigm", spo=None, resource_path=None, predicates=("rdfs:subClassOf",)):
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown semsimian metric: {metric}")
+        self.metric = metric
+        self.spo = spo
+        self.resource_path = resource_path
+        self.predicates = list(predicates)
+        self._semsimian = None
+
+    def __getstate__(self):
+        # the native object does not pickle; each worker process loads its own
+        state = dict(self.__dict__)
+        state["_semsimian"] = None
+        return state
+
+    def semsimian(self):
+        if self._semsimian is None:
+            from semsimian import Semsimian
+            self._semsimian = Semsimian(spo=self.spo, predicates=self.predicates,
+                                        resource_path=self.resource_path)
+        return self._semsimian
+
+    def term_scores(self, prepared, x_terms, y_terms):
+        names = prepared.terms
+        result = self.semsimian().all_by_all_pairwise_similarity(
+            {names[x] for x in x_terms}, {names[y] for y in y_terms}, 0.0, 0.0)
+        metric = self.METRICS[self.metric]
+        scores = np.zeros((len(x_terms), len(y_terms)))
+        for i, x in enumerate(x_terms):
+            row = result.get(names[x], {})
+            for j, y in enumerate(y_terms):
+                if names[y] in row:
+                    scores[i, j] = row[names[y]][metric]
+        return np.nan_to_num(scores)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (JaccardBackend, ResnikBackend, PhenodigmBackend, SemsimianBackend)
+}
+
+
+def get_backend(backend=DEFAULT_BACKEND, **kwargs):
+    """A backend instance by name; SimilarityBackend instances are returned as is."""
+    if isinstance(backend, SimilarityBackend):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown similarity backend: {backend}")
+    return BACKENDS[backend](**kwargs)
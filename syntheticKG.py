@@ -0,0 +1,252 @@
+"""
+syntheticKG.py
+
+Seeded generator for Monarch-shaped synthetic knowledge graphs.
+
+generate() builds the same working-set tables kgSnapshot exports from Neo4j,
+with the shape of the real graph:
+
+- genes of several organisms (HGNC, MGI, ZFIN, ...) with their in_taxon;
+- many-to-many orthologous_to edges between human and model organism genes;
+- has_phenotype edges with a long-tailed fan-out per gene onto popular terms;
+- one phenotype ontology per organism (HP, MP, ZP, ...), each a DAG whose
+  terms are also linked to the terms of a shared uPheno DAG;
+- diseases with HP phenotypes and gene-disease associations.
+
+write_kg() exports the tables as a kgSnapshot directory, so SnapshotConnection
+answers the registered queries over them in place of Neo4j, and also writes
+the ancestor closure (uphenoClosure format) and the high level uPheno category
+mapping (uphenoNew.pkl) the analyses read.
+
+Usage:
+    python syntheticKG.py synthetic_kg --scale small --seed 1
+"""
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import kgSnapshot
+from uphenoClosure import closure_from_edges, write_closure
+
+# organism -> (gene prefix, taxon, phenotype prefix, genes relative to human)
+ORGANISMS = {
+    "human": ("HGNC", "NCBITaxon:9606", "HP", 1.0),
+    "mouse": ("MGI", "NCBITaxon:10090", "MP", 1.2),
+    "zebrafish": ("ZFIN", "NCBITaxon:7955", "ZP", 1.3),
+    "rat": ("RGD", "NCBITaxon:10116", "MP", 1.1),
+    "worm": ("WB", "NCBITaxon:6239", "WBPhenotype", 1.0),
+    "fly": ("FB", "NCBITaxon:7227", "FBcv", 0.7),
+    "frog": ("Xenbase", "NCBITaxon:8364", "XPO", 0.6),
+}
+
+# scale name -> number of human genes; everything else is sized from it
+SCALES = {
+    "tiny": 200,
+    "small": 2000,
+    "medium": 20000,
+    "large": 100000,
+}
+
+HAS_PHENOTYPE = kgSnapshot.HAS_PHENOTYPE
+GENE_DISEASE = "biolink:gene_associated_with_condition"
+
+
+class SyntheticKG:
+    """Generated tables (kgSnapshot.SNAPSHOT_TABLES layout) plus the ontology behind them."""
+
+    def __init__(self, tables, terms, edges, categories):
+        self.tables = tables
+        self.terms = terms
+        self.edges = edges
+        self.categories = categories
+
+    def query_chunks(self, query, parameters=None, db=None, chunk_size=kgSnapshot.DEFAULT_CHUNK_SIZE,
+                     columns=None, fetch_size=None, arrow=False):
+        """Serve the snapshot export queries from the generated tables, for export_snapshot."""
+        for name, (export_query, _) in kgSnapshot.SNAPSHOT_TABLES.items():
+            if export_query == query:
+                table = self.tables[name]
+                for start in range(0, len(table), chunk_size):
+                    yield table.iloc[start:start + chunk_size].reset_index(drop=True)
+                return
+        raise KeyError("not a snapshot export query")
+
+
+# -------------------------------
+# Generation
+# -------------------------------
+def _dag(rng, prefix, n_terms):
+    """Term IDs and (child, parent) edges of a random DAG rooted at its first term."""
+    terms = [f"{prefix}:{i:07d}" for i in range(n_terms)]
+    edges = []
+    for i in range(1, n_terms):
+        # parents skew towards earlier, more general terms
+        n_parents = 1 + int(rng.random() < 0.3)
+        for p in set((i * rng.random(n_parents) ** 2).astype(np.int64)):
+            edges.append((terms[i], terms[p]))
+    return terms, edges
+
+
+def _popular(rng, n, size, skew=1.2):
+    """Indices in [0, n) drawn with Zipf-like popularity."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    order = rng.permutation(n)
+    return order[rng.choice(n, size=size, p=weights / weights.sum())]
+
+
+def _fan_out(rng, n, mean, zero_fraction=0.0):
+    """Long-tailed edge counts per node, with a share of nodes having none."""
+    counts = np.rint(rng.lognormal(np.log(max(mean, 1)), 0.9, size=n)).astype(np.int64)
+    counts[rng.random(n) < zero_fraction] = 0
+    return counts
+
+
+def generate(scale="small", seed=1, phenotypes_per_gene=8, phenotypes_per_disease=15):
+    """
+    Generate a synthetic Monarch-shaped KG.
+
+    Parameters
+    ----------
+    scale : str or int
+        A SCALES name or the number of human genes.
+    seed : int
+        Random seed; the same seed and scale give the same graph.
+
+    Returns
+    -------
+    SyntheticKG
+    """
+    rng = np.random.default_rng(seed)
+    n_human = SCALES[scale] if isinstance(scale, str) else int(scale)
+    n_upheno = max(50, n_human // 4)
+    n_diseases = max(20, n_human // 2)
+
+    # ontologies: a shared uPheno DAG and one DAG per phenotype prefix
+    upheno_terms, edges = _dag(rng, "UPHENO", n_upheno)
+    phen_terms, upheno_links, namespaces = {}, [], {t: "UPHENO" for t in upheno_terms}
+    for prefix in dict.fromkeys(org[2] for org in ORGANISMS.values()):
+        terms, term_edges = _dag(rng, prefix, max(50, n_human // 2))
+        phen_terms[prefix] = terms
+        edges.extend(term_edges)
+        namespaces.update((t, prefix) for t in terms)
+        # most species terms are grouped under a uPheno term
+        linked = rng.random(len(terms)) < 0.8
+        targets = _popular(rng, n_upheno, len(terms), skew=0.8)
+        for term, target in zip(np.array(terms)[linked], targets[linked]):
+            edges.append((term, upheno_terms[target]))
+            upheno_links.append((upheno_terms[target], term))
+
+    # genes
+    genes, ortholog_rows, gene_phens = [], [], []
+    human_ids = None
+    for name, (prefix, taxon, phen_prefix, ratio) in ORGANISMS.items():
+        n = max(1, int(n_human * ratio))
+        ids = [f"{prefix}:{i:07d}" for i in range(n)]
+        genes.extend((g, taxon) for g in ids)
+        if human_ids is None:
+            human_ids = ids
+        else:
+            # many-to-many orthology: most model genes map to one human gene, some to several
+            has_ortholog = rng.random(n) < 0.7
+            for g in np.array(ids)[has_ortholog]:
+                for h in rng.choice(n_human, size=min(n_human, rng.geometric(0.7)), replace=False):
+                    pair = (human_ids[h], g) if rng.random() < 0.5 else (g, human_ids[h])
+                    ortholog_rows.append(pair)
+        terms = phen_terms[phen_prefix]
+        fan_out = _fan_out(rng, n, phenotypes_per_gene, zero_fraction=0.4)
+        picks = _popular(rng, len(terms), int(fan_out.sum()))
+        for g, term in zip(np.repeat(ids, fan_out), picks):
+            gene_phens.append((g, terms[term], HAS_PHENOTYPE))
+
+    # diseases with HP phenotypes, most with one or more associated human genes
+    disease_ids = [f"MONDO:{i:07d}" for i in range(n_diseases)]
+    hp = phen_terms["HP"]
+    sizes = np.maximum(_fan_out(rng, n_diseases, phenotypes_per_disease), 1)
+    disease_phens = list(zip(np.repeat(disease_ids, sizes), (hp[i] for i in _popular(rng, len(hp), int(sizes.sum())))))
+    associated = rng.random(n_diseases) < 0.6
+    gene_diseases = [(human_ids[h], d, GENE_DISEASE)
+                     for d in np.array(disease_ids)[associated]
+                     for h in rng.choice(n_human, size=min(n_human, rng.geometric(0.6)), replace=False)]
+
+    orthologs = pd.DataFrame(ortholog_rows, columns=["subject", "object"]).drop_duplicates(ignore_index=True)
+    gene_phenotypes = pd.DataFrame(gene_phens, columns=["gene", "phenotype", "predicate"]).drop_duplicates(ignore_index=True)
+    gene_diseases = pd.DataFrame(gene_diseases, columns=["gene", "disease", "predicate"]).drop_duplicates(ignore_index=True)
+    disease_phenotypes = pd.DataFrame(disease_phens, columns=["disease", "phenotype"]).drop_duplicates(ignore_index=True)
+
+    genes = pd.DataFrame(genes, columns=["id", "in_taxon"])
+    degree = pd.concat([orthologs["subject"], orthologs["object"], gene_phenotypes["gene"],
+                        gene_diseases["gene"]]).value_counts()
+    genes["degree"] = genes["id"].map(degree).fillna(0).astype(np.int64)
+
+    phenotypes = pd.DataFrame({"id": list(namespaces), "namespace": list(namespaces.values()), "type": None})
+    tables = {
+        "genes": genes,
+        "orthologs": orthologs,
+        "gene_phenotypes": gene_phenotypes,
+        "gene_diseases": gene_diseases,
+        "phenotypes": phenotypes,
+        "disease_phenotypes": disease_phenotypes,
+        "upheno_links": pd.DataFrame(upheno_links, columns=["upheno", "phenotype"]),
+    }
+    all_terms = list(namespaces)
+    return SyntheticKG(tables, all_terms, edges, _categories(all_terms, edges, upheno_terms))
+
+
+def _categories(terms, edges, upheno_terms):
+    """High level uPheno categories (children of the uPheno root) -> every term under them."""
+    term_ids = {t: i for i, t in enumerate(terms)}
+    indptr, indices = closure_from_edges(terms, [(term_ids[c], term_ids[p]) for c, p in edges])
+    top = {term_ids[c] for c, p in edges if p == upheno_terms[0] and c.startswith("UPHENO")}
+    categories = {terms[t]: [] for t in sorted(top)}
+    for i, term in enumerate(terms):
+        for a in indices[indptr[i]:indptr[i + 1]]:
+            if a in top:
+                categories[terms[a]].append(term)
+    return categories
+
+
+# -------------------------------
+# Output
+# -------------------------------
+def write_kg(kg, out_dir="synthetic_kg", db="synthetic"):
+    """
+    Write a generated KG to out_dir:
+
+        out_dir/
+            snapshot/<db>/     kgSnapshot directory (SnapshotConnection)
+            upheno_closure/    ancestor closure (uphenoClosure.ClosureIndex)
+            uphenoNew.pkl      high level uPheno category -> member terms
+
+    Returns
+    -------
+    dict
+        Paths of the three outputs.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    snapshot = kgSnapshot.export_snapshot(kg, db, os.path.join(out_dir, "snapshot"))
+
+    term_ids = {t: i for i, t in enumerate(kg.terms)}
+    indptr, indices = closure_from_edges(kg.terms, [(term_ids[c], term_ids[p]) for c, p in kg.edges])
+    closure = os.path.join(out_dir, "upheno_closure")
+    write_closure(closure, kg.terms, indptr, indices, source="syntheticKG")
+
+    categories = os.path.join(out_dir, "uphenoNew.pkl")
+    with open(categories, "wb") as f:
+        pickle.dump(kg.categories, f)
+    return {"snapshot": snapshot, "closure": closure, "categories": categories}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Monarch-shaped KG snapshot.")
+    parser.add_argument("out_dir", nargs="?", default="synthetic_kg")
+    parser.add_argument("--scale", default="small", help=f"one of {', '.join(SCALES)} or a human gene count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default="synthetic")
+    args = parser.parse_args()
+
+    scale = int(args.scale) if args.scale.isdigit() else args.scale
+    print(write_kg(generate(scale, args.seed), args.out_dir, args.db))
@@ -0,0 +1,238 @@
+"""
+uphenoClosure.py
+
+Precomputed reflexive ancestor closure of the uPheno ontology.
+
+build_closure reads a local ontology file once (a semantic-sql .db, or any
+file OAK can open, e.g. .obo/.owl), computes the ancestors of every term and
+writes them as an integer-encoded CSR structure:
+
+    upheno_closure/
+        manifest.json
+        terms.txt      one CURIE per line; line number = term id
+        indptr.npy     int64, ancestors of term i are indices[indptr[i]:indptr[i+1]]
+        indices.npy    int32, sorted ancestor term ids (including i itself)
+
+ClosureIndex.load memory-maps the arrays, so loading is near-instant and a
+lookup is an array slice; no ontology queries are made after the build.
+
+Usage:
+    python uphenoClosure.py upheno.db upheno_closure
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+FORMAT_VERSION = 1
+
+
+# -------------------------------
+# Build
+# -------------------------------
+def closure_from_edges(terms, edges):
+    """
+    Reflexive ancestor closure of a directed graph.
+
+    Parameters
+    ----------
+    terms : list
+        Node identifiers; position = node id.
+    edges : iterable of (child, parent) node ids
+
+    Returns
+    -------
+    indptr, indices : np.ndarray
+        CSR rows of sorted ancestor ids per node. Cycles (e.g. from mixed
+        predicates) are handled by collapsing strongly connected components,
+        whose members share one closure.
+    """
+    n = len(terms)
+    edges = np.asarray(list(edges), dtype=np.int64).reshape(-1, 2)
+    graph = sparse.csr_matrix((np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])), shape=(n, n))
+    n_comp, comp = connected_components(graph, directed=True, connection="strong")
+
+    # condensed DAG: component -> parent components
+    parents = [set() for _ in range(n_comp)]
+    children_count = np.zeros(n_comp, dtype=np.int64)
+    for child, parent in zip(comp[edges[:, 0]], comp[edges[:, 1]]):
+        if child != parent and parent not in parents[child]:
+            parents[child].add(parent)
+            children_count[parent] += 1
+    members = [[] for _ in range(n_comp)]
+    for node, c in enumerate(comp):
+        members[c].append(node)
+
+    # Kahn's algorithm from the leaves gives children before parents; resolve
+    # closures in the reverse order so parents are always done first.
+    order = [c for c in range(n_comp) if children_count[c] == 0]
+    for c in order:
+        for p in parents[c]:
+            children_count[p] -= 1
+            if children_count[p] == 0:
+                order.append(p)
+
+    closures = [None] * n_comp
+    for c in reversed(order):
+        ancestors = set(members[c])
+        for p in parents[c]:
+            ancestors |= closures[p]
+        closures[c] = ancestors
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    rows = []
+    for node in range(n):
+        row = np.fromiter(sorted(closures[comp[node]]), dtype=np.int32)
+        rows.append(row)
+        indptr[node + 1] = indptr[node] + len(row)
+    indices = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+    return indptr, indices
+
+
+def build_closure(ontology_path, out_dir="upheno_closure", predicates=None):
+    """
+    Compute the ancestor closure of every term in a local ontology file and
+    write it to out_dir.
+
+    Parameters
+    ----------
+    ontology_path : str
+        Local ontology; .db files are opened as semantic-sql, others via OAK.
+    out_dir : str
+        Output directory.
+    predicates : list, optional
+        Relationship predicates to follow (default: all, matching
+        adapter.ancestors(term) with no predicates).
+    """
+    from oaklib import get_adapter
+
+    source = f"sqlite:{ontology_path}" if ontology_path.endswith(".db") else ontology_path
+    adapter = get_adapter(source)
+
+    term_ids = {}
+    for term in adapter.entities():
+        if ":" in term and not term.startswith("_:"):
+            term_ids.setdefault(term, len(term_ids))
+    edges = []
+    for subject, _, obj in adapter.relationships(predicates=predicates):
+        if subject in term_ids and obj in term_ids:
+            edges.append((term_ids[subject], term_ids[obj]))
+
+    terms = list(term_ids)
+    indptr, indices = closure_from_edges(terms, edges)
+    write_closure(out_dir, terms, indptr, indices, source=os.path.abspath(ontology_path))
+    return out_dir
+
+
+def write_closure(out_dir, terms, indptr, indices, source=None):
+    """Write a closure built by closure_from_edges."""
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "terms.txt"), "w") as f:
+        f.write("\n".join(terms))
+    np.save(os.path.join(out_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(out_dir, "indices.npy"), indices)
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump({
+            "format_version": FORMAT_VERSION,
+            "source": source,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "terms": len(terms),
+            "closure_size": int(len(indices)),
+        }, f, indent=2)
+
+
+# -------------------------------
+# Lookup
+# -------------------------------
+class ClosureIndex:
+    """Memory-mapped reflexive ancestor closure written by build_closure."""
+
+    def __init__(self, terms, indptr, indices):
+        self.terms = terms
+        self.term_ids = {t: i for i, t in enumerate(terms)}
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def load(cls, path="upheno_closure"):
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Closure {path} has format version {manifest.get('format_version')}, "
+                             f"expected {FORMAT_VERSION}")
+        with open(os.path.join(path, "terms.txt")) as f:
+            terms = f.read().split("\n") if manifest["terms"] else []
+        return cls(terms,
+                   np.load(os.path.join(path, "indptr.npy"), mmap_mode="r"),
+                   np.load(os.path.join(path, "indices.npy"), mmap_mode="r"))
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self.term_ids
+
+    def ancestor_ids(self, term_id):
+        """Sorted ancestor ids of a term id, including itself (a read-only array view)."""
+        return self.indices[self.indptr[term_id]:self.indptr[term_id + 1]]
+
+    def ancestors(self, term):
+        """Ancestor CURIEs of a term, including itself; unknown terms are their own only ancestor."""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return [term]
+        return [self.terms[i] for i in self.ancestor_ids(term_id)]
+
+    def build_matrices(self, *term_set_lists):
+        """
+        Encode lists of phenotype sets as ancestor-closed binary CSR matrices,
+        like jaccardEngine.build_ancestor_matrices but straight from the
+        integer closure.
+
+        Columns are term ids; terms missing from the ontology get extra columns
+        after len(self) and count only as themselves.
+
+        Returns
+        -------
+        matrices : list of scipy.sparse.csr_matrix
+        n_columns : int
+        """
+        extra = {}
+        encoded = []
+        for term_sets in term_set_lists:
+            indptr, rows = [0], []
+            for terms in term_sets:
+                parts = []
+                for term in terms:
+                    term_id = self.term_ids.get(term)
+                    if term_id is None:
+                        parts.append(np.array([len(self) + extra.setdefault(term, len(extra))], dtype=np.int64))
+                    else:
+                        parts.append(self.ancestor_ids(term_id))
+                row = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+                rows.append(row)
+                indptr.append(indptr[-1] + len(row))
+            indices = np.concatenate(rows).astype(np.int32) if rows else np.empty(0, dtype=np.int32)
+            encoded.append((np.asarray(indptr, dtype=np.int64), indices))
+
+        n_columns = len(self) + len(extra)
+        matrices = [
+            sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                              shape=(len(indptr) - 1, n_columns))
+            for indptr, indices in encoded
+        ]
+        return matrices, n_columns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the uPheno ancestor closure from a local ontology file.")
+    parser.add_argument("ontology", help="local ontology file, e.g. upheno.db")
+    parser.add_argument("out_dir", nargs="?", default="upheno_closure")
+    parser.add_argument("--predicates", nargs="+", help="relationship predicates to follow (default: all)")
+    args = parser.parse_args()
+    print("Closure written to", build_closure(args.ontology, args.out_dir, args.predicates))
@@ -1,17 +1,11 @@
 import pandas as pd
-import upsetplot as usplt
-from matplotlib import pyplot as plt
-import seaborn as sns
 
+from neo4jConnection import lazy_connect
 from neo4jConfig import configDict
-from neo4jConnection import Neo4jConnection
-from neo4jConfig import configDict
-from queries import numUPHENOrg_query, numOrgPhens_query, numGeneOrthoTaxon_query
+from queries import numOrgPhens_query, orthoTaxonMatrix_query, uphenoPrefixMatrix_query
 
-# establishing connection with neo4j
-conn = Neo4jConnection(uri=configDict['uri'],
-                       user=configDict['user'],
-                       pwd=configDict['pwd'],)
+# connection to neo4j, opened on the first query
+conn = lazy_connect(configDict)
 
 """
 Functions to query the Monarch KG for phenotype and ortholog patterns
@@ -21,29 +15,46 @@ across genes and organisms. Produces plots and CSV outputs for visualization.
 # -------------------------------
 # Phenotype Connections via uPheno
 # -------------------------------
-def phenotype_pattern(model_orgs=['HP','ZP','MP','WB','FYPO','XPO','DDPHENO']):
+def phenotypeConnectionCounts(model_orgs=['HP','ZP','MP','WB','FYPO','XPO','DDPHENO']):
     """
-    Create an upset plot showing cross-species phenotype connections via uPheno ontology.
+    Count the phenotype connections between each pair of ontology prefixes via uPheno.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        prefix x prefix connection counts.
+    labels, data : list
+        Each prefix pair and its count, in the upset plot's membership layout.
     """
     dataDF = {org1: {org2: 0 for org2 in model_orgs} for org1 in model_orgs}
     labels, data = [], []
 
+    # all prefix pairs in one pass over the uPheno neighbourhoods
+    response = conn.query(uphenoPrefixMatrix_query, {'prefixes': list(model_orgs)}, db=configDict['db'])
+    counts = {(record['prefix1'], record['prefix2']): record['count'] for record in response}
+
     for org1 in model_orgs:
         for org2 in model_orgs:
-            query = numUPHENOrg_query(org1, org2)
-            edge_count = conn.query(query, db='monarch20250812')[0]
-            edge_count = int(str(edge_count).split('=')[1].split('>')[0])
+            edge_count = counts.get((org1, org2), 0)
             dataDF[org1][org2] = edge_count
 
             if [org1, org2] not in labels:
                 labels.append([org1, org2])
                 data.append(edge_count)
 
-    df = pd.DataFrame(data=dataDF)
+    return pd.DataFrame(data=dataDF), labels, data
+
+
+def phenotype_pattern(model_orgs=['HP','ZP','MP','WB','FYPO','XPO','DDPHENO']):
+    """
+    Create an upset plot showing cross-species phenotype connections via uPheno ontology.
+    """
+    df, labels, data = phenotypeConnectionCounts(model_orgs)
     print(df)
 
     # Create upset plot
     import upsetplot as usplt
+    from matplotlib import pyplot as plt
     example = usplt.from_memberships(labels, data=data)
     usplt.plot(example, subset_size='sum')
     plt.yscale('log')
@@ -59,20 +70,27 @@ def phenotypesCount(model_orgs=['HGNC','WB','ZFIN','RGD','MGI','FB','PomBase','d
     Plot number of phenotypes associated with each organism's genes.
     """
     data = {}
-    for org in model_orgs:
-        query = numOrgPhens_query(org)
-        count = conn.query(query, db='monarch-20250217')[0]
-        data[org] = int(str(count).split('=')[1].split('>')[0])
+    results = conn.query_many([numOrgPhens_query(org) for org in model_orgs], db=configDict['db'])
+    for org, result in zip(model_orgs, results):
+        if result.error is not None:
+            print(f"{org}: query failed:", result.error)
+            continue
+        data[org] = result.records[0][0]
 
     print(data)
+    return data
 
 # -------------------------------
 # Ortholog Connections Between Organisms
 # -------------------------------
-def ortholog_pattern(taxons=None):
+def orthologCounts(taxons=None):
     """
-    Build a heatmap of ortholog counts between organisms.
-    Saves the counts as CSV and plots a heatmap.
+    Count the ortholog edges between each pair of organisms.
+
+    Returns
+    -------
+    pd.DataFrame
+        organism x organism ortholog counts, labelled by organism name.
     """
     if taxons is None:
         taxons = {
@@ -84,25 +102,34 @@ def ortholog_pattern(taxons=None):
             'NCBITaxon:9823':'Wild Boar'
         }
 
-    labels, data = [], []
     dataDF = {label: {label2:0 for label2 in taxons.values()} for label in taxons.values()}
 
-    for org1 in taxons.keys():
-        for org2 in taxons.keys():
-            query = numGeneOrthoTaxon_query(org1, org2)
-            edge_count = conn.query(query, db='monarch20250812')[0]
-            edge_count = int(str(edge_count).split('=')[1].split('>')[0])
+    # all taxon pairs in one pass over the ortholog edges
+    response = conn.query(orthoTaxonMatrix_query, {'taxa': list(taxons.keys())}, db=configDict['db'])
+    for record in response:
+        label1 = taxons[record['taxon1']]
+        label2 = taxons[record['taxon2']]
+        dataDF[label1][label2] = record['count']
 
-            label1 = taxons[org1]
-            label2 = taxons[org2]
-            dataDF[label1][label2] = edge_count
+    return pd.DataFrame(data=dataDF)
 
-    df = pd.DataFrame(data=dataDF)
+
+def ortholog_pattern(taxons=None):
+    """
+    Build a heatmap of ortholog counts between organisms.
+    Saves the counts as CSV and plots a heatmap.
+    """
+    df = orthologCounts(taxons)
     df.to_csv('OrthologData.csv')
+
+    import seaborn as sns
+    from matplotlib import pyplot as plt
     sns.heatmap(df, annot=False, cmap='YlGnBu')
     plt.savefig('OrthologHeatmap.svg')
     plt.show()
 
-phenotype_pattern()
-phenotypesCount()
-ortholog_pattern()
+
+if __name__ == "__main__":
+    phenotype_pattern()
+    phenotypesCount()
+    ortholog_pattern()